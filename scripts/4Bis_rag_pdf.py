@@ -4,12 +4,15 @@ Ce script montre comment faire du RAG sur plusieurs documents PDF.
 """
 import os
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
+from langchain_community.document_loaders import DirectoryLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
+from tools.cache_embeddings import EmbeddingsEnCache  # 🗄️ Cache local des embeddings
+from tools.chargement_pdf import PyPDFLoaderEnCache  # 📄 Cache du texte extrait des PDFs
+from tools.pipeline_embeddings import decouper_en_flux, indexer_par_lots  # 🚚 Indexation en flux
+from tools.cache_reponses import CacheReponses, version_index  # 💬 Cache des réponses
+from tools.recherche_hybride import creer_retriever  # 🔀 Vecteur, hybride ou MMR
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
 load_dotenv()
@@ -19,19 +22,20 @@ load_dotenv()
 # =============================================================================
 # On utilise DirectoryLoader pour charger TOUS les PDFs d'un dossier d'un coup !
 # - glob="**/*.pdf" : cherche tous les fichiers .pdf (même dans les sous-dossiers)
-# - loader_cls=PyPDFLoader : utilise PyPDFLoader pour lire chaque PDF
+# - loader_cls=PyPDFLoaderEnCache : PyPDFLoader + cache disque du texte extrait
+#   (un PDF déjà lu n'est plus parsé, tant que son contenu et pypdf ne changent pas)
 
 print("📚 Chargement des rapports de maturité Clinitex...")
 
 loader = DirectoryLoader(
     path="scripts/DocArag2",
     glob="**/*.pdf",
-    loader_cls=PyPDFLoader,
+    loader_cls=PyPDFLoaderEnCache,
     show_progress=True
 )
 
-documents = loader.load()
-print(f"✅ {len(documents)} pages chargées depuis les PDFs.")
+# lazy_load() lit les pages une par une au lieu de tout charger en mémoire d'un coup
+documents = loader.lazy_load()
 
 # =============================================================================
 # 2. DÉCOUPER LES DOCUMENTS (CHUNKING)
@@ -46,8 +50,8 @@ text_splitter = RecursiveCharacterTextSplitter(
     separators=["\n\n", "\n", ". ", " ", ""]  # Ordre de priorité pour couper
 )
 
-chunks = text_splitter.split_documents(documents)
-print(f"✅ Documents découpés en {len(chunks)} morceaux.")
+# Découpage en flux : chaque document est découpé au moment où il est lu
+chunks = decouper_en_flux(documents, text_splitter)
 
 # =============================================================================
 # 3. CRÉER LA BASE VECTORIELLE (INDEXATION)
@@ -56,11 +60,17 @@ print(f"✅ Documents découpés en {len(chunks)} morceaux.")
 
 print("🔄 Création de la base vectorielle (cela peut prendre quelques secondes)...")
 
-embeddings = OpenAIEmbeddings()
-vectorstore = FAISS.from_documents(chunks, embeddings)
+embeddings = EmbeddingsEnCache(OpenAIEmbeddings())  # Un texte déjà vectorisé n'est plus renvoyé à OpenAI
+# Pour l'indexation seulement, max_retries=0 : les 429 remontent au backoff adaptatif
+# de indexer_par_lots. Les questions gardent `embeddings` et les retries du SDK.
+indexation = EmbeddingsEnCache(OpenAIEmbeddings(max_retries=0))
+# Les chunks sont vectorisés par lots et ajoutés à FAISS au fil de l'eau :
+# la mémoire reste stable quelle que soit la taille du corpus.
+vectorstore = indexer_par_lots(chunks, indexation, embeddings_requetes=embeddings, verbose=True)
 
 # On crée le retriever avec k=4 (retourne les 4 morceaux les plus pertinents)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+# 🎯 RAG_RECHERCHE=mmr : 4 morceaux pertinents ET variés (évite les chunks qui se chevauchent)
+retriever = creer_retriever(vectorstore, k=4, mode=os.getenv("RAG_RECHERCHE", "vecteur"))
 
 print("✅ Base vectorielle créée !")
 
@@ -85,13 +95,12 @@ Réponse :"""
 
 prompt = ChatPromptTemplate.from_template(template)
 
-# La chaîne RAG complète
-rag_chain = (
-    {"context": retriever, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
-)
+# 💬 Cache des réponses : la recherche est toujours faite, mais si une question
+# proche a déjà obtenu une réponse avec EXACTEMENT les mêmes chunks (et le même
+# index), on la resservira sans rappeler gpt-4o.
+generation = prompt | llm | StrOutputParser()
+cache_reponses = CacheReponses(embeddings)
+version = version_index(vectorstore)
 
 # =============================================================================
 # 5. TESTER LE RAG
@@ -101,7 +110,9 @@ def poser_question(question: str):
     """Fonction helper pour poser une question et afficher la réponse."""
     print(f"\n❓ Question : {question}")
     print("🔍 Recherche dans les rapports...")
-    reponse = rag_chain.invoke(question)
+    reponse, depuis_cache = cache_reponses.repondre(question, retriever, generation, version)
+    if depuis_cache:
+        print("⚡ Réponse déjà connue (cache) : pas d'appel au LLM")
     print(f"\n📊 Réponse :\n{reponse}")
     print("-" * 60)
 
@@ -121,7 +132,7 @@ poser_question("Quelles recommandations sont faites concernant les outils numér
 print("\n" + "=" * 60)
 print("💬 MODE INTERACTIF")
 print("Pose tes questions sur les rapports Clinitex.")
-print("Tape 'quit' pour quitter.")
+print("Tape 'historique' pour revoir les réponses en cache, 'quit' pour quitter.")
 print("=" * 60)
 
 while True:
@@ -129,5 +140,10 @@ while True:
     if question.lower() in ['quit', 'exit', 'q']:
         print("👋 À bientôt !")
         break
+    if question.lower() == 'historique':
+        # Rejoue les réponses déjà obtenues sur cet index, sans latence LLM
+        for ancienne_question, ancienne_reponse in reversed(cache_reponses.historique(version)):
+            print(f"\n❓ {ancienne_question}\n📊 {ancienne_reponse}")
+        continue
     if question:
         poser_question(question)
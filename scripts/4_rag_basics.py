@@ -4,6 +4,7 @@ from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
+from tools.cache_embeddings import EmbeddingsEnCache  # 🗄️ Cache local des embeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
@@ -26,7 +27,7 @@ print(f"✅ Document découpé en {len(chunks)} morceaux.")
 # 3. Créer la base de données vectorielle (Vector Store)
 # Il nous faut des "Embeddings" : c'est ce qui transforme le texte en vecteurs (nombres)
 # pour que l'ordinateur comprenne le sens des phrases.
-embeddings = OpenAIEmbeddings()
+embeddings = EmbeddingsEnCache(OpenAIEmbeddings())  # Un texte déjà vectorisé n'est plus renvoyé à OpenAI
 vectorstore = FAISS.from_documents(chunks, embeddings)
 
 # On transforme le vectorstore en "Retriever" (Chercheur)
@@ -18,6 +18,8 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import tool
 from langchain_community.vectorstores import FAISS
+from tools.cache_embeddings import EmbeddingsEnCache  # 🗄️ Cache local des embeddings
+from tools.registre import registre  # 🗂️ Registre des retrievers
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import CharacterTextSplitter
 
@@ -45,23 +47,24 @@ def calculatrice(expression: str) -> str:
 # --- OUTIL 2 : Le Règlement de Poudlard (Mini-RAG) ---
 # On réutilise notre RAG de la leçon 5 comme un outil !
 
-# Variables globales pour le retriever (initialisées plus tard)
-_retriever = None
+def _construire_retriever():
+    """Construit le retriever du règlement (appelé une seule fois par le registre)."""
+    loader = TextLoader("scripts/DocARag/reglement_poudlard.txt", encoding="utf-8")
+    documents = loader.load()
+    
+    text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    chunks = text_splitter.split_documents(documents)
+    
+    embeddings = EmbeddingsEnCache(OpenAIEmbeddings())  # Un texte déjà vectorisé n'est plus renvoyé à OpenAI
+    vectorstore = FAISS.from_documents(chunks, embeddings)
+    return vectorstore.as_retriever(search_kwargs={"k": 2})
+
+# Le registre remplace la variable globale : construction unique et thread-safe
+registre.enregistrer("poudlard", _construire_retriever)
 
 def _init_retriever():
     """Initialise le retriever une seule fois."""
-    global _retriever
-    if _retriever is None:
-        loader = TextLoader("scripts/DocARag/reglement_poudlard.txt", encoding="utf-8")
-        documents = loader.load()
-        
-        text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = text_splitter.split_documents(documents)
-        
-        embeddings = OpenAIEmbeddings()
-        vectorstore = FAISS.from_documents(chunks, embeddings)
-        _retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
-    return _retriever
+    return registre.obtenir("poudlard")
 
 @tool
 def reglement_poudlard(question: str) -> str:
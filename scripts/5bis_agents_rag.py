@@ -3,7 +3,7 @@
 =================================================
 
 Cet agent combine plusieurs outils :
-1. 🔍 RAG - Interroge les rapports de maturité Clinitex
+1. 🔍 RAG - Interroge les rapports Clinitex et les règlements Cegedim (un corpus ou tous à la fois)
 2. 🧮 Calculatrice - Fait des calculs mathématiques
 3. 📅 Date - Donne la date actuelle
 4. 🌐 Recherche Web - Cherche sur Internet (DuckDuckGo)
@@ -11,6 +11,8 @@ Cet agent combine plusieurs outils :
 6. 📊 Graphiques - Génère des visualisations
 
 L'agent décide SEUL quel outil utiliser selon ta question !
+Quand il en demande plusieurs dans le même tour, ils s'exécutent en parallèle
+(avec une limite par outil : voir tools/appels_paralleles.py).
 
 Les outils sont définis dans le dossier tools/ pour plus de lisibilité.
 """
@@ -33,6 +35,8 @@ from tools import (
     generer_graphique,
     tous_les_outils  # Liste pratique de tous les outils
 )
+from tools.budget_tokens import SuiviTokens
+from tools.appels_paralleles import limiter_outils, CONCURRENCE_MAX
 
 load_dotenv()
 
@@ -42,11 +46,14 @@ load_dotenv()
 
 memory = MemorySaver()
 
+# 🪙 Tokens renvoyés par les outils RAG (pour régler RAG_BUDGET_TOKENS)
+suivi_tokens = SuiviTokens()
+
 # ═══════════════════════════════════════════════════════════════════════════
 # 🧠 CRÉATION DE L'AGENT
 # ═══════════════════════════════════════════════════════════════════════════
 
-print("🤖 Création de l'agent avec 6 outils...")
+print("🤖 Création de l'agent avec 8 outils...")
 
 # Le cerveau de l'agent
 llm = ChatOpenAI(model="gpt-4o", temperature=0)
@@ -62,23 +69,26 @@ system_message = """Tu es un assistant expert en analyse de maturité digitale.
 
 🛠️ **Tes outils** :
 1. **recherche_rapports_clinitex** : Chercher des infos dans les rapports de maturité
-2. **calculatrice** : Faire des calculs (moyennes, différences, pourcentages)
-3. **date_actuelle** : Connaître la date et l'heure actuelles
-4. **recherche_web** : Chercher des informations sur Internet
-5. **envoyer_email** : Envoyer un email (mode simulation par défaut)
-6. **generer_graphique** : Créer des graphiques (barres, camembert, ligne)
+2. **recherche_reglements_cegedim** : Chercher dans les règlements et procédures Cegedim
+3. **recherche_tous_corpus** : Chercher dans TOUS les documents en un seul appel (si plusieurs sources sont concernées)
+4. **calculatrice** : Faire des calculs (moyennes, différences, pourcentages)
+5. **date_actuelle** : Connaître la date et l'heure actuelles
+6. **recherche_web** : Chercher des informations sur Internet
+7. **envoyer_email** : Envoyer un email (mode simulation par défaut)
+8. **generer_graphique** : Créer des graphiques (barres, camembert, ligne)
 
 📋 **Règles** :
 - Utilise TOUJOURS l'outil de recherche pour répondre aux questions sur les rapports
 - Cite tes sources quand tu donnes des informations
 - Si tu fais des calculs, montre le détail
+- Si plusieurs outils indépendants sont utiles, appelle-les dans le même tour (ils s'exécutent en parallèle)
 - Pour les graphiques, utilise le format JSON : {"labels": [...], "valeurs": [...]}
 - Réponds en français de manière claire et structurée"""
 
 # Créer l'agent ReAct avec TOUS les outils + MÉMOIRE
 agent = create_react_agent(
     llm,
-    tous_les_outils,  # Tous les outils du package tools/
+    limiter_outils(tous_les_outils),  # Tous les outils du package tools/ (appels parallèles limités)
     prompt=system_message,
     checkpointer=memory  # 🧠 Active la mémoire !
 )
@@ -101,7 +111,10 @@ def poser_question(question: str, thread_id: str = "default") -> str:
     messages = [{"role": "user", "content": question}]
     
     # 🧠 On passe le thread_id pour que l'agent se souvienne de la conversation
-    config = {"configurable": {"thread_id": thread_id}}
+    # 🪙 Le suivi des tokens reçoit les comptes publiés par les outils RAG
+    # 🔀 max_concurrency : taille du pool qui exécute les outils d'un même tour
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [suivi_tokens],
+              "max_concurrency": CONCURRENCE_MAX}
     result = agent.invoke({"messages": messages}, config=config)
     
     reponse = result["messages"][-1].content
@@ -131,6 +144,9 @@ if __name__ == "__main__":
     # Test 3 : Test de la MÉMOIRE ! 🧠
     poser_question("Quel était le résultat du calcul précédent ?", TEST_THREAD)
     
+    if suivi_tokens.appels:
+        print(f"\n🪙 Tokens des outils RAG :\n{suivi_tokens.resume()}")
+    
     # ═══════════════════════════════════════════════════════════════════════
     # 💬 MODE INTERACTIF (avec mémoire)
     # ═══════════════════════════════════════════════════════════════════════
@@ -35,7 +35,10 @@ from tools import (
     # recherche_web,                # 🌐 Web (optionnel - nécessite duckduckgo-search)
     # envoyer_email,                # 📧 Email (optionnel)
     # generer_graphique,            # 📊 Graphiques (optionnel - nécessite matplotlib)
+    registre,                       # 🗂️ Registre des index RAG
 )
+from tools.rag_cegedim import cache_requetes as cache_requetes_cegedim  # 🧠 Compteurs du cache
+from tools.appels_paralleles import limiter_outils, CONCURRENCE_MAX  # 🔀 Outils d'un même tour en parallèle
 
 load_dotenv()
 
@@ -46,6 +49,9 @@ TOOLS_ACTIFS = [
     date_actuelle,
 ]
 
+# Corpus RAG utilisés par les outils actifs (préchauffés au démarrage)
+CORPUS_ACTIFS = ["cegedim"]
+
 # ═══════════════════════════════════════════════════════════════════════════
 # ⚙️ CONFIGURATION DE LA PAGE
 # ═══════════════════════════════════════════════════════════════════════════
@@ -64,6 +70,12 @@ st.set_page_config(
 def create_agent():
     """Crée l'agent avec sa mémoire (cached = créé une seule fois)."""
     
+    # 🔥 On lance le chargement des index RAG en arrière-plan dès maintenant :
+    # le premier utilisateur n'attend plus la construction dans agent.invoke.
+    # Une question posée pendant le chargement attend ce même chargement
+    # (le registre ne construit jamais deux fois le même index).
+    registre.prechauffer(CORPUS_ACTIFS, en_arriere_plan=True)
+    
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
     memory = MemorySaver()
     
@@ -82,7 +94,7 @@ def create_agent():
     
     agent = create_react_agent(
         llm,
-        TOOLS_ACTIFS,
+        limiter_outils(TOOLS_ACTIFS),  # appels parallèles, avec une limite par outil
         prompt=system_prompt,
         checkpointer=memory
     )
@@ -120,6 +132,30 @@ with st.sidebar:
     
     st.divider()
     
+    # Index RAG : rafraîchi toutes les 2 secondes tant qu'ils ne sont pas tous prêts.
+    # run_every n'est lu qu'au run complet du script : quand le dernier index
+    # devient prêt, le fragment relance toute l'app pour arrêter le polling.
+    en_chargement = not registre.tous_prets(CORPUS_ACTIFS)
+    
+    @st.fragment(run_every=2 if en_chargement else None)
+    def afficher_index():
+        st.subheader("📚 Index RAG")
+        statut = registre.statut(avec_memoire=False)
+        for nom in CORPUS_ACTIFS:
+            etat = statut[nom]
+            if etat["etat"] == "prêt":
+                st.write(f"✅ {nom} : prêt ({etat['duree_init']:.1f}s)")
+            elif etat["etat"] == "erreur":
+                st.write(f"❌ {nom} : {etat['erreur']}")
+            else:
+                st.write(f"⏳ {nom} : chargement en cours...")
+        if en_chargement and registre.tous_prets(CORPUS_ACTIFS):
+            st.rerun()
+    
+    afficher_index()
+    
+    st.divider()
+    
     if st.button("🔄 Nouvelle conversation", use_container_width=True):
         st.session_state.thread_id = str(uuid.uuid4())[:8]
         st.session_state.display_messages = []
@@ -127,6 +163,9 @@ with st.sidebar:
     
     st.divider()
     
+    stats = cache_requetes_cegedim.stats()
+    st.caption(f"🧠 Cache requêtes : {stats['taux_hit']:.0%} de hits "
+               f"({stats['hits_exacts']} exacts, {stats['hits_semantiques']} proches, {stats['misses']} misses)")
     st.caption("📚 Sources : DocARag3/")
     st.caption("🧠 Mémoire : LangGraph MemorySaver")
 
@@ -170,7 +209,8 @@ if prompt := st.chat_input("Tape ta question..."):
     with st.chat_message("assistant"):
         with st.spinner("🤔 Recherche dans les règlements..."):
             
-            config = {"configurable": {"thread_id": st.session_state.thread_id}}
+            config = {"configurable": {"thread_id": st.session_state.thread_id},
+                      "max_concurrency": CONCURRENCE_MAX}
             
             result = agent.invoke(
                 {"messages": [{"role": "user", "content": prompt}]},
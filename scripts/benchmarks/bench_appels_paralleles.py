@@ -0,0 +1,119 @@
+"""
+⏱️ Benchmark : appels d'outils parallèles dans un tour de l'agent
+================================================================
+
+Un tour d'agent où le LLM demande plusieurs outils à la fois (recherche
+Clinitex + recherche web + calcul...), rejoué sur le ToolNode de
+create_react_agent avec de faux outils dont la latence est simulée
+(time.sleep en sync, asyncio.sleep en async) :
+- un appel après l'autre (max_concurrency=1) : la somme des latences
+- en parallèle, sync (pool de threads) et async (asyncio), avec limiter_outils
+- 3 emails dans le même tour, limités à 1 à la fois : ils passent l'un après l'autre
+
+Vérifie au passage que les ToolMessages sont dans l'ordre des tool_calls.
+
+Pour lancer : python scripts/benchmarks/bench_appels_paralleles.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.prebuilt import ToolNode
+from tools.appels_paralleles import limiter_outils
+
+# Latences simulées (secondes)
+LATENCES = {
+    "recherche_rapports_clinitex": 0.40,
+    "recherche_reglements_cegedim": 0.25,
+    "recherche_web": 0.60,
+    "calculatrice": 0.01,
+    "envoyer_email": 0.30,
+}
+LIMITES = {"envoyer_email": 1}
+CONCURRENCE = 8
+
+
+def faux_outil(nom: str, latence: float) -> StructuredTool:
+    def func(entree: str) -> str:
+        time.sleep(latence)
+        return f"{nom}({entree})"
+
+    async def coroutine(entree: str) -> str:
+        await asyncio.sleep(latence)
+        return f"{nom}({entree})"
+
+    return StructuredTool.from_function(func=func, coroutine=coroutine, name=nom,
+                                        description=f"Faux outil {nom} ({latence * 1000:.0f} ms)")
+
+
+def tour(appels: list[str]) -> dict:
+    """Message du LLM qui demande tous ces outils dans le même tour."""
+    tool_calls = [{"name": nom, "args": {"entree": str(i)}, "id": f"appel_{i}", "type": "tool_call"}
+                  for i, nom in enumerate(appels)]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def graphe_outils(outils: list):
+    """Le nœud "tools" de create_react_agent, seul dans un graphe."""
+    graphe = StateGraph(MessagesState)
+    graphe.add_node("tools", ToolNode(outils))
+    graphe.add_edge(START, "tools")
+    graphe.add_edge("tools", END)
+    return graphe.compile()
+
+
+def verifier_ordre(entree: dict, sortie: dict):
+    attendus = [appel["id"] for appel in entree["messages"][-1].tool_calls]
+    assert [m.tool_call_id for m in sortie["messages"][1:]] == attendus, "résultats dans le désordre !"
+
+
+def chronometrer_sync(noeud, entree: dict, max_concurrency: int) -> float:
+    debut = time.perf_counter()
+    sortie = noeud.invoke(entree, config={"max_concurrency": max_concurrency})
+    duree = time.perf_counter() - debut
+    verifier_ordre(entree, sortie)
+    return duree
+
+
+def chronometrer_async(noeud, entree: dict) -> float:
+    async def lancer():
+        debut = time.perf_counter()
+        sortie = await noeud.ainvoke(entree)
+        return time.perf_counter() - debut, sortie
+
+    duree, sortie = asyncio.run(lancer())
+    verifier_ordre(entree, sortie)
+    return duree
+
+
+if __name__ == "__main__":
+    outils = [faux_outil(nom, latence) for nom, latence in LATENCES.items()]
+    noeud = graphe_outils(limiter_outils(outils, limites=LIMITES, concurrence=CONCURRENCE))
+
+    scenarios = {
+        "clinitex + web + calcul": ["recherche_rapports_clinitex", "recherche_web", "calculatrice"],
+        "2 corpus + web + 2 calculs": ["recherche_rapports_clinitex", "recherche_reglements_cegedim",
+                                       "recherche_web", "calculatrice", "calculatrice"],
+        "3 emails (limite 1)": ["envoyer_email"] * 3,
+    }
+
+    print("=" * 78)
+    print(f"⏱️ Appels d'outils d'un même tour (limites {LIMITES}, {CONCURRENCE} appels max)")
+    print("=" * 78)
+    print(f"   {'tour':<28} {'somme':>8} {'max':>8} {'1 à 1':>9} {'sync':>9} {'async':>9}")
+    for nom, appels in scenarios.items():
+        entree = tour(appels)
+        somme = sum(LATENCES[a] for a in appels)
+        plus_lent = max(LATENCES[a] for a in appels)
+        t_sequentiel = chronometrer_sync(noeud, entree, max_concurrency=1)
+        t_sync = chronometrer_sync(noeud, entree, max_concurrency=CONCURRENCE)
+        t_async = chronometrer_async(noeud, entree)
+        print(f"   {nom:<28} {somme:6.2f} s {plus_lent:6.2f} s {t_sequentiel:7.2f} s {t_sync:7.2f} s {t_async:7.2f} s")
+    print("\n   ✅ ToolMessages dans l'ordre des tool_calls (sync et async)")
@@ -0,0 +1,105 @@
+"""
+⏱️ Benchmark : tokens envoyés au LLM avec et sans recollage des chunks voisins
+==============================================================================
+
+Rejoue le formatage des outils RAG ("[Source: ...]" + texte des chunks) sur un
+corpus synthétique découpé comme les rapports Clinitex (1000 / 200, avec
+add_start_index), et compte les tokens (tiktoken cl100k_base) de la sortie :
+- chunks bruts (avant)
+- après assembler_chunks() (tools/assemblage_contexte.py)
+
+La recherche est faite par BM25 (aucun appel à OpenAI). Deux familles de
+questions :
+- ciblées : sur le sujet propre à une page (un site, un service) → comme en
+  recherche vectorielle, les chunks voisins de cette page remontent ensemble
+- générales : sur un thème présent dans tous les rapports → chunks dispersés
+
+Pour lancer : python scripts/benchmarks/bench_assemblage.py
+"""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tools.recherche_hybride import IndexBM25
+from tools.assemblage_contexte import assembler_chunks
+from tools.pipeline_embeddings import compter_tokens
+
+NB_RAPPORTS = 4
+NB_PAGES = 12
+NB_REQUETES = 200
+K = 4
+
+THEMES = ["gouvernance", "cybersécurité", "cloud", "données", "formation", "outils collaboratifs",
+          "CRM", "ERP", "télétravail", "automatisation", "site web", "support informatique"]
+SITES = ["Lyon", "Nantes", "Lille", "Bordeaux", "Rennes", "Toulouse", "Marseille", "Strasbourg",
+         "Grenoble", "Dijon", "Nice", "Brest"]
+SERVICES = ["comptabilité", "logistique", "achats", "accueil"]
+FORMULES = ["Le niveau de maturité sur le thème {t} est jugé {n}.",
+            "Les équipes signalent des difficultés liées à {t}, en particulier pour les managers.",
+            "Une recommandation prioritaire concerne {t} : formaliser un plan d'action sur six mois.",
+            "Les points forts observés autour de {t} reposent sur l'implication de la direction.",
+            "Un axe d'amélioration sur {t} consiste à mesurer les usages avec des indicateurs simples.",
+            "Sur le site de {s}, le thème {t} a été audité avec les équipes locales."]
+
+
+def format_outil(documents: list[Document]) -> str:
+    """Même mise en forme que recherche_rapports_clinitex."""
+    resultats = [f"[Source: {os.path.basename(d.metadata['source'])}]\n{d.page_content}" for d in documents]
+    return "Informations trouvées dans les rapports :\n\n" + "\n\n---\n\n".join(resultats)
+
+
+def corpus_synthetique(graine: int = 0) -> list[Document]:
+    """Pages de rapports : un thème et un site par page, des phrases variées."""
+    rng = random.Random(graine)
+    pages = []
+    for r in range(NB_RAPPORTS):
+        for p in range(NB_PAGES):
+            theme, site = THEMES[(r + p) % len(THEMES)], f"{SITES[p]} ({SERVICES[r]})"
+            phrases = [rng.choice(FORMULES).format(t=theme if rng.random() < 0.7 else rng.choice(THEMES),
+                                                   n=rng.choice(["faible", "moyen", "bon"]), s=site)
+                       for _ in range(40)]
+            texte = "\n\n".join(" ".join(phrases[i:i + 2]) for i in range(0, len(phrases), 2))
+            pages.append(Document(page_content=texte, metadata={"source": f"DocArag2/rapport_{r}.pdf", "page": p}))
+    return pages
+
+
+def mesurer(bm25, documents, questions) -> tuple[float, float, float]:
+    """Tokens moyens par appel avant / après recollage, et chunks recollés par appel."""
+    avant = apres = recolles = 0
+    for question in questions:
+        trouves = [documents[i] for i, _ in bm25.rechercher(question, k=K)]
+        assembles = assembler_chunks(trouves)
+        avant += compter_tokens(format_outil(trouves))
+        apres += compter_tokens(format_outil(assembles))
+        recolles += len(trouves) - len(assembles)
+    return avant / len(questions), apres / len(questions), recolles / len(questions)
+
+
+if __name__ == "__main__":
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200,
+                                              separators=["\n\n", "\n", ". ", " ", ""], add_start_index=True)
+    chunks = splitter.split_documents(corpus_synthetique())
+    documents = {f"c{i}": chunk for i, chunk in enumerate(chunks)}
+    bm25 = IndexBM25.depuis_documents(documents)
+
+    rng = random.Random(1)
+    questions = {
+        "ciblées": [f"Qu'a montré l'audit {rng.choice(SERVICES)} sur le site de {rng.choice(SITES)} ?"
+                    for _ in range(NB_REQUETES)],
+        "générales": [f"Que disent les rapports sur {rng.choice(THEMES)} et les "
+                      f"{rng.choice(['recommandations', 'points forts', 'axes d amélioration'])} ?"
+                      for _ in range(NB_REQUETES)],
+    }
+
+    print("=" * 70)
+    print(f"⏱️ {len(chunks)} chunks (1000 / 200), {NB_REQUETES} requêtes par famille, k={K}")
+    print("=" * 70)
+    print(f"   {'questions':<10} {'tokens bruts':>13} {'recollés':>10} {'gain':>7} {'recollages/appel':>17}")
+    for famille, liste in questions.items():
+        avant, apres, recolles = mesurer(bm25, documents, liste)
+        print(f"   {famille:<10} {avant:13.1f} {apres:10.1f} {1 - apres / avant:6.1%} {recolles:17.2f}")
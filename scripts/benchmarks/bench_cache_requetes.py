@@ -0,0 +1,110 @@
+"""
+⏱️ Benchmark : faux hits du cache sémantique de requêtes
+=========================================================
+
+CacheRequetes (tools/cache_requetes.py) sert une question déjà posée si son
+embedding est assez proche. Deux questions qui ne diffèrent que d'un mot
+décisif sont pourtant très proches en cosinus, souvent plus que deux vraies
+reformulations :
+- "durée de la période d'essai d'un CDI" / "... d'un CDD"
+- "congés payés en 2023" / "... en 2024"
+- "salarié cadre" / "salarié non cadre"
+
+Pour chaque paire (question en cache, question posée) et plusieurs seuils :
+- cosinus seul : hit si cosinus ≥ seuil (ancien comportement)
+- CacheRequetes : cosinus ≥ seuil ET mêmes termes clés
+
+Les embeddings sont des trigrammes de caractères hachés (aucun appel à
+OpenAI) : comme avec un vrai modèle, un mot changé dans une question courte
+coûte peu de similarité.
+
+Pour lancer : python scripts/benchmarks/bench_cache_requetes.py
+"""
+
+import os
+import sys
+import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from tools.cache_requetes import CacheRequetes, normaliser
+from tools.recherche_hybride import creer_retriever
+
+DIMENSION = 1024
+SEUILS = [0.75, 0.80, 0.90, 0.95, 0.97]
+
+# Même sens, mots différents : doivent pouvoir être servis depuis le cache
+REFORMULATIONS = [
+    ("Quelle est la durée de la période d'essai d'un CDI ?", "Durée de la période d'essai pour un CDI ?"),
+    ("Combien de jours de congés payés ?", "combien de jours de congé payé"),
+    ("Quel est le délai de prévenance ?", "Délai de prévenance ?"),
+]
+# Un mot change la réponse : ne doivent JAMAIS être servies depuis le cache
+QUASI_HOMONYMES = [
+    ("Quelle est la durée de la période d'essai d'un CDI ?", "Quelle est la durée de la période d'essai d'un CDD ?"),
+    ("durée période d'essai CDI", "durée période d'essai CDD"),
+    ("Combien de jours de congés payés en 2023 ?", "Combien de jours de congés payés en 2024 ?"),
+    ("Quel est le délai de prévenance pour un salarié cadre ?",
+     "Quel est le délai de prévenance pour un salarié non cadre ?"),
+]
+
+
+class Trigrammes(Embeddings):
+    """Embeddings déterministes : trigrammes de caractères hachés dans DIMENSION composantes."""
+
+    def _vecteur(self, texte: str) -> list[float]:
+        texte = f"  {normaliser(texte)}  "
+        vecteur = np.zeros(DIMENSION, dtype="float32")
+        for i in range(len(texte) - 2):
+            vecteur[int(hashlib.md5(texte[i:i + 3].encode()).hexdigest(), 16) % DIMENSION] += 1.0
+        return (vecteur / (np.linalg.norm(vecteur) or 1.0)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vecteur(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vecteur(text)
+
+
+def cosinus(embeddings: Embeddings, a: str, b: str) -> float:
+    return float(np.dot(embeddings.embed_query(a), embeddings.embed_query(b)))
+
+
+def hit_cache(retriever, seuil: float, en_cache: str, posee: str) -> bool:
+    """Vrai si `posee` est servie depuis le cache après `en_cache`."""
+    cache = CacheRequetes("bench", seuil=seuil)
+    cache.rechercher(en_cache, retriever)
+    cache.rechercher(posee, retriever)
+    return cache.hits_semantiques == 1
+
+
+if __name__ == "__main__":
+    embeddings = Trigrammes()
+    documents = [Document(page_content=f"Règle RH numéro {i}", metadata={"source": f"rh/doc_{i}.md"})
+                 for i in range(20)]
+    retriever = creer_retriever(FAISS.from_documents(documents, embeddings), k=4, mode="vecteur")
+
+    print("=" * 72)
+    print(f"⏱️ {len(REFORMULATIONS)} reformulations, {len(QUASI_HOMONYMES)} quasi-homonymes (un mot décisif change)")
+    print("=" * 72)
+    for nom, paires in (("reformulations", REFORMULATIONS), ("quasi-homonymes", QUASI_HOMONYMES)):
+        print(f"\n   {nom} :")
+        for a, b in paires:
+            print(f"      {cosinus(embeddings, a, b):.3f}  {a}  →  {b}")
+
+    print(f"\n   {'seuil':>6} | {'reformulations servies':>24} | {'faux hits (cosinus seul)':>25} | {'faux hits (cache)':>18}")
+    faux_hits = {}
+    for seuil in SEUILS:
+        reformulations = sum(hit_cache(retriever, seuil, a, b) for a, b in REFORMULATIONS)
+        cosinus_seul = sum(cosinus(embeddings, a, b) >= seuil for a, b in QUASI_HOMONYMES)
+        faux_hits[seuil] = sum(hit_cache(retriever, seuil, a, b) for a, b in QUASI_HOMONYMES)
+        print(f"   {seuil:>6.2f} | {reformulations:>20}/{len(REFORMULATIONS)}"
+              f"   | {cosinus_seul:>21}/{len(QUASI_HOMONYMES)}   | {faux_hits[seuil]:>14}/{len(QUASI_HOMONYMES)}")
+
+    assert not any(faux_hits.values()), "une question voisine mais différente est servie depuis le cache !"
+    assert hit_cache(retriever, SEUILS[0], *REFORMULATIONS[0]), "une reformulation n'est plus servie"
+    print("\n   ✅ Aucun quasi-homonyme servi depuis le cache, quel que soit le seuil")
@@ -0,0 +1,90 @@
+"""
+⏱️ Benchmark : découpage des pages, LangChain vs DecoupeurRapide
+===============================================================
+
+Découpe un corpus synthétique de pages "façon PyPDF" (lignes de ~80 caractères
+séparées par "\n", y compris entre paragraphes, comme le texte extrait des PDFs) avec les paramètres des corpus Clinitex (1000 / 200)
+et Cegedim (500 / 100) :
+- RecursiveCharacterTextSplitter (LangChain)
+- DecoupeurRapide
+
+Chaque mesure est le minimum de REPETITIONS passages. Vérifie au passage que
+les chunks (texte + start_index) sont identiques.
+
+Pour lancer : python scripts/benchmarks/bench_decoupage.py [--pages 3000]
+"""
+
+import gc
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tools.decoupage_rapide import DecoupeurRapide
+
+SEPARATEURS = ["\n\n", "\n", ". ", " ", ""]
+REPETITIONS = 3
+CONFIGURATIONS = {"clinitex (1000 / 200)": (1000, 200), "cegedim (500 / 100)": (500, 100)}
+MOTS = ("maturité digitale gouvernance données cybersécurité équipe direction recommandation outil "
+        "processus formation client collaborateur plateforme indicateur usage sécurité projet").split()
+
+
+def page_synthetique(rng: random.Random) -> str:
+    """Une page de PDF extraite : lignes coupées à ~80 caractères, paragraphes sans ligne vide."""
+    paragraphes = []
+    for _ in range(rng.randint(3, 8)):
+        phrases = [" ".join(rng.choice(MOTS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                   for _ in range(rng.randint(2, 6))]
+        texte, lignes, ligne = " ".join(phrases), [], ""
+        for mot in texte.split(" "):
+            if len(ligne) + len(mot) > 80:
+                lignes.append(ligne)
+                ligne = ""
+            ligne = f"{ligne} {mot}" if ligne else mot
+        lignes.append(ligne)
+        paragraphes.append("\n".join(lignes))
+    return "\n".join(paragraphes)
+
+
+def chronometrer(splitter, pages: list[Document], repetitions: int = REPETITIONS) -> tuple[float, list[Document]]:
+    """Meilleur temps de découpage des pages une par une (comme decouper_en_flux)."""
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        gc.collect()  # les chunks des mesures précédentes ne pèsent pas sur celle-ci
+        debut = time.perf_counter()
+        chunks = [chunk for page in pages for chunk in splitter.split_documents([page])]
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur, chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [Document(page_content=page_synthetique(rng), metadata={"source": "rapport.pdf", "page": i})
+             for i in range(args.pages)]
+    taille = sum(len(p.page_content) for p in pages)
+
+    print("=" * 78)
+    print(f"⏱️ Découpage de {len(pages)} pages ({taille / 1e6:.1f} M caractères)")
+    print("=" * 78)
+    print(f"   {'configuration':<24} {'LangChain':>10} {'rapide':>10}")
+
+    for nom, (chunk_size, chunk_overlap) in CONFIGURATIONS.items():
+        params = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                  "separators": SEPARATEURS, "add_start_index": True}
+        t_langchain, attendus = chronometrer(RecursiveCharacterTextSplitter(**params), pages)
+        t_rapide, chunks = chronometrer(DecoupeurRapide(**params), pages)
+
+        assert [(c.page_content, c.metadata) for c in chunks] == \
+               [(c.page_content, c.metadata) for c in attendus], "chunks différents de LangChain !"
+        print(f"   {nom:<24} {t_langchain:8.2f} s {t_rapide:8.2f} s"
+              f"   ({len(attendus)} chunks, x{t_langchain / t_rapide:.1f})")
+    print("\n   ✅ Chunks identiques à RecursiveCharacterTextSplitter (texte et start_index)")
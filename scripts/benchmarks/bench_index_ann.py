@@ -0,0 +1,109 @@
+"""
+⏱️ Benchmark : index approximatifs (IVF / HNSW / PQ) contre l'index Flat
+========================================================================
+
+Pour chaque configuration (description faiss.index_factory) :
+- rappel@k : part des k voisins exacts (index Flat) retrouvés
+- latence p50 / p99 d'une requête (une question à la fois, comme l'outil RAG)
+- taille de l'index sérialisé
+- temps de construction (entraînement + ajout)
+
+Par défaut, les vecteurs sont synthétiques (groupés, comme des embeddings de
+chunks proches). Avec --artefact, on utilise les vrais vecteurs d'un index
+sauvegardé par index_persistant (dossier contenant index.faiss).
+
+Pour lancer :
+    python scripts/benchmarks/bench_index_ann.py
+    python scripts/benchmarks/bench_index_ann.py --artefact scripts/.rag_cache/cegedim/<version>
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.index_ann import construire_index
+
+NB_VECTEURS = 20000
+DIMENSION = 256
+NB_GROUPES = 200
+NB_REQUETES = 500
+K = 4
+CONFIGURATIONS = ["Flat", "IVF256,Flat", "HNSW32", "IVF256,PQ32", "IVF256,SQ8"]
+
+
+def vecteurs_synthetiques(n: int, d: int, graine: int = 0) -> np.ndarray:
+    """Vecteurs normés répartis autour de NB_GROUPES centres."""
+    rng = np.random.default_rng(graine)
+    centres = rng.standard_normal((NB_GROUPES, d)).astype("float32")
+    vecteurs = centres[rng.integers(0, NB_GROUPES, n)] + 0.5 * rng.standard_normal((n, d)).astype("float32")
+    return vecteurs / np.linalg.norm(vecteurs, axis=1, keepdims=True)
+
+
+def requetes_proches(vecteurs: np.ndarray, n: int, graine: int = 1) -> np.ndarray:
+    """Questions simulées : des vecteurs du corpus légèrement bruités."""
+    rng = np.random.default_rng(graine)
+    requetes = vecteurs[rng.integers(0, len(vecteurs), n)]
+    requetes = requetes + 0.1 * rng.standard_normal(requetes.shape).astype("float32")
+    return np.ascontiguousarray(requetes / np.linalg.norm(requetes, axis=1, keepdims=True), dtype="float32")
+
+
+def mesurer(index, requetes: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Recherche requête par requête : (ids trouvés, latences en secondes)."""
+    ids = np.empty((len(requetes), k), dtype="int64")
+    latences = np.empty(len(requetes))
+    for i, requete in enumerate(requetes):
+        debut = time.perf_counter()
+        _, ids[i] = index.search(requete[None, :], k)
+        latences[i] = time.perf_counter() - debut
+    return ids, latences
+
+
+def rappel(ids: np.ndarray, ids_exacts: np.ndarray) -> float:
+    trouves = sum(len(set(a) & set(b)) for a, b in zip(ids, ids_exacts))
+    return trouves / ids_exacts.size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--artefact", help="dossier d'un index sauvegardé (index.faiss)")
+    parser.add_argument("--configurations", nargs="+", default=CONFIGURATIONS)
+    parser.add_argument("-k", type=int, default=K)
+    args = parser.parse_args()
+
+    if args.artefact:
+        index_plat = faiss.read_index(os.path.join(args.artefact, "index.faiss"))
+        vecteurs = index_plat.reconstruct_n(0, index_plat.ntotal)
+        source = args.artefact
+    else:
+        vecteurs = vecteurs_synthetiques(NB_VECTEURS, DIMENSION)
+        source = "vecteurs synthétiques"
+    requetes = requetes_proches(vecteurs, NB_REQUETES)
+
+    print("=" * 78)
+    print(f"⏱️ {len(vecteurs)} vecteurs de dimension {vecteurs.shape[1]} ({source}), "
+          f"{len(requetes)} requêtes, k={args.k}")
+    print("=" * 78)
+    print(f"   {'configuration':<16} {'rappel@k':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'taille (Mo)':>12} {'construction':>13}")
+
+    ids_exacts = None
+    for configuration in ["Flat"] + [c for c in args.configurations if c != "Flat"]:
+        debut = time.perf_counter()
+        try:
+            index = construire_index(vecteurs, configuration)
+        except RuntimeError as e:
+            print(f"   {configuration:<16} ❌ {str(e).splitlines()[0]}")
+            continue
+        duree = time.perf_counter() - debut
+        ids, latences = mesurer(index, requetes, args.k)
+        if ids_exacts is None:
+            ids_exacts = ids
+        taille = faiss.serialize_index(index).nbytes / 1e6
+        print(f"   {configuration:<16} {rappel(ids, ids_exacts):9.3f} "
+              f"{np.percentile(latences, 50) * 1000:9.3f} {np.percentile(latences, 99) * 1000:9.3f} "
+              f"{taille:12.1f} {duree:12.2f}s")
@@ -0,0 +1,64 @@
+"""
+⏱️ Benchmark : coût de la diversification MMR par requête
+=========================================================
+
+Mesure le temps AJOUTÉ par le mode "mmr" (tools/recherche_hybride.py) à une
+recherche vectorielle : relecture des fetch_k vecteurs candidats dans l'index
++ sélection MMR vectorisée (NumPy). Comparaison avec la version en boucle de
+LangChain (maximal_marginal_relevance) sur les mêmes candidats.
+
+Dimension 1536 (text-embedding-ada-002), k=4. Objectif : < 1 ms à fetch_k=50.
+
+Pour lancer : python scripts/benchmarks/bench_mmr.py
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from tools.recherche_hybride import mmr, vecteurs_par_position
+from bench_index_ann import vecteurs_synthetiques, requetes_proches
+
+NB_VECTEURS = 20000
+DIMENSION = 1536
+NB_REQUETES = 300
+K = 4
+LAMBDA = 0.5
+
+
+def chronometrer(fonction, requetes, candidats_par_requete) -> np.ndarray:
+    """Durée (s) de fonction(requête, positions candidates) pour chaque requête."""
+    durees = np.empty(len(requetes))
+    for i, (requete, candidats) in enumerate(zip(requetes, candidats_par_requete)):
+        debut = time.perf_counter()
+        fonction(requete, candidats)
+        durees[i] = time.perf_counter() - debut
+    return durees
+
+
+if __name__ == "__main__":
+    vecteurs = vecteurs_synthetiques(NB_VECTEURS, DIMENSION)
+    index = faiss.IndexFlatL2(DIMENSION)
+    index.add(vecteurs)
+    requetes = requetes_proches(vecteurs, NB_REQUETES)
+
+    print("=" * 72)
+    print(f"⏱️ MMR sur {NB_VECTEURS} vecteurs de dimension {DIMENSION}, k={K}, λ={LAMBDA}, {NB_REQUETES} requêtes")
+    print("=" * 72)
+    print(f"   {'fetch_k':>7} {'recherche p50':>14} {'MMR NumPy p50':>14} {'p99':>9} {'MMR boucle p50':>15}")
+
+    for fetch_k in (20, 50, 100):
+        _, trouves = index.search(requetes, fetch_k)
+        durees_recherche = chronometrer(lambda r, c: index.search(r[None, :], fetch_k), requetes, trouves)
+        durees_numpy = chronometrer(
+            lambda r, c: mmr(r, vecteurs_par_position(index, c), K, LAMBDA), requetes, trouves)
+        durees_boucle = chronometrer(
+            lambda r, c: maximal_marginal_relevance(r, vecteurs_par_position(index, c), LAMBDA, K), requetes, trouves)
+        print(f"   {fetch_k:7d} {np.percentile(durees_recherche, 50) * 1000:11.3f} ms "
+              f"{np.percentile(durees_numpy, 50) * 1000:11.3f} ms {np.percentile(durees_numpy, 99) * 1000:6.3f} ms "
+              f"{np.percentile(durees_boucle, 50) * 1000:12.3f} ms")
@@ -0,0 +1,126 @@
+"""
+⏱️ Benchmark : pipeline d'embeddings par lots concurrents
+=========================================================
+
+Compare FAISS.from_documents (naïf) au pipeline tools/pipeline_embeddings.py,
+contre un FAUX serveur d'embeddings local compatible avec l'API OpenAI :
+- latence simulée par requête et par texte
+- quota de requêtes simultanées → réponses 429 au-delà
+
+Aucun appel réel à OpenAI, aucune clé API nécessaire.
+
+Pour lancer : python scripts/benchmarks/bench_pipeline_embeddings.py
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
+from tools.pipeline_embeddings import indexer_par_lots
+
+DIMENSION = 64
+LATENCE_REQUETE = 0.05     # 50 ms par requête
+LATENCE_TEXTE = 0.0005     # + 0,5 ms par texte
+QUOTA_SIMULTANE = 6        # au-delà → 429
+NB_CHUNKS = 2000
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 🧪 FAUX SERVEUR D'EMBEDDINGS (API OpenAI /v1/embeddings)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class FauxServeur(BaseHTTPRequestHandler):
+    en_vol = 0
+    nb_429 = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _repondre(self, statut: int, corps: dict, entetes: dict | None = None):
+        donnees = json.dumps(corps).encode("utf-8")
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(donnees)))
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(donnees)
+
+    def do_POST(self):
+        requete = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with FauxServeur.lock:
+            if FauxServeur.en_vol >= QUOTA_SIMULTANE:
+                FauxServeur.nb_429 += 1
+                self._repondre(429, {"error": {"message": "Rate limit", "type": "requests"}}, {"Retry-After": "0.1"})
+                return
+            FauxServeur.en_vol += 1
+        try:
+            textes = requete["input"]
+            time.sleep(LATENCE_REQUETE + LATENCE_TEXTE * len(textes))
+            data = []
+            for i, texte in enumerate(textes):
+                graine = hashlib.sha256(str(texte).encode("utf-8")).digest()
+                vecteur = array("f", [(graine[j % 32] - 128) / 128 for j in range(DIMENSION)])
+                if requete.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vecteur.tobytes()).decode("ascii")
+                else:
+                    embedding = vecteur.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            self._repondre(200, {"object": "list", "data": data, "model": requete.get("model"),
+                                 "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+        finally:
+            with FauxServeur.lock:
+                FauxServeur.en_vol -= 1
+
+
+def demarrer_serveur() -> ThreadingHTTPServer:
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), FauxServeur)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 🚀 BENCHMARK
+# ═══════════════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    serveur = demarrer_serveur()
+    url = f"http://127.0.0.1:{serveur.server_address[1]}/v1"
+
+    def faux_embeddings(max_retries: int):
+        return OpenAIEmbeddings(base_url=url, api_key="fake", check_embedding_ctx_length=False,
+                                max_retries=max_retries)
+
+    chunks = [Document(page_content=f"Chunk numéro {i} du rapport de maturité. " * 8,
+                       metadata={"source": f"rapport_{i % 4}.pdf"}) for i in range(NB_CHUNKS)]
+
+    print("=" * 70)
+    print(f"⏱️ {NB_CHUNKS} chunks, latence {LATENCE_REQUETE * 1000:.0f} ms/requête, "
+          f"quota {QUOTA_SIMULTANE} requêtes simultanées")
+    print("=" * 70)
+
+    debut = time.perf_counter()
+    naif = FAISS.from_documents(chunks, faux_embeddings(max_retries=2))
+    print(f"   FAISS.from_documents (naïf)       : {time.perf_counter() - debut:6.2f}s "
+          f"({naif.index.ntotal} vecteurs)")
+
+    for concurrence in (1, 4, 8, 16):
+        FauxServeur.nb_429 = 0
+        debut = time.perf_counter()
+        vs = indexer_par_lots(chunks, faux_embeddings(max_retries=0), concurrence=concurrence, max_textes=64)
+        print(f"   pipeline (concurrence={concurrence:2d}, lots de 64) : {time.perf_counter() - debut:6.2f}s "
+              f"({vs.index.ntotal} vecteurs, {FauxServeur.nb_429} réponse(s) 429)")
+
+    serveur.shutdown()
@@ -0,0 +1,77 @@
+"""
+⏱️ Benchmark : stockage quantifié (float16 / int8) avec ou sans reclassement exact
+=================================================================================
+
+Pour chaque mode :
+- taille de l'index gardé en mémoire (le fichier float32 du reclassement est
+  lu en mémoire mappée : il reste sur le disque / dans le cache du système)
+- latence p50 / p99 d'une requête
+- rappel@k par rapport à la recherche exacte (Flat)
+
+Vecteurs synthétiques de dimension 1536 (comme text-embedding-ada-002), ou
+vrais vecteurs d'un artefact avec --artefact.
+
+Pour lancer :
+    python scripts/benchmarks/bench_quantification.py
+    python scripts/benchmarks/bench_quantification.py --artefact scripts/.rag_cache/clinitex/<version>
+"""
+
+import os
+import sys
+import tempfile
+import argparse
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.index_ann import construire_index, avec_reclassement
+from tools.stockage_chunks import lire_index_mmap
+from bench_index_ann import vecteurs_synthetiques, requetes_proches, mesurer, rappel
+
+NB_VECTEURS = 20000
+DIMENSION = 1536
+NB_REQUETES = 300
+K = 4
+# (description faiss.index_factory, facteur de reclassement)
+MODES = [("Flat", 0), ("SQfp16", 0), ("SQ8", 0), ("SQ8", 4), ("IVF256,SQ8", 0), ("IVF256,SQ8", 4)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--artefact", help="dossier d'un index sauvegardé (index.faiss)")
+    parser.add_argument("-k", type=int, default=K)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        if args.artefact:
+            chemin_exact = os.path.join(args.artefact, "index.faiss")
+            index_exact = faiss.read_index(chemin_exact)
+            vecteurs = index_exact.reconstruct_n(0, index_exact.ntotal)
+            source = args.artefact
+        else:
+            vecteurs = vecteurs_synthetiques(NB_VECTEURS, DIMENSION)
+            chemin_exact = os.path.join(dossier, "index.faiss")
+            faiss.write_index(construire_index(vecteurs, "Flat"), chemin_exact)
+            source = "vecteurs synthétiques"
+        requetes = requetes_proches(vecteurs, NB_REQUETES)
+
+        print("=" * 78)
+        print(f"⏱️ {len(vecteurs)} vecteurs de dimension {vecteurs.shape[1]} ({source}), "
+              f"{len(requetes)} requêtes, k={args.k}")
+        print("=" * 78)
+        print(f"   {'mode':<30} {'taille RAM (Mo)':>15} {'p50 (ms)':>9} {'p99 (ms)':>9} {'rappel@k':>9}")
+
+        ids_exacts = None
+        for type_index, facteur in MODES:
+            index = construire_index(vecteurs, type_index)
+            taille = faiss.serialize_index(index).nbytes / 1e6
+            nom = type_index
+            if facteur > 1:
+                index = avec_reclassement(index, lire_index_mmap(chemin_exact), facteur)
+                nom = f"{type_index} + reclassement x{facteur}"
+            ids, latences = mesurer(index, requetes, args.k)
+            if ids_exacts is None:
+                ids_exacts = ids
+            print(f"   {nom:<30} {taille:15.1f} {np.percentile(latences, 50) * 1000:9.3f} "
+                  f"{np.percentile(latences, 99) * 1000:9.3f} {rappel(ids, ids_exacts):9.3f}")
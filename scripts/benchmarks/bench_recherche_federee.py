@@ -0,0 +1,119 @@
+"""
+⏱️ Benchmark : fusion des corpus de la recherche fédérée
+========================================================
+
+Deux corpus synthétiques enregistrés dans le registre, sans aucun rapport
+entre eux :
+- "rh" : règles de congés, de paie, de période d'essai...
+- "informatique" : serveurs, sauvegardes, réseau...
+
+Des questions RH sont posées à rechercher_federe() (tools/recherche_federee.py),
+et on compte les extraits du top-k qui viennent du corpus informatique :
+- avant : fusion RRF sur le rang de chaque extrait dans SON corpus
+  (entrelacement des deux listes, quelle que soit la pertinence)
+- après : fusion sur la similarité cosinus avec la question
+
+Les embeddings sont un sac de mots haché (aucun appel à OpenAI) : deux textes
+sont proches s'ils partagent des mots, comme avec un vrai modèle sur ces corpus.
+
+Pour lancer : python scripts/benchmarks/bench_recherche_federee.py
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from tools.registre import registre
+from tools.recherche_hybride import creer_retriever, tokeniser
+from tools.recherche_federee import rechercher_federe, _rechercher_corpus
+
+DIMENSION = 256
+NB_DOCUMENTS = 200
+NB_REQUETES = 100
+K = 5
+
+SUJETS = {
+    "rh": ["congés payés", "période d'essai", "bulletin de paie", "heures supplémentaires",
+           "télétravail", "mutuelle", "prime annuelle", "arrêt maladie"],
+    "informatique": ["serveur de fichiers", "sauvegarde nocturne", "pare-feu", "annuaire LDAP",
+                     "supervision réseau", "mise à jour système", "base de données", "VPN"],
+}
+FORMULES = {
+    "rh": ["La règle sur {s} s'applique à tous les salariés du site.",
+           "Les conditions de {s} sont fixées par l'accord d'entreprise.",
+           "En cas de question sur {s}, contacter le service du personnel.",
+           "{s} : les délais sont rappelés aux salariés chaque année."],
+    "informatique": ["Le {s} est administré par l'équipe d'exploitation.",
+                     "Une panne du {s} déclenche une alerte d'astreinte.",
+                     "La configuration du {s} est versionnée dans le dépôt d'infrastructure.",
+                     "{s} : voir la fiche technique et le plan de reprise."],
+}
+
+
+class SacDeMots(Embeddings):
+    """Embeddings déterministes : mots hachés dans DIMENSION composantes."""
+
+    def _vecteur(self, texte: str) -> list[float]:
+        vecteur = np.zeros(DIMENSION, dtype="float32")
+        for mot in tokeniser(texte):
+            vecteur[int(hashlib.md5(mot.encode()).hexdigest(), 16) % DIMENSION] += 1.0
+        return (vecteur / (np.linalg.norm(vecteur) or 1.0)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vecteur(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vecteur(text)
+
+
+def corpus(nom: str, rng: random.Random) -> FAISS:
+    documents = []
+    for i in range(NB_DOCUMENTS):
+        sujet = rng.choice(SUJETS[nom])
+        texte = " ".join(rng.choice(FORMULES[nom]).format(s=sujet) for _ in range(3))
+        documents.append(Document(page_content=texte, metadata={"source": f"{nom}/doc_{i}.md"}))
+    return FAISS.from_documents(documents, SacDeMots(), ids=[f"{nom}:{i}" for i in range(NB_DOCUMENTS)])
+
+
+def fusion_par_rang(question: str, noms: list[str], k: int) -> list[str]:
+    """Ancienne fusion : RRF sur le rang de chaque extrait dans son corpus (corpus des top-k)."""
+    resultats = [(1.0 / (60 + rang + 1), nom)
+                 for nom in noms for rang, _ in enumerate(_rechercher_corpus(nom, question))]
+    resultats.sort(key=lambda r: r[0], reverse=True)
+    return [nom for _, nom in resultats[:k]]
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    for nom in SUJETS:
+        vectorstore = corpus(nom, rng)
+        registre.enregistrer(nom, lambda v=vectorstore: creer_retriever(v, k=4, mode="vecteur"))
+    noms = list(SUJETS)
+    questions = [f"Quelles sont les conditions pour {rng.choice(SUJETS['rh'])} ?" for _ in range(NB_REQUETES)]
+
+    avant = sum(fusion_par_rang(q, noms, K).count("informatique") for q in questions)
+    debut = time.perf_counter()
+    apres = 0
+    for question in questions:
+        resultats, erreurs = rechercher_federe(question, k=K, noms=noms)
+        assert not erreurs, erreurs
+        apres += sum(nom == "informatique" for _, nom, _ in resultats)
+    duree = (time.perf_counter() - debut) / NB_REQUETES
+
+    print("=" * 72)
+    print(f"⏱️ {NB_REQUETES} questions RH, corpus 'rh' + 'informatique' ({NB_DOCUMENTS} documents chacun), k={K}")
+    print("=" * 72)
+    print(f"   extraits 'informatique' dans le top-{K} : rang (RRF) {avant / NB_REQUETES:.2f}"
+          f"   cosinus {apres / NB_REQUETES:.2f}")
+    print(f"   recherche fédérée : {duree * 1000:.2f} ms par question")
+
+    assert apres == 0, "un corpus sans rapport avec la question prend des places dans le top-k !"
+    print("\n   ✅ Le corpus sans rapport avec la question ne prend aucune place du top-k")
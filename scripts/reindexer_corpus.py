@@ -0,0 +1,42 @@
+"""
+💾 Réindexation des corpus RAG (Clinitex, Cegedim)
+==================================================
+
+Met à jour les index persistants sans lancer d'agent : seuls les fichiers
+nouveaux ou modifiés sont re-vectorisés (voir tools/index_persistant.py).
+Les outils RAG rechargent ensuite l'index depuis le cache disque.
+
+Avec --watch, les dossiers restent surveillés : chaque changement est
+réindexé à chaud (Ctrl+C pour quitter).
+
+Pour lancer (depuis la racine du dépôt) :
+    python scripts/reindexer_corpus.py [--watch]
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from tools.index_persistant import reindexer, surveiller
+from tools.rag_clinitex import CORPUS_CLINITEX
+from tools.rag_cegedim import CORPUS_CEGEDIM
+
+load_dotenv()
+
+embeddings = OpenAIEmbeddings()  # questions : retries du SDK
+indexation = OpenAIEmbeddings(max_retries=0)  # chunks : 429 → backoff adaptatif de indexer_flux
+corpus_presents = [corpus for corpus in (CORPUS_CLINITEX, CORPUS_CEGEDIM) if os.path.isdir(corpus.path)]
+
+vectorstores = {corpus.nom: reindexer(corpus, embeddings, embeddings_indexation=indexation)
+                for corpus in corpus_presents}
+
+if "--watch" in sys.argv:
+    print("👀 Surveillance des dossiers (Ctrl+C pour quitter)...")
+    for corpus in corpus_presents:
+        surveiller(corpus, vectorstores[corpus.nom].as_retriever(), embeddings, embeddings_indexation=indexation)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("👋 Surveillance arrêtée")
@@ -4,19 +4,24 @@
 
 Ce package regroupe tous les outils (tools) utilisables par les agents.
 Import simplifié : from tools import tous_les_outils
+
+Chaque outil est utilisable en sync (invoke) comme en async (ainvoke), voir execution_async.py.
 """
 
 from .rag_clinitex import recherche_rapports_clinitex, init_retriever_clinitex
 from .rag_cegedim import recherche_reglements_cegedim, init_retriever_cegedim
+from .recherche_federee import recherche_tous_corpus
 from .calculatrice import calculatrice, date_actuelle
 from .recherche_web import recherche_web
 from .email_tool import envoyer_email
 from .graphiques import generer_graphique
+from .registre import registre
 
 # Liste de tous les outils disponibles (pratique pour les agents)
 tous_les_outils = [
     recherche_rapports_clinitex,
     recherche_reglements_cegedim,
+    recherche_tous_corpus,
     calculatrice,
     date_actuelle,
     recherche_web,
@@ -29,10 +34,12 @@ __all__ = [
     "init_retriever_clinitex",
     "recherche_reglements_cegedim",
     "init_retriever_cegedim",
+    "recherche_tous_corpus",
     "calculatrice",
     "date_actuelle",
     "recherche_web",
     "envoyer_email",
     "generer_graphique",
+    "registre",
     "tous_les_outils"
 ]
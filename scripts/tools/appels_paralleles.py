@@ -0,0 +1,115 @@
+"""
+🔀 Appels parallèles - Plusieurs outils dans un même tour de l'agent
+===================================================================
+
+gpt-4o demande souvent plusieurs outils dans un même tour (recherche Clinitex
++ recherche web + calcul). Le ToolNode de create_react_agent les lance en même
+temps (pool de threads en sync, asyncio.gather en async) et renvoie les
+ToolMessages dans l'ordre des tool_calls du LLM : la latence du tour est celle
+de l'outil le plus lent, pas la somme.
+
+Mais sans aucune limite : 5 emails ou 5 graphiques demandés d'un coup partent
+ensemble, et en async rien ne borne le nombre d'appels simultanés.
+
+limiter_outils() enveloppe les outils avant de les donner à l'agent :
+- une limite par outil (ex : 1 email à la fois, 2 graphiques)
+- une limite globale d'appels simultanés, tous outils confondus
+- les deux en sync (threading) comme en async (asyncio)
+Un appel qui dépasse une limite attend son tour : l'ordre des résultats ne change pas.
+
+Configuration (variables d'environnement) :
+- RAG_OUTILS_CONCURRENCE : appels simultanés au total (défaut 8), à passer aussi
+  en max_concurrency dans la config de l'agent (taille du pool de threads du ToolNode)
+- RAG_OUTILS_LIMITES : limites par outil, ex "envoyer_email=1,generer_graphique=2"
+"""
+
+import os
+import asyncio
+import weakref
+import threading
+from functools import wraps
+from langchain_core.tools import BaseTool
+
+CONCURRENCE_MAX = int(os.getenv("RAG_OUTILS_CONCURRENCE", "8"))
+
+# Outils lents ou à effets de bord : pas trop d'appels en même temps
+LIMITES_OUTILS = {"envoyer_email": 1, "generer_graphique": 2, "recherche_web": 3}
+
+
+def _lire_limites(texte: str) -> dict[str, int]:
+    """"envoyer_email=1,generer_graphique=2" → {"envoyer_email": 1, "generer_graphique": 2}"""
+    limites = {}
+    for element in texte.split(","):
+        nom, _, valeur = element.partition("=")
+        if nom.strip() and valeur.strip():
+            limites[nom.strip()] = int(valeur)
+    return limites
+
+
+LIMITES_OUTILS.update(_lire_limites(os.getenv("RAG_OUTILS_LIMITES", "")))
+
+
+class Limite:
+    """Nombre maximum d'appels simultanés, en sync comme en async."""
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self._semaphore = threading.BoundedSemaphore(self.maximum)
+        # Un asyncio.Semaphore appartient à une boucle : un par boucle d'événements
+        self._semaphores_async: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def __enter__(self):
+        self._semaphore.acquire()
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+
+    def semaphore_async(self) -> asyncio.Semaphore:
+        boucle = asyncio.get_running_loop()
+        if boucle not in self._semaphores_async:
+            self._semaphores_async[boucle] = asyncio.Semaphore(self.maximum)
+        return self._semaphores_async[boucle]
+
+
+def _limiter(outil: BaseTool, limites: list[Limite]) -> BaseTool:
+    """Copie de l'outil dont chaque appel (sync ou async) prend une place dans chaque limite."""
+    func, coroutine = getattr(outil, "func", None), getattr(outil, "coroutine", None)
+    if func is None and coroutine is None:
+        return outil  # outil sans func/coroutine (BaseTool sur mesure) : laissé tel quel
+
+    changements = {}
+    if func is not None:
+        @wraps(func)
+        def func_limitee(*args, **kwargs):
+            # Toujours dans le même ordre (outil, puis global) : pas d'interblocage
+            with limites[0], limites[1]:
+                return func(*args, **kwargs)
+        changements["func"] = func_limitee
+
+    if coroutine is not None:
+        @wraps(coroutine)
+        async def coroutine_limitee(*args, **kwargs):
+            async with limites[0].semaphore_async(), limites[1].semaphore_async():
+                return await coroutine(*args, **kwargs)
+        changements["coroutine"] = coroutine_limitee
+
+    return outil.model_copy(update=changements)
+
+
+def limiter_outils(outils: list[BaseTool], limites: dict[str, int] | None = None,
+                   concurrence: int = CONCURRENCE_MAX) -> list[BaseTool]:
+    """
+    Outils à donner à create_react_agent, avec leurs limites d'appels simultanés.
+
+    Args:
+        outils: Les outils de l'agent
+        limites: Appels simultanés max par nom d'outil (défaut : LIMITES_OUTILS) ;
+                 un outil absent n'a que la limite globale
+        concurrence: Appels simultanés max, tous outils confondus
+
+    Returns:
+        Des copies des outils (mêmes noms, descriptions et arguments).
+    """
+    limites = LIMITES_OUTILS if limites is None else limites
+    globale = Limite(concurrence)
+    return [_limiter(outil, [Limite(limites.get(outil.name, concurrence)), globale]) for outil in outils]
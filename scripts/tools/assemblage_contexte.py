@@ -0,0 +1,91 @@
+"""
+🧵 Assemblage du contexte - Recoller les chunks voisins avant de les envoyer au LLM
+==================================================================================
+
+Avec chunk_overlap=200, deux chunks voisins d'une même page partagent jusqu'à
+200 caractères : quand ils sont retournés ensemble, ce texte est envoyé deux
+fois au LLM (et reste ensuite dans la mémoire de la conversation).
+
+Le découpage enregistre la position de chaque chunk dans son document
+(metadata["start_index"], option add_start_index du text splitter).
+assembler_chunks() regroupe les chunks d'une même source (et d'une même
+page pour les PDFs, d'une même section pour le Markdown), puis recolle ceux
+qui se touchent ou se chevauchent : la partie déjà présente n'est gardée
+qu'une fois. Le splitter retire les blancs en bord de chunk ("\n\n" entre
+deux paragraphes) : deux chunks séparés de quelques caractères seulement
+sont donc considérés comme voisins.
+
+Les chunks Markdown portent le chemin de titres de leur section
+(metadata["titres"], voir decoupage_markdown.py) : deux chunks de sections
+différentes ne sont jamais recollés, même s'ils se touchent, pour que les
+titres du passage restent exacts.
+
+Un passage recollé garde les ids de ses chunks (metadata["ids"]) : la
+recherche fédérée retrouve ainsi leurs vecteurs dans l'index.
+
+Les chunks sans start_index (anciens index) sont renvoyés tels quels.
+"""
+
+from langchain_core.documents import Document
+
+# Écart max (en caractères) entre deux chunks voisins : les séparateurs retirés
+# par le splitter (strip_whitespace), comme "\n\n"
+ECART_MAX = 2
+
+
+def _cle_source(doc: Document) -> tuple:
+    return doc.metadata.get("source"), doc.metadata.get("page"), tuple(doc.metadata.get("titres") or ())
+
+
+def assembler_chunks(documents: list[Document]) -> list[Document]:
+    """
+    Fusionne les chunks contigus ou chevauchants d'une même source (et d'une même section).
+
+    L'ordre de pertinence est conservé : un passage recollé prend la place
+    du mieux classé de ses chunks.
+    """
+    groupes: dict[tuple, list[tuple[int, Document]]] = {}
+    resultat: list[tuple[int, Document]] = []
+    for rang, doc in enumerate(documents):
+        if isinstance(doc.metadata.get("start_index"), int) and doc.metadata["start_index"] >= 0:
+            groupes.setdefault(_cle_source(doc), []).append((rang, doc))
+        else:
+            resultat.append((rang, doc))
+
+    for chunks in groupes.values():
+        chunks.sort(key=lambda c: c[1].metadata["start_index"])
+        rang, doc = chunks[0]
+        debut = doc.metadata["start_index"]
+        fin = debut + len(doc.page_content)   # fin du passage dans le document source
+        morceaux, ids = [doc.page_content], [doc.id]
+        for rang_suivant, suivant in chunks[1:]:
+            debut_suivant = suivant.metadata["start_index"]
+            fin_suivant = debut_suivant + len(suivant.page_content)
+            if debut_suivant - fin > ECART_MAX:
+                resultat.append((rang, _passage(doc, debut, morceaux, ids)))
+                rang, doc, debut, fin = rang_suivant, suivant, debut_suivant, fin_suivant
+                morceaux, ids = [suivant.page_content], [suivant.id]
+                continue
+            if debut_suivant > fin:
+                # Contigu, à un séparateur près
+                morceaux.append("\n" + suivant.page_content)
+            elif fin_suivant > fin:
+                # Chevauchant : on n'ajoute que la partie nouvelle
+                morceaux.append(suivant.page_content[fin - debut_suivant:])
+            else:
+                # Entièrement inclus dans le passage
+                morceaux.append("")
+            ids.append(suivant.id)
+            fin = max(fin, fin_suivant)
+            rang = min(rang, rang_suivant)
+        resultat.append((rang, _passage(doc, debut, morceaux, ids)))
+
+    resultat.sort(key=lambda r: r[0])
+    return [doc for _, doc in resultat]
+
+
+def _passage(doc: Document, debut: int, morceaux: list[str], ids: list[str | None]) -> Document:
+    if len(morceaux) == 1:
+        return doc
+    return Document(page_content="".join(morceaux),
+                    metadata={**doc.metadata, "start_index": debut, "chunks": len(morceaux), "ids": ids})
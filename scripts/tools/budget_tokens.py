@@ -0,0 +1,175 @@
+"""
+🪙 Budget de tokens - Taille maîtrisée des réponses des outils RAG
+=================================================================
+
+Les outils RAG renvoyaient jusqu'à 4 × 1000 caractères (+ en-têtes), quelle
+que soit la taille du contexte de l'agent. Et ces messages d'outil restent
+dans la mémoire (MemorySaver) : ils sont renvoyés au LLM à CHAQUE tour suivant.
+
+Chaque outil de recherche accepte désormais un budget en tokens :
+- les extraits sont pris dans l'ordre de pertinence (le meilleur d'abord)
+  tant qu'ils tiennent dans le budget
+- le premier extrait qui déborde est coupé à la fin d'une phrase, puis on s'arrête
+- les tokens sont comptés avec tiktoken (tokenizer chargé une seule fois,
+  comptes mis en cache : les mêmes chunks reviennent d'une question à l'autre)
+
+Chaque appel publie ses comptes de tokens dans le système de callbacks
+(événement "tokens_outil_rag") : SuiviTokens les collecte pour régler le
+budget d'un déploiement (RAG_BUDGET_TOKENS). Les versions async des outils
+utilisent aformater_extraits, qui publie l'événement depuis la boucle asyncio.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Any
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import dispatch_custom_event, adispatch_custom_event
+from .pipeline_embeddings import compter_tokens
+
+BUDGET_TOKENS = int(os.getenv("RAG_BUDGET_TOKENS", "1200"))
+BUDGET_MIN = 100  # en dessous, même le meilleur extrait ne tiendrait pas
+EVENEMENT = "tokens_outil_rag"
+SEPARATEUR = "\n\n---\n\n"
+MARQUE_COUPURE = " […]"
+
+# Fin de phrase : ponctuation suivie d'un blanc (le blanc reste avec la phrase suivante)
+_FIN_PHRASE = re.compile(r"(?<=[.!?…:;])(?=\s)")
+
+
+@lru_cache(maxsize=8192)
+def tokens(texte: str) -> int:
+    """Nombre de tokens d'un texte, mis en cache."""
+    return compter_tokens(texte)
+
+
+def couper_aux_phrases(texte: str, budget: int) -> str | None:
+    """
+    Début du texte qui tient dans le budget, coupé à une fin de phrase.
+
+    Returns:
+        Le texte suivi de " […]", ou None si même la première phrase ne tient pas.
+    """
+    budget -= tokens(MARQUE_COUPURE)
+    garde, utilises = [], 0
+    for phrase in _FIN_PHRASE.split(texte):
+        cout = tokens(phrase)
+        if utilises + cout > budget:
+            break
+        garde.append(phrase)
+        utilises += cout
+    if not garde:
+        return None
+    return "".join(garde).rstrip() + MARQUE_COUPURE
+
+
+def remplir_budget(extraits: list[str], budget: int) -> tuple[list[str], int]:
+    """
+    Remplit le budget avec les extraits, dans l'ordre (le plus pertinent d'abord).
+
+    Returns:
+        (extraits gardés, nombre d'extraits coupés : 0 ou 1)
+    """
+    garde, restant, coupes = [], budget, 0
+    for extrait in extraits:
+        cout = tokens(extrait) + (tokens(SEPARATEUR) if garde else 0)
+        if cout <= restant:
+            garde.append(extrait)
+            restant -= cout
+            continue
+        # Le premier extrait qui déborde est coupé à une fin de phrase, puis on s'arrête
+        debut = couper_aux_phrases(extrait, restant - (tokens(SEPARATEUR) if garde else 0))
+        if debut is not None:
+            garde.append(debut)
+            coupes = 1
+        break
+    return garde, coupes
+
+
+def _mesurer(outil: str, entete: str, extraits: list[str], budget: int | None) -> tuple[str, dict]:
+    """Réponse dans le budget, et ses comptes de tokens (pour SuiviTokens)."""
+    budget = BUDGET_TOKENS if budget is None else max(BUDGET_MIN, int(budget))
+    entete = f"{entete}\n\n"
+    garde, coupes = remplir_budget(extraits, budget - tokens(entete))
+    reponse = entete + SEPARATEUR.join(garde)
+    return reponse, {
+        "outil": outil,
+        "budget": budget,
+        "tokens": tokens(reponse),
+        "tokens_sans_budget": tokens(entete + SEPARATEUR.join(extraits)),
+        "extraits": len(extraits),
+        "extraits_gardes": len(garde),
+        "extraits_coupes": coupes,
+    }
+
+
+def formater_extraits(outil: str, entete: str, extraits: list[str], budget: int | None = None) -> str:
+    """
+    Réponse d'un outil RAG : en-tête + extraits séparés par "---", dans le budget.
+
+    Args:
+        outil: Nom de l'outil (pour le suivi des tokens)
+        entete: Première ligne de la réponse (comptée dans le budget)
+        extraits: Extraits déjà mis en forme, du plus pertinent au moins pertinent
+        budget: Budget en tokens de la réponse (défaut : RAG_BUDGET_TOKENS, minimum BUDGET_MIN)
+    """
+    reponse, donnees = _mesurer(outil, entete, extraits, budget)
+    _publier(donnees)
+    return reponse
+
+
+async def aformater_extraits(outil: str, entete: str, extraits: list[str], budget: int | None = None) -> str:
+    """formater_extraits pour les outils async (mêmes arguments)."""
+    reponse, donnees = _mesurer(outil, entete, extraits, budget)
+    await _apublier(donnees)
+    return reponse
+
+
+def _publier(donnees: dict):
+    """Publie les comptes de tokens aux callbacks de l'exécution en cours (agent, chaîne...)."""
+    try:
+        dispatch_custom_event(EVENEMENT, donnees)
+    except RuntimeError:
+        pass  # outil appelé directement, hors d'un Runnable : personne n'écoute
+
+
+async def _apublier(donnees: dict):
+    try:
+        await adispatch_custom_event(EVENEMENT, donnees)
+    except RuntimeError:
+        pass
+
+
+class SuiviTokens(BaseCallbackHandler):
+    """
+    Collecte les comptes de tokens des outils RAG.
+
+    Usage :
+        suivi = SuiviTokens()
+        agent.invoke(entree, config={"callbacks": [suivi], ...})
+        print(suivi.resume())
+    """
+
+    def __init__(self):
+        self.appels: list[dict] = []
+
+    def on_custom_event(self, name: str, data: Any, *, run_id: UUID, tags: list[str] | None = None,
+                        metadata: dict[str, Any] | None = None, **kwargs: Any) -> None:
+        if name == EVENEMENT:
+            self.appels.append(data)
+
+    def resume(self) -> str:
+        """Une ligne par outil : appels, tokens moyens / max, tokens économisés, extraits coupés."""
+        par_outil: dict[str, list[dict]] = {}
+        for appel in self.appels:
+            par_outil.setdefault(appel["outil"], []).append(appel)
+        lignes = []
+        for outil, appels in par_outil.items():
+            total = sum(a["tokens"] for a in appels)
+            economises = sum(a["tokens_sans_budget"] for a in appels) - total
+            lignes.append(f"{outil} : {len(appels)} appel(s), {total / len(appels):.0f} tokens en moyenne "
+                          f"(max {max(a['tokens'] for a in appels)}, budget {appels[-1]['budget']}), "
+                          f"{economises} tokens économisés, "
+                          f"{sum(a['extraits_coupes'] for a in appels)} extrait(s) coupé(s)")
+        return "\n".join(lignes)
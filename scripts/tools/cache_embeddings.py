@@ -0,0 +1,159 @@
+"""
+🗄️ Cache d'embeddings - Ne jamais vectoriser deux fois le même texte
+====================================================================
+
+Les scripts RAG et les outils appellent OpenAIEmbeddings() sur les mêmes chunks
+encore et encore (à chaque lancement, à chaque essai de chunk_size...).
+
+EmbeddingsEnCache enveloppe n'importe quel modèle d'embeddings LangChain :
+- clé = hash(modèle, dimensions et options du modèle, nature, texte) → le même
+  texte n'est vectorisé qu'une fois ; "query" et "document" ont des clés
+  distinctes (modèles asymétriques), comme un même modèle réduit à moins de
+  dimensions
+- stockage local dans une base SQLite (un fichier, partageable entre processus)
+- taille maximale avec éviction LRU (les entrées les moins récemment utilisées partent)
+- fonctionne pour les documents ET pour les questions
+
+Configuration (variables d'environnement) :
+- RAG_EMBEDDINGS_CACHE : chemin de la base SQLite
+- RAG_EMBEDDINGS_CACHE_MAX : nombre maximum de vecteurs conservés
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+
+CHEMIN_CACHE = os.getenv("RAG_EMBEDDINGS_CACHE", "scripts/.rag_cache/embeddings.sqlite")
+TAILLE_MAX = int(os.getenv("RAG_EMBEDDINGS_CACHE_MAX", "200000"))
+
+# SQLite limite le nombre de paramètres par requête
+_TAILLE_LOT_SQL = 500
+
+# Version du format des clés (PRAGMA user_version) : les lignes d'une version
+# précédente sont supprimées à l'ouverture, jamais relues
+SCHEMA = 2
+
+# Options des modèles LangChain qui changent les vecteurs renvoyés
+_OPTIONS_MODELE = ("dimensions", "model_kwargs", "encoding_format", "normalize", "task_type")
+
+
+def signature_modele(modele: Embeddings) -> str:
+    """Classe, nom et options du modèle qui influencent les vecteurs (ex : dimensions)."""
+    options = {nom: getattr(modele, nom) for nom in _OPTIONS_MODELE if getattr(modele, nom, None) is not None}
+    return json.dumps({"classe": type(modele).__name__,
+                       "modele": getattr(modele, "model", None) or getattr(modele, "model_name", None),
+                       **options}, sort_keys=True, default=str)
+
+
+class EmbeddingsEnCache(Embeddings):
+    """Enveloppe un modèle d'embeddings avec un cache SQLite adressé par contenu."""
+
+    def __init__(self, sous_jacent: Embeddings, chemin: str = CHEMIN_CACHE, taille_max: int = TAILLE_MAX):
+        self.sous_jacent = sous_jacent
+        self.taille_max = taille_max
+        self.modele = signature_modele(sous_jacent)
+        self.hits = 0
+        self.misses = 0
+
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(chemin, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        (schema,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if schema < SCHEMA:
+            # Anciennes clés (sans nature ni dimensions) : vecteurs peut-être d'un autre espace
+            self._conn.execute("DROP TABLE IF EXISTS embeddings")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " cle TEXT PRIMARY KEY, vecteur BLOB NOT NULL, dernier_acces REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_acces ON embeddings(dernier_acces)")
+        self._conn.commit()
+
+    def _cle(self, texte: str, nature: str) -> str:
+        """nature : "query" ou "document" (un modèle asymétrique les vectorise différemment)."""
+        return hashlib.sha256(f"{SCHEMA}\0{self.modele}\0{nature}\0{texte}".encode("utf-8")).hexdigest()
+
+    def _lire(self, cles: list[str]) -> dict[str, list[float]]:
+        """Vecteurs présents en cache (et mise à jour de leur date d'accès)."""
+        trouves = {}
+        maintenant = time.time()
+        with self._lock:
+            for debut in range(0, len(cles), _TAILLE_LOT_SQL):
+                lot = cles[debut:debut + _TAILLE_LOT_SQL]
+                marques = ",".join("?" * len(lot))
+                for cle, blob in self._conn.execute(
+                    f"SELECT cle, vecteur FROM embeddings WHERE cle IN ({marques})", lot
+                ):
+                    trouves[cle] = array("f", blob).tolist()
+                self._conn.execute(
+                    f"UPDATE embeddings SET dernier_acces = ? WHERE cle IN ({marques})",
+                    [maintenant, *lot],
+                )
+            self._conn.commit()
+        return trouves
+
+    def _ecrire(self, nouveaux: dict[str, list[float]]):
+        """Ajoute des vecteurs puis applique la limite de taille (éviction LRU)."""
+        maintenant = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (cle, vecteur, dernier_acces) VALUES (?, ?, ?)",
+                [(cle, array("f", vecteur).tobytes(), maintenant) for cle, vecteur in nouveaux.items()],
+            )
+            (total,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if total > self.taille_max:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE cle IN ("
+                    " SELECT cle FROM embeddings ORDER BY dernier_acces LIMIT ?)",
+                    (total - self.taille_max,),
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        cles = [self._cle(t, "document") for t in texts]
+        en_cache = self._lire(list(set(cles)))
+
+        # On ne vectorise que les textes absents du cache (chacun une seule fois)
+        manquants = {}
+        for cle, texte in zip(cles, texts):
+            if cle not in en_cache:
+                manquants.setdefault(cle, texte)
+        self.hits += len(texts) - len(manquants)
+        self.misses += len(manquants)
+
+        if manquants:
+            vecteurs = self.sous_jacent.embed_documents(list(manquants.values()))
+            nouveaux = {cle: [float(x) for x in v] for cle, v in zip(manquants.keys(), vecteurs)}
+            self._ecrire(nouveaux)
+            en_cache.update(nouveaux)
+
+        return [en_cache[cle] for cle in cles]
+
+    def embed_query(self, text: str) -> list[float]:
+        cle = self._cle(text, "query")
+        en_cache = self._lire([cle])
+        if cle in en_cache:
+            self.hits += 1
+            return en_cache[cle]
+
+        self.misses += 1
+        vecteur = [float(x) for x in self.sous_jacent.embed_query(text)]
+        self._ecrire({cle: vecteur})
+        return vecteur
+
+
+def embeddings_en_cache(sous_jacent: Embeddings | None = None) -> EmbeddingsEnCache:
+    """Raccourci : OpenAIEmbeddings() (par défaut) enveloppé dans le cache partagé."""
+    if sous_jacent is None:
+        from langchain_openai import OpenAIEmbeddings
+        sous_jacent = OpenAIEmbeddings()
+    return EmbeddingsEnCache(sous_jacent)
@@ -0,0 +1,140 @@
+"""
+💬 Cache sémantique des réponses - Éviter de rappeler le LLM
+============================================================
+
+Dans une chaîne RAG, l'appel au LLM (gpt-4o) est de loin l'étape la plus
+lente et la plus chère. Si une question proche a déjà reçu une réponse, on
+peut la resservir... à condition que le contexte soit le même !
+
+Une réponse en cache n'est réutilisée que si :
+- la nouvelle question est sémantiquement proche (cosinus ≥ seuil)
+- les chunks récupérés sont EXACTEMENT les mêmes (mêmes ids)
+- l'index n'a pas changé (même version)
+
+Le cache est stocké localement dans une base SQLite : les réponses survivent
+au redémarrage du script et peuvent être rejouées sans latence LLM.
+
+Configuration (variables d'environnement) :
+- RAG_CACHE_REPONSES : chemin de la base SQLite
+- RAG_CACHE_REPONSES_SEUIL : similarité cosinus minimale (défaut 0.92)
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+CHEMIN_CACHE = os.getenv("RAG_CACHE_REPONSES", "scripts/.rag_cache/reponses.sqlite")
+SEUIL = float(os.getenv("RAG_CACHE_REPONSES_SEUIL", "0.92"))
+
+
+def id_chunk(doc) -> str:
+    """Identifiant stable d'un chunk : hash de sa source, sa page et son texte."""
+    cle = f"{doc.metadata.get('source')}\0{doc.metadata.get('page')}\0{doc.page_content}"
+    return hashlib.sha256(cle.encode("utf-8")).hexdigest()[:16]
+
+
+def version_index(vectorstore) -> str:
+    """Version stable de l'index : clé de l'artefact, ou empreinte de tous ses chunks.
+
+    L'empreinte est calculée une seule fois puis mémorisée sur le vectorstore.
+    """
+    version = getattr(vectorstore, "version_index", None)
+    if version is None:
+        h = hashlib.sha256()
+        for id_doc in sorted(id_chunk(vectorstore.docstore.search(i))
+                             for i in vectorstore.index_to_docstore_id.values()):
+            h.update(id_doc.encode("ascii"))
+        version = vectorstore.version_index = h.hexdigest()[:16]
+    return version
+
+
+class CacheReponses:
+    """Cache SQLite (question, chunks, version de l'index) → réponse."""
+
+    def __init__(self, embeddings, chemin: str = CHEMIN_CACHE, seuil: float = SEUIL):
+        self.embeddings = embeddings
+        self.seuil = seuil
+        self.hits = 0
+        self.misses = 0
+
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(chemin, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reponses ("
+            " id INTEGER PRIMARY KEY, version TEXT NOT NULL, signature TEXT NOT NULL,"
+            " question TEXT NOT NULL, vecteur BLOB NOT NULL, reponse TEXT NOT NULL, date REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_contexte ON reponses(version, signature)")
+        self._conn.commit()
+
+    def _vecteur(self, question: str) -> np.ndarray:
+        vecteur = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+        return vecteur / (np.linalg.norm(vecteur) or 1.0)
+
+    @staticmethod
+    def _signature(documents: list) -> str:
+        """Signature de l'ensemble des chunks récupérés (ordre indifférent)."""
+        return hashlib.sha256("|".join(sorted(id_chunk(d) for d in documents)).encode("ascii")).hexdigest()
+
+    def chercher(self, question: str, version: str, documents: list) -> str | None:
+        """Réponse en cache pour une question proche ET le même contexte, sinon None."""
+        with self._lock:
+            lignes = self._conn.execute(
+                "SELECT vecteur, reponse FROM reponses WHERE version = ? AND signature = ?",
+                (version, self._signature(documents)),
+            ).fetchall()
+        if not lignes:
+            return None
+        vecteur = self._vecteur(question)
+        similarites = np.stack([np.frombuffer(blob, dtype="float32") for blob, _ in lignes]) @ vecteur
+        meilleur = int(np.argmax(similarites))
+        return lignes[meilleur][1] if similarites[meilleur] >= self.seuil else None
+
+    def enregistrer(self, question: str, version: str, documents: list, reponse: str):
+        # Embedding calculé hors verrou : un appel réseau ne doit pas bloquer
+        # les autres threads qui lisent ou écrivent dans le cache
+        ligne = (version, self._signature(documents), question, self._vecteur(question).tobytes(), reponse, time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO reponses (version, signature, question, vecteur, reponse, date) VALUES (?, ?, ?, ?, ?, ?)",
+                ligne,
+            )
+            self._conn.commit()
+
+    def repondre(self, question: str, retriever, generation, version: str) -> tuple[str, bool]:
+        """
+        Répond à la question avec la chaîne `generation`, en passant par le cache.
+
+        Args:
+            question: La question posée
+            retriever: Retriever du RAG (la recherche reste faite à chaque fois)
+            generation: Chaîne prompt | llm | parser qui reçoit {"context", "question"}
+            version: Version de l'index (voir version_index)
+
+        Returns:
+            (réponse, True si elle vient du cache)
+        """
+        documents = retriever.invoke(question)
+        reponse = self.chercher(question, version, documents)
+        if reponse is not None:
+            self.hits += 1
+            return reponse, True
+
+        self.misses += 1
+        reponse = generation.invoke({"context": documents, "question": question})
+        self.enregistrer(question, version, documents, reponse)
+        return reponse, False
+
+    def historique(self, version: str, limite: int = 10) -> list[tuple[str, str]]:
+        """Dernières questions/réponses en cache pour cette version de l'index (pour les rejouer)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT question, reponse FROM reponses WHERE version = ? ORDER BY date DESC LIMIT ?",
+                (version, limite),
+            ).fetchall()
@@ -0,0 +1,150 @@
+"""
+🧠 Cache sémantique des requêtes RAG
+====================================
+
+Les utilisateurs posent souvent les mêmes questions, formulées un peu
+différemment. Sans cache, chaque question est vectorisée puis cherchée dans FAISS.
+
+CacheRequetes se place devant la recherche :
+1. Question normalisée identique (casse, accents, ponctuation) → hit exact
+2. Sinon, question dont l'embedding est assez proche (cosinus ≥ seuil) ET qui
+   a exactement les mêmes termes clés → hit sémantique
+3. Sinon → vraie recherche, puis mise en cache du résultat
+
+Le cosinus seul ne suffit pas : avec ada-002 ou text-embedding-3-small, deux
+questions courtes qui ne diffèrent que d'un mot décisif ("durée de la période
+d'essai d'un CDI" / "... d'un CDD") dépassent 0.95. Les termes clés sont les
+mots de la question normalisée (casse, accents, ponctuation), au singulier
+et sans les mots vides : une reformulation ("quelle est la durée de la période
+d'essai en CDI ?") garde les mêmes, un CDI devenu CDD non.
+
+Les entrées expirent (TTL), les plus anciennement utilisées sont évincées (LRU),
+et tout le cache est invalidé quand la version de l'index change.
+
+Configuration (variables d'environnement) :
+- RAG_CACHE_REQUETES_MAX : nombre d'entrées (défaut 256)
+- RAG_CACHE_REQUETES_TTL : durée de vie en secondes (défaut 3600)
+- RAG_CACHE_REQUETES_SEUIL : similarité cosinus minimale (défaut 0.97)
+
+Benchmark : python scripts/benchmarks/bench_cache_requetes.py
+"""
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from .cache_reponses import version_index
+
+TAILLE_MAX = int(os.getenv("RAG_CACHE_REQUETES_MAX", "256"))
+TTL = float(os.getenv("RAG_CACHE_REQUETES_TTL", "3600"))
+SEUIL = float(os.getenv("RAG_CACHE_REQUETES_SEUIL", "0.97"))
+
+# Mots sans effet sur la réponse (normalisés, au singulier)
+MOTS_VIDES = frozenset((
+    "le la les l un une des de du d au aux et ou a en pour par sur dans avec chez est sont etre "
+    "ce cet cette ces c qu que qui quoi quel quelle quels quelles mon ma mes ton ta tes son sa ses "
+    "notre nos votre vos leur leurs je j tu il elle on nous vous ils elles y se s me m te t "
+    "svp merci stp dire donner indiquer rappeler connaitre"
+).split())
+
+
+def normaliser(question: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces uniques."""
+    texte = unicodedata.normalize("NFKD", question.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", texte))
+
+
+def termes_cles(question: str) -> frozenset[str]:
+    """Mots porteurs de sens de la question ("CDI", "essai", "2024"...), sans ordre ni mots vides."""
+    mots = (mot[:-1] if len(mot) > 3 and mot[-1] in "sx" else mot for mot in normaliser(question).split())
+    return frozenset(mot for mot in mots if mot not in MOTS_VIDES)
+
+
+class CacheRequetes:
+    """Cache question → documents, exact puis sémantique, avec TTL et LRU."""
+
+    def __init__(self, nom: str, taille_max: int = TAILLE_MAX, ttl: float = TTL, seuil: float = SEUIL):
+        self.nom = nom
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self.seuil = seuil
+        self.version = None
+        self._entrees: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_exacts = 0
+        self.hits_semantiques = 0
+        self.misses = 0
+
+    def _verifier_version(self, version: str):
+        """Vide le cache si l'index a changé (appelé sous verrou)."""
+        if version != self.version:
+            self._entrees.clear()
+            self.version = version
+
+    def _purger_expires(self, maintenant: float):
+        for cle in [c for c, e in self._entrees.items() if maintenant - e["date"] > self.ttl]:
+            del self._entrees[cle]
+
+    def _chercher_semantique(self, vecteur: np.ndarray, termes: frozenset[str]) -> str | None:
+        """Entrée la plus proche au-dessus du seuil (produit scalaire de vecteurs normés), mêmes termes clés."""
+        cles = [c for c, e in self._entrees.items() if e["termes"] == termes]
+        if not cles:
+            return None
+        similarites = np.stack([self._entrees[c]["vecteur"] for c in cles]) @ vecteur
+        meilleur = int(np.argmax(similarites))
+        return cles[meilleur] if similarites[meilleur] >= self.seuil else None
+
+    def rechercher(self, question: str, retriever) -> list:
+        """Documents pour la question : depuis le cache si possible, sinon via le retriever."""
+        vectorstore = retriever.vectorstore
+        version = version_index(vectorstore)
+        cle = normaliser(question)
+        maintenant = time.monotonic()
+
+        with self._lock:
+            self._verifier_version(version)
+            self._purger_expires(maintenant)
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.hits_exacts += 1
+                return self._entrees[cle]["documents"]
+
+        # Embedding de la question (mis en cache par EmbeddingsEnCache : le
+        # retriever ne le recalculera pas en cas de miss)
+        vecteur = np.asarray(vectorstore.embedding_function.embed_query(question), dtype="float32")
+        vecteur /= np.linalg.norm(vecteur) or 1.0
+
+        termes = termes_cles(question)
+        with self._lock:
+            proche = self._chercher_semantique(vecteur, termes)
+            if proche is not None:
+                self._entrees.move_to_end(proche)
+                self.hits_semantiques += 1
+                return self._entrees[proche]["documents"]
+            self.misses += 1
+
+        documents = retriever.invoke(question)
+
+        with self._lock:
+            if version_index(retriever.vectorstore) == self.version:
+                self._entrees[cle] = {"vecteur": vecteur, "termes": termes, "documents": documents,
+                                      "date": maintenant}
+                self._entrees.move_to_end(cle)
+                while len(self._entrees) > self.taille_max:
+                    self._entrees.popitem(last=False)
+        return documents
+
+    def stats(self) -> dict:
+        """Compteurs de hits/misses et taux de hit."""
+        total = self.hits_exacts + self.hits_semantiques + self.misses
+        return {
+            "hits_exacts": self.hits_exacts,
+            "hits_semantiques": self.hits_semantiques,
+            "misses": self.misses,
+            "taux_hit": (self.hits_exacts + self.hits_semantiques) / total if total else 0.0,
+            "entrees": len(self._entrees),
+        }
@@ -1,14 +1,15 @@
 """
 🧮 Outils utilitaires - Calculatrice et Date
 ============================================
+
+Outils instantanés : leur version async les appelle directement, sans thread.
 """
 
 from datetime import datetime
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 
 
-@tool
-def calculatrice(expression: str) -> str:
+def _calculatrice(expression: str) -> str:
     """Utile pour faire des calculs mathématiques : additions, soustractions, 
     multiplications, divisions, pourcentages, moyennes, puissances.
     Exemples : '(80 + 75 + 90) / 3' pour une moyenne, '85 - 70' pour une différence, '2 ** 10' pour une puissance.
@@ -37,8 +38,14 @@ def calculatrice(expression: str) -> str:
         return f"❌ Erreur de calcul : {e}"
 
 
-@tool
-def date_actuelle() -> str:
+async def _acalculatrice(expression: str) -> str:
+    return _calculatrice(expression)
+
+
+calculatrice = StructuredTool.from_function(func=_calculatrice, coroutine=_acalculatrice, name="calculatrice")
+
+
+def _date_actuelle() -> str:
     """Utile pour connaître la date et l'heure actuelles.
     Permet de contextualiser les analyses, calculer des durées, ou simplement répondre à 'quelle heure est-il ?'.
     Aucune entrée requise."""
@@ -54,3 +61,10 @@ def date_actuelle() -> str:
     mois_nom = mois[now.month - 1]
     
     return f"📅 Nous sommes le {jour_nom} {now.day} {mois_nom} {now.year} à {now.strftime('%H:%M')}."
+
+
+async def _adate_actuelle() -> str:
+    return _date_actuelle()
+
+
+date_actuelle = StructuredTool.from_function(func=_date_actuelle, coroutine=_adate_actuelle, name="date_actuelle")
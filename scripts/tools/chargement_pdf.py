@@ -0,0 +1,264 @@
+"""
+📄 Chargement des PDFs - Extraction en parallèle
+================================================
+
+DirectoryLoader(..., loader_cls=PyPDFLoader) lit les PDFs un par un, sur un
+seul cœur : l'extraction de texte devient l'étape la plus lente de l'indexation.
+
+charger_en_parallele() répartit les fichiers sur un pool de processus :
+- les pages reviennent dans l'ORDRE des fichiers (résultat déterministe)
+- le nombre de workers est configurable
+- chaque fichier a un délai maximum : un PDF pathologique est ignoré
+  (avec un avertissement) au lieu de bloquer toute la construction
+
+Le texte extrait est gardé sur le disque (PyPDFLoaderEnCache) : une page par
+entrée, avec ses métadonnées, dans un fichier JSON par PDF dont le nom dépend
+du hash du PDF et de la version de l'extracteur (pypdf, loader LangChain).
+Changer de chunk_size, de modèle d'embeddings ou relancer 4Bis_rag_pdf.py ne
+reparse donc plus aucun PDF ; un PDF modifié, ou une nouvelle version de pypdf,
+est extrait à nouveau.
+
+Configuration (variables d'environnement) :
+- RAG_PDF_WORKERS : nombre de processus (défaut : nombre de cœurs)
+- RAG_PDF_TIMEOUT : délai maximum par fichier en secondes (défaut 120)
+- RAG_PDF_CACHE : dossier du cache d'extraction ("" pour le désactiver)
+"""
+
+import os
+import json
+import time
+import queue
+import signal
+import itertools
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from functools import lru_cache
+from importlib.metadata import version
+from typing import Callable, Iterable, Iterator
+from langchain_core.documents import Document
+from langchain_core.document_loaders import BaseLoader
+from langchain_community.document_loaders import PyPDFLoader
+
+WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 1)))
+TIMEOUT_FICHIER = float(os.getenv("RAG_PDF_TIMEOUT", "120"))
+CACHE_EXTRACTION = os.getenv("RAG_PDF_CACHE", "scripts/.rag_cache/pdf")
+
+# À incrémenter si le contenu des entrées du cache change
+FORMAT_EXTRACTION = 1
+
+# Marge laissée au worker pour signaler lui-même son dépassement
+_MARGE_TIMEOUT = 5.0
+_SCRUTATION = 0.1  # secondes entre deux vérifications des échéances des workers
+
+
+def hash_fichier(chemin: str) -> str:
+    """Hash SHA-256 du contenu d'un fichier (lu par blocs)."""
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def version_extracteur() -> str:
+    """Versions qui déterminent le texte extrait : en changer invalide le cache."""
+    return f"pypdf {version('pypdf')}, langchain-community {version('langchain-community')}, " \
+           f"format {FORMAT_EXTRACTION}"
+
+
+class PyPDFLoaderEnCache(BaseLoader):
+    """
+    PyPDFLoader avec un cache disque du texte extrait.
+
+    S'utilise comme PyPDFLoader, y compris dans DirectoryLoader(loader_cls=PyPDFLoaderEnCache).
+    """
+
+    def __init__(self, file_path: str, dossier_cache: str = CACHE_EXTRACTION):
+        self.file_path = str(file_path)
+        self.dossier_cache = dossier_cache
+
+    def _chemin_cache(self) -> str:
+        cle = hashlib.sha256(f"{version_extracteur()}\0{hash_fichier(self.file_path)}".encode()).hexdigest()
+        return os.path.join(self.dossier_cache, f"{cle[:32]}.json")
+
+    def lazy_load(self) -> Iterator[Document]:
+        if not self.dossier_cache:
+            yield from PyPDFLoader(self.file_path).lazy_load()
+            return
+
+        chemin_cache = self._chemin_cache()
+        try:
+            with open(chemin_cache, encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            pages = None
+        if pages is not None:
+            for page in pages:
+                # Le même PDF peut avoir été déplacé ou copié : la source est le chemin actuel
+                yield Document(page_content=page["texte"], metadata={**page["metadata"], "source": self.file_path})
+            return
+
+        pages = []
+        for document in PyPDFLoader(self.file_path).lazy_load():
+            pages.append({"texte": document.page_content, "metadata": document.metadata})
+            yield document
+        # Écrit seulement si le PDF a été lu jusqu'au bout (fichier temporaire + rename :
+        # plusieurs workers peuvent extraire en même temps sans risque)
+        os.makedirs(self.dossier_cache, exist_ok=True)
+        descripteur, chemin_tmp = tempfile.mkstemp(dir=self.dossier_cache, suffix=".tmp")
+        with os.fdopen(descripteur, "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False, default=str)
+        os.replace(chemin_tmp, chemin_cache)
+
+
+def charger_pdf(chemin: str) -> Iterator[Document]:
+    """Lit les pages d'un PDF une par une (une page = un Document), via le cache d'extraction."""
+    return PyPDFLoaderEnCache(chemin).lazy_load()
+
+
+class _DelaiDepasse(Exception):
+    pass
+
+
+def _sur_alarme(signum, frame):
+    raise _DelaiDepasse()
+
+
+# Dans un worker du pool : file où signaler le début de chaque fichier au parent
+_debuts = None
+
+
+def _initialiser_worker(debuts):
+    global _debuts
+    _debuts = debuts
+
+
+def _charger_avec_timeout(charger_fichier: Callable, chemin: str, timeout: float | None, numero: int | None = None):
+    """Exécuté dans un worker : charge un fichier en respectant le délai.
+
+    Retourne (documents, erreur) : on ne laisse jamais une exception
+    remonter, pour que le fichier suivant soit traité normalement.
+    """
+    if _debuts is not None and numero is not None:
+        _debuts.put((numero, time.monotonic()))
+    # Les signaux ne sont utilisables que dans le thread principal du processus
+    alarme = (timeout and hasattr(signal, "setitimer")
+              and threading.current_thread() is threading.main_thread())
+    if alarme:
+        precedent = signal.signal(signal.SIGALRM, _sur_alarme)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return list(charger_fichier(chemin)), None
+    except _DelaiDepasse:
+        return [], f"délai de {timeout:.0f}s dépassé"
+    except Exception as e:
+        return [], str(e)
+    finally:
+        if alarme:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, precedent)
+
+
+def _nouveau_pool(processus: int):
+    """
+    Pool de processus démarrés par forkserver (ou spawn), jamais par fork, et la
+    file où ses workers signalent le début de chaque fichier.
+
+    Le processus parent a souvent déjà des threads (préchauffage du registre,
+    boucle asyncio, Streamlit) : un fork pourrait copier un verrou tenu par l'un
+    d'eux, et le worker resterait bloqué dessus.
+    """
+    methode = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    contexte = multiprocessing.get_context(methode)
+    debuts = contexte.Queue()
+    return contexte.Pool(processes=processus, initializer=_initialiser_worker, initargs=(debuts,)), debuts
+
+
+def charger_en_parallele(charger_fichier: Callable[[str], Iterable[Document]], chemins: list[str],
+                         workers: int = WORKERS, timeout: float | None = TIMEOUT_FICHIER
+                         ) -> Iterator[tuple[str, list[Document], str | None]]:
+    """
+    Charge des fichiers dans un pool de processus et les restitue dans l'ordre.
+
+    Args:
+        charger_fichier: Fonction (définie au niveau module) qui charge un fichier
+        chemins: Fichiers à charger
+        workers: Nombre de processus (1 = chargement séquentiel, sans pool)
+        timeout: Délai maximum par fichier en secondes (None = pas de limite)
+
+    Yields:
+        (chemin, documents, erreur) pour chaque fichier, dans l'ordre de `chemins`.
+        En cas d'échec ou de dépassement du délai : documents vide et message d'erreur.
+    """
+    if workers <= 1 or len(chemins) <= 1:
+        for chemin in chemins:
+            documents, erreur = _charger_avec_timeout(charger_fichier, chemin, timeout)
+            yield chemin, documents, erreur
+        return
+
+    processus = min(workers, len(chemins))
+    pool, debuts = _nouveau_pool(processus)
+    bloque = False
+    try:
+        # Fenêtre glissante : au plus 2 fichiers par worker en attente (mémoire bornée)
+        fenetre = 2 * processus
+        en_attente = []  # [numéro, chemin, résultat], dans l'ordre des fichiers
+        echeances = {}   # numéro → échéance, comptée depuis le début du fichier dans son worker
+        numeros = itertools.count()
+        suivants = iter(chemins)
+
+        def soumettre(chemin):
+            numero = next(numeros)
+            return [numero, chemin, pool.apply_async(_charger_avec_timeout, (charger_fichier, chemin, timeout, numero))]
+
+        def completer():
+            while len(en_attente) < fenetre:
+                chemin = next(suivants, None)
+                if chemin is None:
+                    return
+                en_attente.append(soumettre(chemin))
+
+        def relever_debuts():
+            while True:
+                try:
+                    numero, debut = debuts.get_nowait()
+                except queue.Empty:
+                    return
+                echeances[numero] = debut + timeout + _MARGE_TIMEOUT
+
+        completer()
+        while en_attente:
+            numero, chemin, resultat = en_attente[0]
+            if timeout is None:
+                documents, erreur = resultat.get()
+            else:
+                resultat.wait(_SCRUTATION)
+                relever_debuts()
+                if resultat.ready():
+                    documents, erreur = resultat.get()
+                elif time.monotonic() >= echeances.get(numero, float("inf")):
+                    # Filet de sécurité : le worker n'a pas pu s'interrompre lui-même
+                    # (bloqué dans du code C...). On l'arrête avec tout le pool, et les
+                    # fichiers pas encore terminés repartent dans un pool neuf.
+                    documents, erreur = [], "worker bloqué"
+                    bloque = True
+                    pool.terminate()
+                    pool.join()
+                    pool, debuts = _nouveau_pool(processus)
+                    echeances.clear()
+                    en_attente[1:] = [e if e[2].ready() else soumettre(e[1]) for e in en_attente[1:]]
+                else:
+                    continue
+            en_attente.pop(0)
+            echeances.pop(numero, None)
+            completer()
+            yield chemin, documents, erreur
+    finally:
+        if bloque:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
@@ -0,0 +1,177 @@
+"""
+🗂️ Découpage Markdown - Chunks par section et index des titres
+==============================================================
+
+Découper reglements_cegedim.md en fenêtres aveugles de 500 caractères ignore
+sa structure : un chunk peut mélanger la fin d'une procédure et le début de
+la suivante, et rien n'indique à quelle section il appartient.
+
+DecoupeurMarkdown lit l'arbre des titres (# / ## / ### ...) en un seul passage :
+- chaque chunk reste dans sa section (le splitter habituel découpe chaque section)
+- le chemin des titres est mis en métadonnée : "titres" = ["Procédures", "Pegase"]
+- start_index reste la position dans le fichier entier (recollage des voisins)
+
+IndexTitres garde, pour chaque section, les positions FAISS de ses chunks (et
+de ceux de ses sous-sections). Une question qui nomme une section
+("procédure Pegase") est reconnue par une recherche dans un dictionnaire
+(les groupes de mots de la question, quelle que soit la taille du corpus) :
+la section est renvoyée directement, sans recherche vectorielle.
+
+L'index est sauvegardé dans l'artefact (titres.json, voir index_persistant.py).
+"""
+
+import re
+import json
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterable
+import numpy as np
+from langchain_core.documents import Document
+from .cache_requetes import normaliser
+from .assemblage_contexte import assembler_chunks
+
+# Titres ATX ("## Titre"), hors blocs de code délimités par ``` ou ~~~
+_TITRE = re.compile(r"^(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$", re.M)
+_CLOTURE = re.compile(r"^[ \t]*(```|~~~)", re.M)
+
+# Un titre d'un seul mot n'est reconnu que précédé d'un de ces mots ("procédure Pegase")
+MARQUEURS = {"section", "procedure", "procedures", "partie", "chapitre", "rubrique", "regle", "regles"}
+
+SEPARATEUR_TITRES = " > "
+
+
+@dataclass
+class Section:
+    """Une section du document : son chemin de titres et ses positions dans le texte."""
+    chemin: tuple[str, ...]
+    debut: int          # début du titre
+    fin_propre: int     # fin de son propre texte (titre suivant, quel que soit son niveau)
+
+
+def sections(texte: str) -> list[Section]:
+    """
+    Arbre des titres du texte, à plat et dans l'ordre du document.
+
+    Le texte avant le premier titre forme une section de chemin vide.
+    """
+    blocs_code = [m.start() for m in _CLOTURE.finditer(texte)]
+    titres = []
+    for m in _TITRE.finditer(texte):
+        # Un "#" dans un bloc de code (commentaire shell...) n'est pas un titre
+        if bisect_left(blocs_code, m.start()) % 2 == 0:
+            titres.append((m.start(), len(m.group(1)), m.group(2).strip()))
+
+    resultat = [Section((), 0, titres[0][0] if titres else len(texte))]
+    pile: list[tuple[int, str]] = []  # (niveau, titre) des sections ouvertes
+    for i, (debut, niveau, titre) in enumerate(titres):
+        while pile and pile[-1][0] >= niveau:
+            pile.pop()
+        pile.append((niveau, titre))
+        fin_propre = titres[i + 1][0] if i + 1 < len(titres) else len(texte)
+        resultat.append(Section(tuple(t for _, t in pile), debut, fin_propre))
+    return resultat
+
+
+class DecoupeurMarkdown:
+    """Découpe chaque section avec le splitter donné, et ajoute le chemin des titres aux chunks."""
+
+    def __init__(self, splitter):
+        self.splitter = splitter
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        chunks = []
+        for document in documents:
+            texte = document.page_content
+            for section in sections(texte):
+                contenu = texte[section.debut:section.fin_propre]
+                # Titre seul (suivi directement d'un sous-titre) : rien à indexer
+                if not contenu.strip() or (section.chemin and not contenu.partition("\n")[2].strip()):
+                    continue
+                for chunk in self.splitter.create_documents([contenu], [document.metadata]):
+                    if "start_index" in chunk.metadata:
+                        chunk.metadata["start_index"] += section.debut
+                    if section.chemin:
+                        chunk.metadata["titres"] = list(section.chemin)
+                    chunks.append(chunk)
+        return chunks
+
+
+def chemin_titres(metadata: dict) -> str | None:
+    """"Procédures > Pegase" pour un chunk découpé par DecoupeurMarkdown, None sinon."""
+    titres = metadata.get("titres")
+    return SEPARATEUR_TITRES.join(titres) if titres else None
+
+
+class IndexTitres:
+    """Sections du corpus : chemin → positions FAISS, et titre normalisé → chemins."""
+
+    def __init__(self, sections: dict[str, np.ndarray] | None = None):
+        self.sections = sections or {}
+        # Clés de recherche : le titre seul, et le titre précédé de celui de son parent
+        self.titres: dict[str, list[str]] = {}
+        for chemin in self.sections:
+            titres = chemin.split(SEPARATEUR_TITRES)
+            cles = {normaliser(titres[-1])}
+            if len(titres) > 1:
+                cles.add(normaliser(f"{titres[-2]} {titres[-1]}"))
+            for cle in cles:
+                if cle:
+                    self.titres.setdefault(cle, []).append(chemin)
+        self.mots_max = max((len(cle.split()) for cle in self.titres), default=0)
+
+    @classmethod
+    def depuis_vectorstore(cls, vectorstore) -> "IndexTitres":
+        """Une entrée par section ET par section parente de chaque chunk."""
+        listes: dict[str, list[int]] = {}
+        for position, id_doc in vectorstore.index_to_docstore_id.items():
+            titres = vectorstore.docstore.search(id_doc).metadata.get("titres") or []
+            for n in range(1, len(titres) + 1):
+                listes.setdefault(SEPARATEUR_TITRES.join(titres[:n]), []).append(position)
+        return cls({chemin: np.asarray(sorted(positions), dtype="int64") for chemin, positions in listes.items()})
+
+    def chercher(self, question: str) -> str | None:
+        """
+        Section nommée dans la question, ou None.
+
+        Les groupes de mots de la question (du plus long au plus court) sont
+        cherchés dans le dictionnaire des titres. Un titre présent à plusieurs
+        endroits du corpus est ambigu : None (la recherche vectorielle prend le relais).
+        """
+        mots = normaliser(question).split()
+        for n in range(min(self.mots_max, len(mots)), 0, -1):
+            for i in range(len(mots) - n + 1):
+                chemins = self.titres.get(" ".join(mots[i:i + n]))
+                if not chemins or (n == 1 and (i == 0 or mots[i - 1] not in MARQUEURS)):
+                    continue
+                return chemins[0] if len(chemins) == 1 else None
+        return None
+
+    def octets(self) -> int:
+        """Taille des listes de positions et des chemins de sections."""
+        return sum(liste.nbytes + len(chemin.encode("utf-8")) for chemin, liste in self.sections.items())
+
+    def sauvegarder(self, chemin: str):
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump({section: liste.tolist() for section, liste in self.sections.items()}, f, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, chemin: str) -> "IndexTitres":
+        with open(chemin, encoding="utf-8") as f:
+            return cls({section: np.asarray(liste, dtype="int64") for section, liste in json.load(f).items()})
+
+
+def lire_section(vectorstore, question: str) -> list[Document]:
+    """
+    Chunks de la section nommée dans la question, recollés dans l'ordre du document.
+
+    Returns:
+        [] si la question ne nomme aucune section connue (ou si l'index n'a pas de titres).
+    """
+    index = getattr(vectorstore, "index_titres", None)
+    chemin = index.chercher(question) if index is not None else None
+    if chemin is None:
+        return []
+    documents = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(p)])
+                 for p in index.sections[chemin]]
+    documents.sort(key=lambda d: d.metadata.get("start_index", 0))
+    return assembler_chunks(documents)
@@ -0,0 +1,230 @@
+"""
+✂️ Découpage rapide - Mêmes chunks que RecursiveCharacterTextSplitter, en moins de temps
+=======================================================================================
+
+RecursiveCharacterTextSplitter relit le texte à chaque niveau de séparateur
+("\\n\\n", puis "\\n", puis ". "...) : re.search puis re.split sur chaque
+morceau, en recréant des chaînes à chaque étape. Sur des milliers de pages,
+le découpage pèse dans le temps de construction, et chaque essai de
+chunk_size le refait entièrement.
+
+DecoupeurRapide produit EXACTEMENT les mêmes chunks (texte et start_index) :
+- les positions de chaque séparateur sont cherchées UNE fois dans tout le texte
+  (un seul passage par séparateur), puis retrouvées par dichotomie dans chaque morceau
+- les morceaux sont des intervalles (début, fin) du texte d'origine : aucune
+  chaîne n'est créée avant le chunk final
+- les morceaux étant contigus, la fusion en chunks (taille max, overlap) se
+  fait par dichotomie sur leurs bornes, sans boucle sur chaque morceau
+
+Cas couverts : séparateurs littéraux, keep_separator=True (ou "start"),
+longueur = len. Pour les autres réglages, creer_decoupeur() renvoie le
+RecursiveCharacterTextSplitter de LangChain.
+
+Configuration (variables d'environnement) :
+- RAG_DECOUPAGE_RAPIDE=0 : revenir au splitter de LangChain
+"""
+
+import os
+import re
+import copy
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+DECOUPAGE_RAPIDE = os.getenv("RAG_DECOUPAGE_RAPIDE", "1") == "1"
+
+SEPARATEURS_DEFAUT = ["\n\n", "\n", " ", ""]
+
+# Paramètres de RecursiveCharacterTextSplitter reproduits à l'identique
+_PARAMETRES = {"chunk_size", "chunk_overlap", "separators", "keep_separator", "add_start_index",
+               "strip_whitespace", "is_separator_regex"}
+
+# Valeurs de métadonnées qu'une copie simple duplique aussi bien que deepcopy
+_SCALAIRES = (str, int, float, bool, type(None))
+
+
+def _a_un_bord(separateur: str) -> bool:
+    """Vrai si le séparateur peut chevaucher sa propre occurrence ("\\n\\n" dans "\\n\\n\\n")."""
+    return any(separateur[:i] == separateur[-i:] for i in range(1, len(separateur)))
+
+
+class DecoupeurRapide:
+    """
+    Remplaçant de RecursiveCharacterTextSplitter (mêmes paramètres, mêmes chunks).
+
+    S'utilise comme lui : split_text(), create_documents(), split_documents().
+    """
+
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 200, separators: list[str] | None = None,
+                 keep_separator: bool | str = True, add_start_index: bool = False, strip_whitespace: bool = True,
+                 is_separator_regex: bool = False):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"chunk_overlap must be >= 0, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), "
+                             "should be smaller.")
+        if is_separator_regex or keep_separator not in (True, "start"):
+            raise ValueError("DecoupeurRapide : séparateurs littéraux et keep_separator=True uniquement")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators or SEPARATEURS_DEFAUT)
+        self.add_start_index = add_start_index
+        self.strip_whitespace = strip_whitespace
+        self._motifs = [re.compile(re.escape(s)) if s else None for s in self.separators]
+        self._bords = [_a_un_bord(s) for s in self.separators]
+
+    @staticmethod
+    def accepte(params: dict) -> bool:
+        """Vrai si ces paramètres de RecursiveCharacterTextSplitter sont reproduits à l'identique."""
+        return (set(params) <= _PARAMETRES
+                and not params.get("is_separator_regex", False)
+                and params.get("keep_separator", True) in (True, "start"))
+
+    # ───────────────────────────────────────────────────────────────────────
+    # Découpage en intervalles
+    # ───────────────────────────────────────────────────────────────────────
+
+    def intervalles(self, texte: str) -> list[tuple[int, int, int]]:
+        """
+        Chunks du texte sous forme d'intervalles : [(début, fin, start_index)].
+
+        texte[début:fin] est le chunk ; start_index est la valeur que LangChain
+        écrit dans les métadonnées (même recherche text.find que create_documents),
+        ou -1 sans add_start_index.
+        """
+        positions: dict[int, list[int]] = {}
+        morceaux = self._decouper(texte, 0, len(texte), 0, positions)
+
+        if self.add_start_index:
+            resultat, index, longueur_precedente = [], 0, 0
+            for debut, fin in morceaux:
+                # create_documents : recherche du chunk à partir de la fin du précédent, moins l'overlap
+                index = texte.find(texte[debut:fin], max(0, index + longueur_precedente - self.chunk_overlap))
+                longueur_precedente = fin - debut
+                resultat.append((debut, fin, index))
+        else:
+            resultat = [(debut, fin, -1) for debut, fin in morceaux]
+        return resultat
+
+    def _positions(self, texte: str, niveau: int, debut: int, fin: int, positions: dict) -> list[int]:
+        """Positions des occurrences du séparateur `niveau` entièrement comprises dans [debut, fin)."""
+        separateur = self.separators[niveau]
+        if self._bords[niveau] and (debut, fin) != (0, len(texte)):
+            # Les occurrences d'un séparateur à bord dépendent du point de départ : recherche locale
+            return [m.start() for m in self._motifs[niveau].finditer(texte, debut, fin)]
+        if niveau not in positions:
+            # Un seul passage sur tout le texte, réutilisé par tous les morceaux
+            positions[niveau] = [m.start() for m in self._motifs[niveau].finditer(texte)]
+        toutes = positions[niveau]
+        return toutes[bisect_left(toutes, debut):bisect_right(toutes, fin - len(separateur))]
+
+    def _decouper(self, texte: str, debut: int, fin: int, niveau: int, positions: dict) -> list[tuple[int, int]]:
+        """Équivalent de RecursiveCharacterTextSplitter._split_text sur texte[debut:fin]."""
+        # Premier séparateur présent dans le morceau (le séparateur vide est toujours "présent")
+        choisi, suivant, occurrences = len(self.separators) - 1, len(self.separators), []
+        for i in range(niveau, len(self.separators)):
+            if not self.separators[i]:
+                choisi = i
+                break
+            occurrences = self._positions(texte, i, debut, fin, positions)
+            if occurrences:
+                choisi, suivant = i, i + 1
+                break
+
+        # Bornes des morceaux : chaque occurrence du séparateur ouvre un morceau
+        # (keep_separator="start"), les morceaux sont donc contigus
+        if not self.separators[choisi]:
+            bornes = list(range(debut, fin + 1))
+        elif occurrences and occurrences[0] == debut:
+            bornes = [*occurrences, fin]
+        else:
+            bornes = [debut, *occurrences, fin]
+
+        # Les morceaux trop longs coupent la suite en séries de petits morceaux à fusionner
+        chunks, premier = [], 0
+        for i in [i for i in range(len(bornes) - 1) if bornes[i + 1] - bornes[i] >= self.chunk_size]:
+            if i > premier:
+                chunks.extend(self._fusionner(texte, bornes, premier, i))
+            if suivant >= len(self.separators):
+                chunks.append((bornes[i], bornes[i + 1]))  # trop long, plus de séparateur : gardé tel quel
+            else:
+                chunks.extend(self._decouper(texte, bornes[i], bornes[i + 1], suivant, positions))
+            premier = i + 1
+        if premier < len(bornes) - 1:
+            chunks.extend(self._fusionner(texte, bornes, premier, len(bornes) - 1))
+        return chunks
+
+    def _fusionner(self, texte: str, bornes: list[int], premier: int, dernier: int) -> list[tuple[int, int]]:
+        """
+        Équivalent de TextSplitter._merge_splits (séparateur vide) sur les morceaux
+        contigus bornes[premier:dernier + 1].
+
+        Morceaux contigus : la taille d'un chunk est bornes[j] - bornes[premier].
+        Chaque décision de LangChain (le morceau suivant déborde ? combien de
+        morceaux garder en overlap ?) devient une recherche par dichotomie.
+        """
+        chunks = []
+        while True:
+            # Premier morceau j qui ferait déborder le chunk commencé au morceau `premier`
+            j = bisect_right(bornes, bornes[premier] + self.chunk_size, premier, dernier + 1) - 1
+            if j >= dernier:
+                break
+            chunk = self._nettoyer(texte, bornes[premier], bornes[j])
+            if chunk is not None:
+                chunks.append(chunk)
+            # Overlap : on retire des morceaux en tête tant que la fin dépasse chunk_overlap,
+            # ou que le morceau j ne tient pas à la suite
+            premier = max(bisect_left(bornes, bornes[j] - self.chunk_overlap, premier, j),
+                          bisect_left(bornes, bornes[j + 1] - self.chunk_size, premier, j))
+        chunk = self._nettoyer(texte, bornes[premier], bornes[dernier])
+        if chunk is not None:
+            chunks.append(chunk)
+        return chunks
+
+    def _nettoyer(self, texte: str, debut: int, fin: int) -> tuple[int, int] | None:
+        """Intervalle sans les blancs de début et de fin (strip_whitespace), None s'il est vide."""
+        if debut >= fin:
+            return None
+        if self.strip_whitespace and (texte[debut].isspace() or texte[fin - 1].isspace()):
+            sans_debut = texte[debut:fin].lstrip()
+            debut, fin = fin - len(sans_debut), fin - len(sans_debut) + len(sans_debut.rstrip())
+        return (debut, fin) if debut < fin else None
+
+    # ───────────────────────────────────────────────────────────────────────
+    # Interface des text splitters LangChain
+    # ───────────────────────────────────────────────────────────────────────
+
+    def split_text(self, text: str) -> list[str]:
+        return [text[debut:fin] for debut, fin, _ in self.intervalles(text)]
+
+    def create_documents(self, texts: list[str], metadatas: list[dict] | None = None) -> list[Document]:
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for texte, metadata in zip(texts, metadatas):
+            # Métadonnées "plates" (cas des loaders) : une copie simple équivaut à deepcopy
+            plates = all(isinstance(v, _SCALAIRES) for v in metadata.values())
+            for debut, fin, index in self.intervalles(texte):
+                meta = dict(metadata) if plates else copy.deepcopy(metadata)
+                if self.add_start_index:
+                    meta["start_index"] = index
+                documents.append(Document(page_content=texte[debut:fin], metadata=meta))
+        return documents
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        documents = list(documents)
+        return self.create_documents([d.page_content for d in documents], [d.metadata for d in documents])
+
+
+def creer_decoupeur(params: dict):
+    """
+    Splitter pour ces paramètres : DecoupeurRapide si possible, sinon RecursiveCharacterTextSplitter.
+
+    Args:
+        params: Paramètres de RecursiveCharacterTextSplitter (ex : Corpus.params_decoupage)
+    """
+    if DECOUPAGE_RAPIDE and DecoupeurRapide.accepte(params):
+        return DecoupeurRapide(**params)
+    return RecursiveCharacterTextSplitter(**params)
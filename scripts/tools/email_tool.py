@@ -10,10 +10,23 @@ Pour activer l'envoi réel, configurez les variables d'environnement :
 - SMTP_PORT
 - SMTP_USER
 - SMTP_PASSWORD
+
+En async, l'envoi passe par aiosmtplib (optionnel : pip install aiosmtplib),
+sinon par smtplib dans un thread.
 """
 
 import os
-from langchain_core.tools import tool
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from langchain_core.tools import StructuredTool
+from .execution_async import en_thread
+
+try:
+    import aiosmtplib
+    AIOSMTPLIB_AVAILABLE = True
+except ImportError:
+    AIOSMTPLIB_AVAILABLE = False
 
 # Configuration SMTP (optionnel)
 SMTP_SERVER = os.getenv("SMTP_SERVER")
@@ -25,12 +38,8 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SIMULATION_MODE = not all([SMTP_SERVER, SMTP_USER, SMTP_PASSWORD])
 
 
-@tool
-def envoyer_email(destinataire: str, sujet: str, message: str) -> str:
-    """Utile pour envoyer un email à quelqu'un.
-    Peut servir à envoyer des rapports, des notifications, ou des résumés d'analyse.
-    Entrée : destinataire (email), sujet, et corps du message."""
-    
+def _verifier(destinataire: str, sujet: str, message: str) -> str | None:
+    """Message d'erreur si l'email est invalide, None sinon."""
     # Validation basique
     if "@" not in destinataire:
         return "❌ Erreur : L'adresse email du destinataire semble invalide (pas de @)."
@@ -41,9 +50,12 @@ def envoyer_email(destinataire: str, sujet: str, message: str) -> str:
     if not message.strip():
         return "❌ Erreur : Le message ne peut pas être vide."
     
-    if SIMULATION_MODE:
-        # Mode simulation - on affiche ce qui SERAIT envoyé
-        return f"""📧 **EMAIL SIMULÉ** (mode test)
+    return None
+
+
+def _simulation(destinataire: str, sujet: str, message: str) -> str:
+    # Mode simulation - on affiche ce qui SERAIT envoyé
+    return f"""📧 **EMAIL SIMULÉ** (mode test)
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 📬 À : {destinataire}
@@ -55,26 +67,64 @@ def envoyer_email(destinataire: str, sujet: str, message: str) -> str:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 ⚠️ Cet email n'a PAS été envoyé (mode simulation).
 Pour activer l'envoi réel, configurez SMTP_SERVER, SMTP_USER et SMTP_PASSWORD dans .env"""
+
+
+def _construire_message(destinataire: str, sujet: str, message: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = SMTP_USER
+    msg["To"] = destinataire
+    msg["Subject"] = sujet
+    msg.attach(MIMEText(message, "plain", "utf-8"))
+    return msg
+
+
+def _envoyer_smtp(msg: MIMEMultipart):
+    with smtplib.SMTP(SMTP_SERVER, int(SMTP_PORT)) as server:
+        server.starttls()
+        server.login(SMTP_USER, SMTP_PASSWORD)
+        server.send_message(msg)
+
+
+def _envoyer_email(destinataire: str, sujet: str, message: str) -> str:
+    """Utile pour envoyer un email à quelqu'un.
+    Peut servir à envoyer des rapports, des notifications, ou des résumés d'analyse.
+    Entrée : destinataire (email), sujet, et corps du message."""
+    
+    erreur = _verifier(destinataire, sujet, message)
+    if erreur:
+        return erreur
     
-    else:
-        # Mode réel - envoi via SMTP
-        try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            
-            msg = MIMEMultipart()
-            msg["From"] = SMTP_USER
-            msg["To"] = destinataire
-            msg["Subject"] = sujet
-            msg.attach(MIMEText(message, "plain", "utf-8"))
-            
-            with smtplib.SMTP(SMTP_SERVER, int(SMTP_PORT)) as server:
-                server.starttls()
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.send_message(msg)
-            
-            return f"✅ Email envoyé avec succès à {destinataire} !"
-        
-        except Exception as e:
-            return f"❌ Erreur lors de l'envoi de l'email : {e}"
+    if SIMULATION_MODE:
+        return _simulation(destinataire, sujet, message)
+    
+    # Mode réel - envoi via SMTP
+    try:
+        _envoyer_smtp(_construire_message(destinataire, sujet, message))
+        return f"✅ Email envoyé avec succès à {destinataire} !"
+    
+    except Exception as e:
+        return f"❌ Erreur lors de l'envoi de l'email : {e}"
+
+
+async def _aenvoyer_email(destinataire: str, sujet: str, message: str) -> str:
+    erreur = _verifier(destinataire, sujet, message)
+    if erreur:
+        return erreur
+    
+    if SIMULATION_MODE:
+        return _simulation(destinataire, sujet, message)
+    
+    try:
+        msg = _construire_message(destinataire, sujet, message)
+        if AIOSMTPLIB_AVAILABLE:
+            await aiosmtplib.send(msg, hostname=SMTP_SERVER, port=int(SMTP_PORT),
+                                  username=SMTP_USER, password=SMTP_PASSWORD, start_tls=True)
+        else:
+            await en_thread(_envoyer_smtp, msg)
+        return f"✅ Email envoyé avec succès à {destinataire} !"
+    
+    except Exception as e:
+        return f"❌ Erreur lors de l'envoi de l'email : {e}"
+
+
+envoyer_email = StructuredTool.from_function(func=_envoyer_email, coroutine=_aenvoyer_email, name="envoyer_email")
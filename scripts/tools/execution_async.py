@@ -0,0 +1,43 @@
+"""
+⚡ Exécution async - Des outils qui ne bloquent pas la boucle d'événements
+=========================================================================
+
+Un outil LangChain sans coroutine est exécuté par ainvoke() dans l'exécuteur
+par défaut de la boucle : un thread bloqué par appel, quel que soit le travail
+(attente réseau, calcul...). Chaque outil de ce package a donc une version async :
+- recherches RAG (FAISS, BM25 : du calcul) → pool de threads borné (en_thread)
+- recherche web → ddgs dans ce même pool de threads
+- email → SMTP async (aiosmtplib si installé)
+- graphiques → ce même pool de threads (une Figure Agg par graphique, sans pyplot)
+
+Un agent async (astream / ainvoke) peut ainsi servir de nombreuses sessions
+simultanées depuis un seul processus.
+
+Configuration (variables d'environnement) :
+- RAG_ASYNC_WORKERS : threads pour les recherches (défaut 8)
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from langchain_core.runnables.config import run_in_executor
+
+WORKERS_ASYNC = int(os.getenv("RAG_ASYNC_WORKERS", "8"))
+
+_verrou = threading.Lock()
+_threads: ThreadPoolExecutor | None = None
+
+
+def _pool_threads() -> ThreadPoolExecutor:
+    global _threads
+    with _verrou:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=WORKERS_ASYNC, thread_name_prefix="outils")
+        return _threads
+
+
+async def en_thread(fonction: Callable, *args, **kwargs):
+    """Exécute une fonction bloquante dans le pool de threads des outils (contexte LangChain conservé)."""
+    return await run_in_executor(_pool_threads(), fonction, *args, **kwargs)
+
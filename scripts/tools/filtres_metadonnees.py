@@ -0,0 +1,136 @@
+"""
+🏷️ Filtres par métadonnées - Listes de positions précalculées (consultant, fichier, page)
+=========================================================================================
+
+Pour une question comme "points forts du rapport d'Antoine", chercher dans
+les quatre rapports et espérer que les bons chunks sortent dans le top 4 est
+à la fois lent et imprécis.
+
+À l'indexation, on précalcule pour chaque champ filtrable la liste triée des
+positions FAISS de ses chunks :
+    consultant → {"antoine douez": [0, 1, 2, ...], "nicolas isnardy": [...]}
+    fichier    → {"rapport_antoine.pdf": [...], ...}
+    page       → {"1": [...], "2": [...], ...}
+
+Un filtre devient une intersection de listes triées, puis la recherche
+vectorielle est RESTREINTE à ces positions (faiss.IDSelectorBatch) : seuls
+les chunks qui correspondent sont comparés à la question.
+
+L'index est sauvegardé dans l'artefact (filtres.json, voir index_persistant.py).
+"""
+
+import os
+import json
+import numpy as np
+import faiss
+from .cache_requetes import normaliser
+
+# Champs filtrables et leur extraction depuis les métadonnées d'un chunk
+CHAMPS = {
+    "consultant": lambda m: m.get("consultant"),
+    "fichier": lambda m: os.path.basename(m["source"]) if m.get("source") else None,
+    # PyPDFLoader numérote les pages à partir de 0 ; les filtres, à partir de 1
+    "page": lambda m: m["page"] + 1 if isinstance(m.get("page"), int) else None,
+}
+
+
+def _correspond(valeur_filtre: str, valeur: str) -> bool:
+    """'Antoine' correspond à 'antoine douez' (tous les mots du filtre sont présents)."""
+    return valeur_filtre == valeur or set(valeur_filtre.split()) <= set(valeur.split())
+
+
+class IndexFiltres:
+    """Listes de positions FAISS par (champ, valeur normalisée)."""
+
+    def __init__(self, postings: dict[str, dict[str, np.ndarray]] | None = None):
+        self.postings = postings or {}
+
+    @classmethod
+    def depuis_vectorstore(cls, vectorstore) -> "IndexFiltres":
+        """Construit l'index sur les chunks du vectorstore, dans l'ordre des positions."""
+        listes = {champ: {} for champ in CHAMPS}
+        for position, id_doc in vectorstore.index_to_docstore_id.items():
+            metadata = vectorstore.docstore.search(id_doc).metadata
+            for champ, extraire in CHAMPS.items():
+                valeur = extraire(metadata)
+                if valeur is not None:
+                    listes[champ].setdefault(normaliser(str(valeur)), []).append(position)
+        return cls({
+            champ: {valeur: np.asarray(sorted(positions), dtype="int64") for valeur, positions in valeurs.items()}
+            for champ, valeurs in listes.items() if valeurs
+        })
+
+    def valeurs(self, champ: str) -> list[str]:
+        """Valeurs connues d'un champ (ex : les consultants)."""
+        return sorted(self.postings.get(champ, {}))
+
+    def positions(self, filtres: dict) -> np.ndarray | None:
+        """
+        Positions des chunks qui respectent TOUS les filtres.
+
+        Args:
+            filtres: {champ: valeur ou liste de valeurs}, les valeurs None sont ignorées
+
+        Returns:
+            Tableau trié de positions (éventuellement vide), ou None s'il n'y a aucun filtre.
+        """
+        resultat = None
+        for champ, valeurs in filtres.items():
+            if valeurs is None:
+                continue
+            if champ not in CHAMPS:
+                raise ValueError(f"Champ non filtrable : '{champ}' (champs : {list(CHAMPS)})")
+            valeurs = valeurs if isinstance(valeurs, (list, tuple, set)) else [valeurs]
+            connues = self.postings.get(champ, {})
+            listes = [liste for valeur in map(lambda v: normaliser(str(v)), valeurs)
+                      for connue, liste in connues.items() if _correspond(valeur, connue)]
+            # Plusieurs valeurs d'un même champ : union ; champs différents : intersection
+            union = np.unique(np.concatenate(listes)) if listes else np.empty(0, dtype="int64")
+            resultat = union if resultat is None else np.intersect1d(resultat, union, assume_unique=True)
+        return resultat
+
+    def octets(self) -> int:
+        """Taille des listes de positions et des valeurs."""
+        return sum(liste.nbytes + len(valeur.encode("utf-8"))
+                   for valeurs in self.postings.values() for valeur, liste in valeurs.items())
+
+    def sauvegarder(self, chemin: str):
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump({champ: {valeur: liste.tolist() for valeur, liste in valeurs.items()}
+                       for champ, valeurs in self.postings.items()}, f, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, chemin: str) -> "IndexFiltres":
+        with open(chemin, encoding="utf-8") as f:
+            donnees = json.load(f)
+        return cls({champ: {valeur: np.asarray(liste, dtype="int64") for valeur, liste in valeurs.items()}
+                    for champ, valeurs in donnees.items()})
+
+
+def _parametres(index, selecteur):
+    """Paramètres de recherche FAISS restreints au sélecteur, selon le type d'index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.IndexRefineSearchParameters(
+            k_factor=index.k_factor, base_index_params=_parametres(index.base_index, selecteur))
+    try:
+        return faiss.SearchParametersIVF(sel=selecteur, nprobe=faiss.extract_index_ivf(index).nprobe)
+    except RuntimeError:
+        pass  # pas un index IVF
+    hnsw = getattr(index, "hnsw", None)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selecteur, efSearch=hnsw.efSearch)
+    return faiss.SearchParameters(sel=selecteur)
+
+
+def recherche_restreinte(vectorstore, vecteur: list[float], k: int, positions: np.ndarray) -> list[tuple[int, float]]:
+    """Les k chunks les plus proches PARMI les positions données : [(position, score FAISS)]."""
+    if len(positions) == 0:
+        return []
+    requete = np.asarray([vecteur], dtype="float32")
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(requete)
+    selecteur = faiss.IDSelectorBatch(np.ascontiguousarray(positions, dtype="int64"))
+    scores, trouves = vectorstore.index.search(requete, min(k, len(positions)),
+                                               params=_parametres(vectorstore.index, selecteur))
+    return [(int(p), float(s)) for p, s in zip(trouves[0], scores[0]) if p != -1]
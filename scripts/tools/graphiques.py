@@ -4,18 +4,22 @@
 
 Génère des graphiques avec matplotlib.
 Les graphiques sont sauvegardés dans le dossier 'outputs/'.
+
+Chaque graphique est une Figure indépendante rendue par Agg (sans l'état global
+de pyplot) : plusieurs graphiques peuvent être rendus en même temps dans des
+threads. En async, le rendu tourne dans le pool de threads des outils (execution_async).
 """
 
 import os
 import json
 from datetime import datetime
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+from .execution_async import en_thread
 
 # On essaie d'importer matplotlib
 try:
-    import matplotlib.pyplot as plt
-    import matplotlib
-    matplotlib.use('Agg')  # Mode non-interactif pour serveur
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # Mode non-interactif pour serveur
     MATPLOTLIB_AVAILABLE = True
 except ImportError:
     MATPLOTLIB_AVAILABLE = False
@@ -29,8 +33,7 @@ def _ensure_output_dir():
     return output_dir
 
 
-@tool
-def generer_graphique(type_graphique: str, donnees: str, titre: str) -> str:
+def _generer_graphique(type_graphique: str, donnees: str, titre: str) -> str:
     """Utile pour créer des graphiques et visualisations.
     
     Types supportés : 'barres', 'camembert', 'ligne'
@@ -60,7 +63,9 @@ Pour l'activer, installez matplotlib : pip install matplotlib"""
             return "❌ Erreur : Le nombre de labels doit correspondre au nombre de valeurs."
         
         # Créer le graphique
-        fig, ax = plt.subplots(figsize=(10, 6))
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
         
         # Couleurs modernes
         colors = ['#4CAF50', '#2196F3', '#FF9800', '#E91E63', '#9C27B0', '#00BCD4']
@@ -86,16 +91,16 @@ Pour l'activer, installez matplotlib : pip install matplotlib"""
             return f"❌ Type de graphique '{type_graphique}' non reconnu. Utilisez : 'barres', 'camembert', ou 'ligne'."
         
         ax.set_title(titre, fontsize=14, fontweight='bold', pad=20)
-        plt.tight_layout()
+        fig.tight_layout()
         
         # Sauvegarder le graphique
         output_dir = _ensure_output_dir()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microsecondes : des graphiques rendus en parallèle n'écrasent pas le même fichier
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"graphique_{type_graphique}_{timestamp}.png"
         filepath = os.path.join(output_dir, filename)
         
-        plt.savefig(filepath, dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close()
+        fig.savefig(filepath, dpi=150, bbox_inches='tight', facecolor='white')
         
         return f"""✅ Graphique généré avec succès !
 
@@ -111,3 +116,14 @@ Exemple correct : {"labels": ["A", "B", "C"], "valeurs": [10, 20, 30]}"""
     
     except Exception as e:
         return f"❌ Erreur lors de la génération du graphique : {e}"
+
+
+async def _agenerer_graphique(type_graphique: str, donnees: str, titre: str) -> str:
+    return await en_thread(_generer_graphique, type_graphique, donnees, titre)
+
+
+generer_graphique = StructuredTool.from_function(
+    func=_generer_graphique,
+    coroutine=_agenerer_graphique,
+    name="generer_graphique",
+)
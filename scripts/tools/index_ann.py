@@ -0,0 +1,127 @@
+"""
+🧭 Index approximatifs (ANN) - IVF, HNSW, PQ via l'index factory FAISS
+======================================================================
+
+FAISS.from_documents crée un index "Flat" : la recherche compare la question
+à TOUS les vecteurs. Le temps de recherche grandit donc linéairement avec le
+corpus.
+
+Un index approximatif (ANN) ne compare qu'une partie des vecteurs :
+- "IVF256,Flat"  : 256 groupes (k-means), on ne fouille que les `nprobe` plus proches
+- "HNSW32"       : graphe de voisinage, parcouru avec `efSearch` candidats
+- "IVF256,PQ32"  : IVF + vecteurs compressés (Product Quantization, 32 octets/vecteur)
+- "SQfp16" / "SQ8" : vecteurs quantifiés en float16 (÷2) ou int8 (÷4), recherche exhaustive
+
+Reclassement exact (optionnel) : l'index compressé fournit k × facteur
+candidats, dont les distances sont recalculées exactement à partir des
+vecteurs float32 de l'index Flat, lu en mémoire mappée (seules les pages des
+candidats sont lues). On garde la taille mémoire de l'index compressé avec un
+rappel proche de la recherche exacte.
+
+La chaîne de description est celle de faiss.index_factory. L'index est
+entraîné sur un échantillon des vecteurs du corpus, puis rempli dans le même
+ordre que l'index Flat : les positions (index_to_docstore_id) restent valides.
+
+Configuration (variables d'environnement) :
+- RAG_INDEX : description FAISS de l'index (défaut "Flat" = recherche exacte)
+- RAG_INDEX_ECHANTILLON : nombre de vecteurs pour l'entraînement (défaut 20000)
+- RAG_INDEX_NPROBE : groupes fouillés par un index IVF (défaut 16)
+- RAG_INDEX_EF_SEARCH : candidats parcourus par un index HNSW (défaut 64)
+- RAG_INDEX_RECLASSEMENT : facteur de reclassement exact (défaut 0 = désactivé)
+
+Pour comparer les configurations :
+    python scripts/benchmarks/bench_index_ann.py
+    python scripts/benchmarks/bench_quantification.py
+"""
+
+import os
+import numpy as np
+import faiss
+
+TYPE_INDEX = os.getenv("RAG_INDEX", "Flat")
+TAILLE_ECHANTILLON = int(os.getenv("RAG_INDEX_ECHANTILLON", "20000"))
+NPROBE = int(os.getenv("RAG_INDEX_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("RAG_INDEX_EF_SEARCH", "64"))
+RECLASSEMENT = int(os.getenv("RAG_INDEX_RECLASSEMENT", "0"))
+
+
+def est_exact(type_index: str) -> bool:
+    """True pour l'index Flat (recherche exacte, rien à construire)."""
+    return type_index.replace(" ", "") in ("", "Flat")
+
+
+def regler_recherche(index, nprobe: int = NPROBE, ef_search: int = EF_SEARCH):
+    """
+    Applique les paramètres de recherche (non sauvegardés dans le fichier de l'index).
+
+    Construit aussi la table position → liste inversée d'un index IVF, dont
+    reconstruct_batch a besoin (MMR) : une fois au chargement, jamais pendant
+    une recherche (make_direct_map n'est pas thread-safe).
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None  # pas un index IVF
+    if ivf is not None:
+        ivf.nprobe = nprobe
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+
+
+def construire_index(vecteurs: np.ndarray, type_index: str, metrique: int = faiss.METRIC_L2,
+                     taille_echantillon: int = TAILLE_ECHANTILLON, graine: int = 0):
+    """
+    Construit un index FAISS à partir de vecteurs (dans leur ordre).
+
+    Args:
+        vecteurs: Matrice (n, d) float32
+        type_index: Description pour faiss.index_factory (ex : "IVF256,Flat", "HNSW32")
+        metrique: faiss.METRIC_L2 ou faiss.METRIC_INNER_PRODUCT
+        taille_echantillon: Nombre max de vecteurs utilisés pour l'entraînement
+        graine: Graine du tirage de l'échantillon (résultat reproductible)
+
+    Raises:
+        RuntimeError: si l'index ne peut pas être entraîné (ex : moins de
+        vecteurs que de groupes IVF)
+    """
+    vecteurs = np.ascontiguousarray(vecteurs, dtype="float32")
+    index = faiss.index_factory(vecteurs.shape[1], type_index, metrique)
+    if not index.is_trained:
+        if len(vecteurs) > taille_echantillon:
+            tirage = np.random.default_rng(graine).choice(len(vecteurs), taille_echantillon, replace=False)
+            echantillon = vecteurs[np.sort(tirage)]
+        else:
+            echantillon = vecteurs
+        index.train(echantillon)
+    index.add(vecteurs)
+    regler_recherche(index)
+    return index
+
+
+def convertir_index(index_plat, type_index: str, **options):
+    """Index ANN contenant les mêmes vecteurs, dans le même ordre, qu'un index Flat."""
+    vecteurs = index_plat.reconstruct_n(0, index_plat.ntotal)
+    return construire_index(vecteurs, type_index, index_plat.metric_type, **options)
+
+
+def fichier_index(type_index: str) -> str:
+    """Nom du fichier de l'index ANN dans un artefact (un fichier par configuration)."""
+    nom = "".join(c if c.isalnum() else "_" for c in type_index.replace(" ", ""))
+    return f"index_ann-{nom}.faiss"
+
+
+def avec_reclassement(index, index_exact, facteur: int = RECLASSEMENT):
+    """
+    Ajoute un reclassement exact à un index compressé (faiss.IndexRefine).
+
+    Args:
+        index: Index compressé (ex : "SQ8"), même ordre de vecteurs que index_exact
+        index_exact: Index Flat float32 (idéalement lu en mémoire mappée)
+        facteur: Candidats demandés à l'index compressé = k × facteur
+    """
+    index_reclasse = faiss.IndexRefine(index, index_exact)
+    index_reclasse.k_factor = facteur
+    return index_reclasse
@@ -0,0 +1,432 @@
+"""
+💾 Index persistant - Cache disque des bases vectorielles FAISS
+==============================================================
+
+Sans cache, chaque processus recharge, redécoupe et re-vectorise tout le corpus
+au premier appel d'un outil RAG (lent + coûteux en appels d'embeddings).
+
+Ici, la base FAISS construite est sauvegardée sur le disque dans un dossier
+versionné. La clé du cache couvre :
+- le contenu du corpus (hash de chaque fichier)
+- les paramètres du découpage (chunk_size, chunk_overlap, separators)
+- le modèle d'embeddings
+
+L'artefact contient aussi l'index lexical BM25 des mêmes chunks (recherche hybride),
+les listes de positions par consultant/fichier/page (filtres de métadonnées),
+les sections Markdown et leurs chunks (index des titres, voir decoupage_markdown.py)
+et, si le corpus le demande, un index approximatif (IVF, HNSW, PQ...) construit
+à partir de l'index Flat (voir index_ann.py), ainsi que les chunks dans un
+format compact, lisible en RAM ou en mémoire mappée (voir stockage_chunks.py).
+
+Tant que la clé ne change pas, la base est simplement rechargée (quelques ms).
+
+Quand le corpus change, la réindexation est INCRÉMENTALE grâce au manifeste
+(manifest.json) qui mémorise, pour chaque fichier, son hash et les ids de ses
+chunks : seuls les fichiers nouveaux ou modifiés sont vectorisés, les vecteurs
+des fichiers supprimés sont retirés de l'index FAISS et du docstore.
+
+Dossier de cache configurable via la variable d'environnement RAG_CACHE_DIR.
+
+Réindexation manuelle (depuis la racine du dépôt) :
+    python scripts/reindexer_corpus.py [--watch]
+"""
+
+import os
+import glob
+import json
+import contextlib
+import shutil
+import hashlib
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from .pipeline_embeddings import decouper_en_flux, indexer_flux
+from .chargement_pdf import charger_en_parallele, hash_fichier
+from .decoupage_rapide import creer_decoupeur
+from .decoupage_markdown import DecoupeurMarkdown, IndexTitres
+from .recherche_hybride import IndexBM25
+from .filtres_metadonnees import IndexFiltres
+from .index_ann import (TYPE_INDEX, RECLASSEMENT, est_exact, convertir_index, regler_recherche,
+                        fichier_index, avec_reclassement)
+from . import stockage_chunks
+from .stockage_chunks import MODE_MMAP
+
+# Dossier racine du cache (un sous-dossier par corpus)
+CACHE_DIR = os.getenv("RAG_CACHE_DIR", "scripts/.rag_cache")
+
+# À incrémenter si le format des artefacts change
+FORMAT_VERSION = 4
+
+# Un verrou par corpus : deux réindexations du même corpus ne se chevauchent pas
+_verrous: dict[str, threading.Lock] = {}
+_verrous_lock = threading.Lock()
+
+
+@dataclass
+class Corpus:
+    """Description d'un corpus indexable (dossier + chargement + découpage)."""
+    nom: str
+    path: str
+    motifs: list[str]
+    params_decoupage: dict
+    charger_fichier: Callable[[str], Iterable[Document]]
+    workers: int = 1                        # > 1 : chargement dans un pool de processus
+    timeout_fichier: float | None = None    # délai max de chargement d'un fichier (s)
+    type_index: str = TYPE_INDEX            # description faiss.index_factory ("Flat" = exact)
+    reclassement: int = RECLASSEMENT        # > 1 : reclassement exact de k × reclassement candidats
+
+
+def _verrou(nom: str) -> threading.Lock:
+    with _verrous_lock:
+        return _verrous.setdefault(nom, threading.Lock())
+
+
+def lister_fichiers(path: str, motifs: list[str]) -> list[str]:
+    """Liste (triée) des fichiers du corpus correspondant aux motifs glob."""
+    fichiers = set()
+    for motif in motifs:
+        fichiers.update(glob.glob(os.path.join(path, motif), recursive=True))
+    return sorted(f for f in fichiers if os.path.isfile(f))
+
+
+def _relatif(path: str, chemin: str) -> str:
+    return os.path.relpath(chemin, path).replace(os.sep, "/")
+
+
+def hash_corpus(hashes: dict[str, str]) -> str:
+    """Hash du corpus à partir des hashs de fichiers {chemin relatif: hash}."""
+    h = hashlib.sha256()
+    for relatif in sorted(hashes):
+        h.update(relatif.encode("utf-8"))
+        h.update(hashes[relatif].encode("ascii"))
+    return h.hexdigest()
+
+
+def nom_modele_embeddings(embeddings) -> str:
+    """Nom du modèle d'embeddings (ex : 'text-embedding-ada-002')."""
+    # Un cache d'embeddings ne change pas les vecteurs : on regarde le modèle enveloppé
+    embeddings = getattr(embeddings, "sous_jacent", embeddings)
+    modele = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}:{modele}"
+
+
+def _hash_json(contenu: dict) -> str:
+    texte = json.dumps(contenu, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+def cle_config(params_decoupage: dict, modele: str) -> str:
+    """Clé de configuration : découpage + modèle (sans le contenu du corpus)."""
+    return _hash_json({"format": FORMAT_VERSION, "decoupage": params_decoupage, "modele": modele})
+
+
+def cle_cache(empreinte_corpus: str, params_decoupage: dict, modele: str) -> str:
+    """Clé du cache : change dès que le corpus, le découpage ou le modèle change."""
+    return _hash_json({"config": cle_config(params_decoupage, modele), "corpus": empreinte_corpus})
+
+
+def _splitter(corpus: Corpus):
+    """Text splitter configuré avec les paramètres du corpus (découpage rapide, voir decoupage_rapide.py).
+
+    Avec "structure_markdown": True, chaque section Markdown est découpée séparément.
+    """
+    params = dict(corpus.params_decoupage)
+    if params.pop("structure_markdown", False):
+        return DecoupeurMarkdown(creer_decoupeur(params))
+    return creer_decoupeur(params)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 📁 ARTEFACTS SUR DISQUE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _lire_json(chemin: str) -> dict | None:
+    try:
+        with open(chemin, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _artefact_de_base(dossier_corpus: str, config: str) -> str | None:
+    """Artefact existant construit avec la même configuration (base de l'incrémental)."""
+    if not os.path.isdir(dossier_corpus):
+        return None
+    for nom_dossier in sorted(os.listdir(dossier_corpus)):
+        dossier = os.path.join(dossier_corpus, nom_dossier)
+        meta = _lire_json(os.path.join(dossier, "meta.json"))
+        if meta and meta.get("config") == config and os.path.exists(os.path.join(dossier, "manifest.json")):
+            return dossier
+    return None
+
+
+def _publier(dossier_corpus: str, cle: str, vectorstore: FAISS, manifeste: dict, meta: dict) -> str:
+    """Écrit l'artefact dans un dossier temporaire puis le renomme.
+
+    Un processus concurrent ne voit donc jamais un artefact à moitié écrit.
+    Les anciennes versions sont supprimées ensuite.
+    """
+    os.makedirs(dossier_corpus, exist_ok=True)
+    dossier_index = os.path.join(dossier_corpus, cle[:16])
+    dossier_tmp = tempfile.mkdtemp(dir=dossier_corpus, prefix=".tmp_")
+    vectorstore.save_local(dossier_tmp)
+    stockage_chunks.ecrire(dossier_tmp, vectorstore)
+    # L'index lexical est reconstruit sur exactement les mêmes chunks
+    vectorstore.index_bm25 = IndexBM25.depuis_vectorstore(vectorstore)
+    vectorstore.index_bm25.sauvegarder(dossier_tmp)
+    IndexFiltres.depuis_vectorstore(vectorstore).sauvegarder(os.path.join(dossier_tmp, "filtres.json"))
+    IndexTitres.depuis_vectorstore(vectorstore).sauvegarder(os.path.join(dossier_tmp, "titres.json"))
+    with open(os.path.join(dossier_tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(dossier_tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    try:
+        os.replace(dossier_tmp, dossier_index)
+    except OSError:
+        # Un autre processus a publié le même artefact entre-temps
+        shutil.rmtree(dossier_tmp, ignore_errors=True)
+
+    for ancien in os.listdir(dossier_corpus):
+        if ancien != cle[:16] and not ancien.startswith(".tmp_"):
+            shutil.rmtree(os.path.join(dossier_corpus, ancien), ignore_errors=True)
+    return dossier_index
+
+
+def _brancher_index_ann(vectorstore: FAISS, dossier_index: str, type_index: str, reclassement: int,
+                       verbose: bool):
+    """Remplace l'index Flat chargé par l'index ANN demandé.
+
+    L'index Flat (index.faiss) reste la référence de l'artefact : c'est lui que
+    la réindexation incrémentale met à jour. L'index ANN est construit une fois
+    par configuration, puis rechargé tel quel.
+
+    Avec reclassement > 1, les candidats de l'index ANN sont reclassés
+    exactement à partir de index.faiss, toujours lu en mémoire mappée.
+    """
+    if est_exact(type_index):
+        return
+    import faiss
+    chemin = os.path.join(dossier_index, fichier_index(type_index))
+    if os.path.exists(chemin):
+        index = stockage_chunks.lire_index_mmap(chemin) if MODE_MMAP else faiss.read_index(chemin)
+        regler_recherche(index)
+    else:
+        try:
+            index = convertir_index(vectorstore.index, type_index)
+        except RuntimeError as e:
+            print(f"   ⚠️ Index '{type_index}' impossible ({e}) : recherche exacte conservée")
+            return
+        chemin_tmp = f"{chemin}.{os.getpid()}.tmp"
+        faiss.write_index(index, chemin_tmp)
+        os.replace(chemin_tmp, chemin)
+        if verbose:
+            print(f"   🧭 Index '{type_index}' construit ({index.ntotal} vecteurs)")
+        if MODE_MMAP:
+            index = stockage_chunks.lire_index_mmap(chemin)
+            regler_recherche(index)
+    if reclassement > 1:
+        index_exact = stockage_chunks.lire_index_mmap(os.path.join(dossier_index, "index.faiss"))
+        index = avec_reclassement(index, index_exact, reclassement)
+    vectorstore.index = index
+
+
+def _ouvrir_artefact(dossier_index: str, embeddings, cle: str) -> FAISS:
+    """Charge un artefact publié (docstore compact, mappé en mode service) avec son index BM25."""
+    if stockage_chunks.existe(dossier_index):
+        vectorstore = stockage_chunks.ouvrir(dossier_index, embeddings)
+    else:
+        vectorstore = FAISS.load_local(dossier_index, embeddings, allow_dangerous_deserialization=True)
+    vectorstore.version_index = cle[:16]
+    if not IndexBM25.existe(dossier_index):
+        # Artefact d'une version précédente (bm25.json) : tableaux BM25 écrits une fois pour toutes
+        IndexBM25.depuis_vectorstore(vectorstore).sauvegarder(dossier_index)
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(dossier_index, "bm25.json"))
+    vectorstore.index_bm25 = IndexBM25.charger(dossier_index, vectorstore.index_to_docstore_id)
+    chemin_filtres = os.path.join(dossier_index, "filtres.json")
+    if os.path.exists(chemin_filtres):
+        vectorstore.index_filtres = IndexFiltres.charger(chemin_filtres)
+    else:
+        vectorstore.index_filtres = IndexFiltres.depuis_vectorstore(vectorstore)
+    chemin_titres = os.path.join(dossier_index, "titres.json")
+    if os.path.exists(chemin_titres):
+        vectorstore.index_titres = IndexTitres.charger(chemin_titres)
+    else:
+        vectorstore.index_titres = IndexTitres.depuis_vectorstore(vectorstore)
+    return vectorstore
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 🔄 CHARGEMENT / RÉINDEXATION
+# ═══════════════════════════════════════════════════════════════════════════
+
+def reindexer(corpus: Corpus, embeddings, sur_lot: Callable[[FAISS], None] | None = None,
+              verbose: bool = True, embeddings_indexation=None) -> FAISS:
+    """
+    Recharge la base FAISS du corpus, en la mettant à jour si besoin.
+
+    - Clé inchangée → simple rechargement depuis le cache.
+    - Corpus modifié → seuls les fichiers nouveaux/modifiés sont vectorisés,
+      les vecteurs des fichiers supprimés sont retirés.
+    - Aucun artefact compatible → construction complète.
+
+    Les fichiers sont traités en flux (mémoire bornée) ; `sur_lot` reçoit
+    l'index partiel après chaque lot vectorisé.
+
+    Le vectorstore retourné porte aussi son index lexical BM25
+    (vectorstore.index_bm25), construit sur les mêmes chunks et sauvegardé
+    dans le même artefact (tableaux bm25_*.npy), ses filtres de métadonnées
+    (vectorstore.index_filtres, filtres.json), son index des titres Markdown
+    (vectorstore.index_titres, titres.json), et sa version (vectorstore.version_index,
+    utilisée pour invalider les caches de requêtes).
+
+    Le vectorstore retourné est en lecture seule : ses chunks sont dans un
+    DocstoreCompact (un Document n'est construit que pour les chunks retournés),
+    dont delete() lève TypeError. Les suppressions se font ici, sur l'artefact
+    de base rechargé avec FAISS.load_local, puis un nouveau DocstoreCompact
+    est écrit avec le nouvel artefact.
+    En mode service (RAG_MMAP=1), index et chunks sont mappés en mémoire.
+
+    Le manifeste associe à chaque fichier son hash et ses chunk_ids. Ces ids
+    sont aussi les ids des vecteurs dans FAISS (index_to_docstore_id), c'est
+    avec eux qu'on supprime les vecteurs via vectorstore.delete(ids).
+
+    `embeddings` est gardé par le vectorstore (questions, avec les retries du
+    SDK) ; `embeddings_indexation` (défaut : embeddings) ne sert qu'à vectoriser
+    les chunks dans indexer_flux, dont le backoff adaptatif suppose max_retries=0.
+    """
+    modele = nom_modele_embeddings(embeddings)
+    config = cle_config(corpus.params_decoupage, modele)
+    dossier_corpus = os.path.join(CACHE_DIR, corpus.nom)
+
+    with _verrou(corpus.nom):
+        fichiers = {_relatif(corpus.path, f): f for f in lister_fichiers(corpus.path, corpus.motifs)}
+        hashes = {relatif: hash_fichier(chemin) for relatif, chemin in fichiers.items()}
+        cle = cle_cache(hash_corpus(hashes), corpus.params_decoupage, modele)
+        dossier_index = os.path.join(dossier_corpus, cle[:16])
+
+        if os.path.exists(os.path.join(dossier_index, "meta.json")):
+            if verbose:
+                print(f"   ⚡ Index '{corpus.nom}' rechargé depuis le cache ({cle[:16]})")
+            vectorstore = _ouvrir_artefact(dossier_index, embeddings, cle)
+            _brancher_index_ann(vectorstore, dossier_index, corpus.type_index, corpus.reclassement, verbose)
+            return vectorstore
+
+        vectorstore = None
+        manifeste = {"fichiers": {}}
+        base = _artefact_de_base(dossier_corpus, config)
+        if base:
+            vectorstore = FAISS.load_local(base, embeddings, allow_dangerous_deserialization=True)
+            manifeste = _lire_json(os.path.join(base, "manifest.json"))
+
+        anciens = manifeste["fichiers"]
+        supprimes = [r for r in anciens if r not in hashes]
+        modifies = [r for r in hashes if r in anciens and anciens[r]["hash"] != hashes[r]]
+        nouveaux = [r for r in hashes if r not in anciens]
+        if verbose:
+            print(f"   🔄 Index '{corpus.nom}' : {len(nouveaux)} nouveau(x), "
+                  f"{len(modifies)} modifié(s), {len(supprimes)} supprimé(s)")
+
+        # 1. Retirer les vecteurs des fichiers supprimés ou modifiés
+        ids_a_retirer = [i for r in supprimes + modifies for i in anciens[r]["chunk_ids"]]
+        if vectorstore is not None and ids_a_retirer:
+            vectorstore.delete(ids_a_retirer)
+        for relatif in supprimes:
+            del anciens[relatif]
+
+        # 2. Vectoriser uniquement les fichiers nouveaux ou modifiés, en flux :
+        #    chargement → découpage → embeddings par lots → ajout dans FAISS
+        def flux_chunks():
+            chemins = [fichiers[r] for r in modifies + nouveaux]
+            for chemin, documents, erreur in charger_en_parallele(
+                corpus.charger_fichier, chemins, corpus.workers, corpus.timeout_fichier
+            ):
+                relatif = _relatif(corpus.path, chemin)
+                entree = anciens[relatif] = {"hash": hashes[relatif], "chunk_ids": []}
+                if erreur:
+                    # Le fichier reste dans le manifeste : il ne sera retenté que s'il change
+                    entree["erreur"] = erreur
+                    print(f"   ⚠️ {relatif} ignoré : {erreur}")
+                for chunk in decouper_en_flux(documents, _splitter(corpus)):
+                    id_chunk = f"{relatif}:{hashes[relatif][:12]}:{len(entree['chunk_ids'])}"
+                    entree["chunk_ids"].append(id_chunk)
+                    yield chunk, id_chunk
+
+        vectorstore = indexer_flux(flux_chunks(), embeddings_indexation or embeddings, vectorstore,
+                                   embeddings_requetes=embeddings, sur_lot=sur_lot, verbose=verbose)
+
+        if vectorstore is None:
+            raise ValueError(f"Aucun document à indexer dans {corpus.path}")
+
+        meta = {
+            "cle": cle,
+            "config": config,
+            "format": FORMAT_VERSION,
+            "fichiers": len(anciens),
+            "chunks": len(vectorstore.index_to_docstore_id),
+            "decoupage": corpus.params_decoupage,
+            "modele": modele,
+        }
+        dossier_index = _publier(dossier_corpus, cle, vectorstore, manifeste, meta)
+        if verbose:
+            print(f"   💾 Index '{corpus.nom}' sauvegardé dans {dossier_index}")
+        # On relâche les objets Document de la construction au profit du docstore compact
+        vectorstore = _ouvrir_artefact(dossier_index, embeddings, cle)
+        _brancher_index_ann(vectorstore, dossier_index, corpus.type_index, corpus.reclassement, verbose)
+        return vectorstore
+
+
+def charger_ou_construire(corpus: Corpus, embeddings, embeddings_indexation=None) -> FAISS:
+    """Recharge la base FAISS depuis le cache, ou la (re)construit puis la sauvegarde (voir reindexer)."""
+    return reindexer(corpus, embeddings, embeddings_indexation=embeddings_indexation)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 👀 MODE SURVEILLANCE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _signature(corpus: Corpus) -> list[tuple]:
+    """Signature bon marché du dossier (chemin, taille, date de modification)."""
+    signature = []
+    for chemin in lister_fichiers(corpus.path, corpus.motifs):
+        stat = os.stat(chemin)
+        signature.append((chemin, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def surveiller(corpus: Corpus, retriever, embeddings, intervalle: float = 5.0,
+               embeddings_indexation=None) -> threading.Event:
+    """
+    Surveille le dossier du corpus et applique les changements au retriever en cours.
+
+    Un thread vérifie le dossier toutes les `intervalle` secondes. À chaque
+    changement, l'index est réindexé (incrémental) puis branché sur le retriever
+    par simple remplacement de référence : les recherches en cours ne voient
+    jamais un index à moitié modifié. `embeddings` et `embeddings_indexation` :
+    voir reindexer.
+
+    Returns:
+        Un threading.Event : appeler .set() pour arrêter la surveillance.
+    """
+    arret = threading.Event()
+    signature_initiale = _signature(corpus)
+
+    def boucle():
+        signature = signature_initiale
+        while not arret.wait(intervalle):
+            nouvelle = _signature(corpus)
+            if nouvelle == signature:
+                continue
+            signature = nouvelle
+            try:
+                retriever.vectorstore = reindexer(corpus, embeddings, embeddings_indexation=embeddings_indexation)
+                print(f"👀 Index '{corpus.nom}' mis à jour à chaud")
+            except Exception as e:
+                print(f"❌ Réindexation de '{corpus.nom}' impossible : {e}")
+
+    threading.Thread(target=boucle, name=f"surveillance-{corpus.nom}", daemon=True).start()
+    return arret
+
@@ -0,0 +1,252 @@
+"""
+🚚 Pipeline d'embeddings - Construction d'index par lots concurrents
+===================================================================
+
+FAISS.from_documents(chunks, embeddings) vectorise tout d'un bloc : aucun
+contrôle de la taille des lots, pas de parallélisme, et un simple 429
+(rate limit) fait échouer la construction.
+
+Ce pipeline construit l'index en 4 étapes :
+1. Lots "token-aware" : on remplit chaque lot jusqu'à la limite du modèle
+2. Pool borné de requêtes d'embeddings concurrentes
+3. Backoff adaptatif sur les 429 (la concurrence se réduit puis remonte)
+4. Ajout incrémental dans FAISS dès qu'un lot est terminé
+
+Configuration (variables d'environnement) :
+- RAG_EMBED_CONCURRENCE : nombre de requêtes simultanées (défaut 4)
+- RAG_EMBED_MAX_TOKENS_LOT : tokens max par requête (défaut 300 000, limite OpenAI)
+- RAG_EMBED_MAX_TEXTES_LOT : textes max par requête (défaut 256)
+
+Benchmark : python scripts/benchmarks/bench_pipeline_embeddings.py
+"""
+
+import os
+import time
+import random
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+CONCURRENCE = int(os.getenv("RAG_EMBED_CONCURRENCE", "4"))
+MAX_TOKENS_LOT = int(os.getenv("RAG_EMBED_MAX_TOKENS_LOT", "300000"))
+MAX_TEXTES_LOT = int(os.getenv("RAG_EMBED_MAX_TEXTES_LOT", "256"))
+MAX_TENTATIVES = 8
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 1️⃣ LOTS TOKEN-AWARE
+# ═══════════════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=1)
+def _encodeur():
+    """Tokenizer tiktoken (chargé une seule fois), ou None s'il est absent."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def compter_tokens(texte: str) -> int:
+    """Nombre de tokens d'un texte (approximation 1 token ≈ 4 caractères sans tiktoken)."""
+    encodeur = _encodeur()
+    if encodeur is None:
+        return len(texte) // 4 + 1
+    return len(encodeur.encode(texte, disallowed_special=()))
+
+
+def lots_par_tokens(paires: Iterable[tuple[Document, str | None]], max_tokens: int = MAX_TOKENS_LOT,
+                    max_textes: int = MAX_TEXTES_LOT) -> Iterator[list[tuple[Document, str | None]]]:
+    """Regroupe des paires (chunk, id) en lots sans dépasser les limites.
+
+    Générateur : les chunks sont consommés au fur et à mesure, un lot n'est
+    produit que lorsqu'il est plein (ou à la fin du flux).
+    """
+    lot, tokens_lot = [], 0
+    for chunk, id_chunk in paires:
+        tokens = compter_tokens(chunk.page_content)
+        if lot and (tokens_lot + tokens > max_tokens or len(lot) >= max_textes):
+            yield lot
+            lot, tokens_lot = [], 0
+        lot.append((chunk, id_chunk))
+        tokens_lot += tokens
+    if lot:
+        yield lot
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 2️⃣ BACKOFF ADAPTATIF SUR LES 429
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _est_rate_limit(erreur: Exception) -> bool:
+    """Vrai si l'erreur est un 429 (openai.RateLimitError ou équivalent HTTP)."""
+    if type(erreur).__name__ == "RateLimitError":
+        return True
+    statut = getattr(erreur, "status_code", None) or getattr(getattr(erreur, "response", None), "status_code", None)
+    return statut == 429
+
+
+def _retry_after(erreur: Exception) -> float | None:
+    """Délai suggéré par le serveur (en-tête Retry-After), s'il existe."""
+    reponse = getattr(erreur, "response", None)
+    try:
+        return float(reponse.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class _Regulateur:
+    """Limite adaptative du nombre de requêtes en vol (AIMD, comme TCP).
+
+    - Chaque 429 divise la limite par deux et impose une pause (Retry-After
+      ou backoff exponentiel avec jitter) avant de réessayer.
+    - Chaque succès remonte la limite d'un cran, jusqu'à la concurrence demandée.
+    Le débit converge ainsi vers le quota réel du fournisseur.
+    """
+
+    def __init__(self, maximum: int, base: float = 0.25, pause_max: float = 30.0):
+        self.maximum = maximum
+        self.limite = maximum
+        self.en_vol = 0
+        self.base = base
+        self.pause_max = pause_max
+        self.nb_429 = 0
+        self._cond = threading.Condition()
+
+    def acquerir(self):
+        with self._cond:
+            while self.en_vol >= self.limite:
+                self._cond.wait()
+            self.en_vol += 1
+
+    def liberer(self):
+        with self._cond:
+            self.en_vol -= 1
+            self._cond.notify_all()
+
+    def succes(self):
+        with self._cond:
+            self.limite = min(self.maximum, self.limite + 1)
+            self._cond.notify_all()
+
+    def echec_429(self, tentative: int, suggere: float | None) -> float:
+        """Réduit la limite et retourne la pause à observer avant de réessayer."""
+        with self._cond:
+            self.nb_429 += 1
+            self.limite = max(1, self.limite // 2)
+        pause = suggere if suggere is not None else self.base * 2 ** tentative
+        return min(self.pause_max, pause) * random.uniform(1.0, 1.25)
+
+
+def _vectoriser_lot(embeddings, textes: list[str], regulateur: _Regulateur) -> list[list[float]]:
+    for tentative in range(MAX_TENTATIVES):
+        regulateur.acquerir()
+        try:
+            vecteurs = embeddings.embed_documents(textes)
+        except Exception as e:
+            if not _est_rate_limit(e) or tentative == MAX_TENTATIVES - 1:
+                raise
+            pause = regulateur.echec_429(tentative, _retry_after(e))
+        else:
+            regulateur.succes()
+            return vecteurs
+        finally:
+            regulateur.liberer()
+        time.sleep(pause)
+    raise RuntimeError("inatteignable")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 3️⃣ + 4️⃣ POOL CONCURRENT ET AJOUT INCRÉMENTAL DANS FAISS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def decouper_en_flux(documents: Iterable[Document], text_splitter) -> Iterator[Document]:
+    """Découpe les documents un par un (ex : loader.lazy_load()) sans tout garder en mémoire."""
+    for document in documents:
+        yield from text_splitter.split_documents([document])
+
+
+def indexer_par_lots(chunks: Iterable[Document], embeddings, ids: Iterable[str] | None = None,
+                     vectorstore: FAISS | None = None, **options) -> FAISS | None:
+    """
+    Vectorise les chunks par lots concurrents et les ajoute à FAISS au fil de l'eau.
+
+    Args:
+        chunks: Documents à indexer (liste ou générateur)
+        embeddings: Modèle d'embeddings (idéalement avec max_retries=0 : le backoff est géré ici)
+        ids: Ids des chunks dans le vectorstore, dans le même ordre (optionnel)
+        vectorstore: Index existant à compléter (créé au premier lot sinon)
+        **options: Voir indexer_flux (embeddings_requetes, concurrence, max_tokens, max_textes,
+            sur_lot, verbose)
+
+    Returns:
+        Le vectorstore (None si aucun chunk et aucun index existant)
+    """
+    paires = zip(chunks, ids) if ids is not None else ((chunk, None) for chunk in chunks)
+    return indexer_flux(paires, embeddings, vectorstore, avec_ids=ids is not None, **options)
+
+
+def indexer_flux(paires: Iterable[tuple[Document, str | None]], embeddings, vectorstore: FAISS | None = None,
+                 embeddings_requetes=None, concurrence: int = CONCURRENCE, max_tokens: int = MAX_TOKENS_LOT,
+                 max_textes: int = MAX_TEXTES_LOT, sur_lot: Callable[[FAISS], None] | None = None,
+                 avec_ids: bool = True, verbose: bool = False) -> FAISS | None:
+    """
+    Indexe un flux de paires (chunk, id) : chargement → découpage → embeddings → FAISS.
+
+    Le flux n'est lu qu'au rythme où des places se libèrent dans le pool :
+    au plus `concurrence` lots sont en mémoire à la fois, quelle que soit
+    la taille du corpus.
+
+    Args:
+        paires: Générateur de (chunk, id)
+        embeddings_requetes: Modèle gardé par un vectorstore créé ici, pour
+            vectoriser les questions (défaut : embeddings). Les questions ne
+            passent pas par le backoff du pipeline : leur modèle doit garder
+            les retries du SDK, contrairement à `embeddings` (max_retries=0).
+        sur_lot: Appelé avec le vectorstore après chaque lot ajouté : l'index
+            partiel est interrogeable avant la fin de la construction
+        avec_ids: False pour laisser FAISS générer les ids
+    """
+    lots = lots_par_tokens(paires, max_tokens, max_textes)
+    regulateur = _Regulateur(max(1, concurrence))
+    nb_chunks, nb_lots = 0, 0
+    debut = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrence), thread_name_prefix="embed") as pool:
+        en_cours = {}
+
+        def soumettre():
+            lot = next(lots, None)
+            if lot is not None:
+                textes = [chunk.page_content for chunk, _ in lot]
+                en_cours[pool.submit(_vectoriser_lot, embeddings, textes, regulateur)] = lot
+
+        # On ne garde jamais plus de `concurrence` lots en vol (mémoire bornée)
+        for _ in range(max(1, concurrence)):
+            soumettre()
+
+        while en_cours:
+            termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in termines:
+                lot = en_cours.pop(futur)
+                vecteurs = futur.result()
+                textes_vecteurs = [(chunk.page_content, v) for (chunk, _), v in zip(lot, vecteurs)]
+                metadatas = [chunk.metadata for chunk, _ in lot]
+                ids_lot = [id_chunk for _, id_chunk in lot] if avec_ids else None
+                if vectorstore is None:
+                    vectorstore = FAISS.from_embeddings(textes_vecteurs, embeddings_requetes or embeddings, metadatas=metadatas, ids=ids_lot)
+                else:
+                    vectorstore.add_embeddings(textes_vecteurs, metadatas=metadatas, ids=ids_lot)
+                nb_chunks += len(lot)
+                nb_lots += 1
+                if sur_lot:
+                    sur_lot(vectorstore)
+                soumettre()
+
+    if verbose:
+        print(f"   🚚 {nb_chunks} chunks en {nb_lots} lots ({time.perf_counter() - debut:.2f}s, "
+              f"{regulateur.nb_429} rate limit(s))")
+    return vectorstore
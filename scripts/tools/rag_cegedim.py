@@ -1,91 +1,142 @@
 """
 🔍 Outil RAG - Recherche dans les règlements Cegedim
 ====================================================
+
+Outil sync et async : en async, la recherche tourne dans le pool de threads
+des outils (execution_async).
 """
 
 import os
-from langchain_core.tools import tool
+from dataclasses import replace
+from functools import partial
+from langchain_core.tools import StructuredTool
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import TextLoader, DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+from .cache_embeddings import EmbeddingsEnCache
+from .registre import registre
+from .recherche_hybride import creer_retriever
+from .cache_requetes import CacheRequetes
+from .assemblage_contexte import assembler_chunks
+from .decoupage_markdown import lire_section, chemin_titres
+from .budget_tokens import formater_extraits, aformater_extraits
+from .execution_async import en_thread
+from .index_persistant import Corpus, charger_ou_construire, surveiller
+
+
+def _charger_texte(chemin: str):
+    """Lit un fichier markdown ou txt."""
+    return TextLoader(chemin, encoding="utf-8").lazy_load()
+
+
+# Description du corpus (petits chunks pour ce petit document, découpés section par section)
+CORPUS_CEGEDIM = Corpus(
+    nom="cegedim",
+    path="scripts/DocARag3",
+    motifs=["**/*.md", "**/*.txt"],
+    params_decoupage={
+        "chunk_size": 500,
+        "chunk_overlap": 100,
+        "separators": ["\n\n", "\n", ". ", " ", ""],
+        "add_start_index": True,  # position des chunks : recollage des voisins (assemblage_contexte)
+        "structure_markdown": True,  # chunks limités à une section, chemin des titres en métadonnée
+    },
+    charger_fichier=_charger_texte,
+)
+
+
+def _construire_retriever(path: str):
+    """Charge (ou construit) l'index du corpus et retourne son retriever."""
+    print("📚 Initialisation du RAG Cegedim...")
+    
+    corpus = replace(CORPUS_CEGEDIM, path=path)
+    embeddings = EmbeddingsEnCache(OpenAIEmbeddings())  # questions : retries du SDK
+    indexation = EmbeddingsEnCache(OpenAIEmbeddings(max_retries=0))  # chunks : 429 → backoff de indexer_flux
+    vectorstore = charger_ou_construire(corpus, embeddings, indexation)
+    retriever = creer_retriever(vectorstore, k=3)  # hybride BM25 + vecteurs par défaut (RAG_RECHERCHE)
+    if os.getenv("RAG_SURVEILLANCE") == "1":
+        surveiller(corpus, retriever, embeddings, embeddings_indexation=indexation)
+    print("   ✅ RAG Cegedim prêt !")
+    return retriever
+
+
+# Le registre construit l'index une seule fois, même si plusieurs sessions
+# interrogent l'outil en même temps (lazy loading "single-flight")
+registre.enregistrer("cegedim", partial(_construire_retriever, CORPUS_CEGEDIM.path), source=CORPUS_CEGEDIM.path)
+
 
-# Variable globale pour le retriever (lazy loading)
-_retriever_cegedim = None
+# Cache sémantique des questions (invalidé quand l'index change)
+cache_requetes = CacheRequetes("cegedim")
 
 
 def init_retriever_cegedim(path: str = "scripts/DocARag3"):
     """
-    Initialise le retriever RAG pour les documents Cegedim.
+    Initialise le retriever RAG pour les documents Cegedim (une seule fois, via le registre).
+    La base vectorielle est rechargée depuis le cache disque si le corpus n'a pas changé,
+    sinon seuls les fichiers nouveaux ou modifiés sont re-vectorisés.
+    
+    Avec RAG_SURVEILLANCE=1, les modifications du dossier sont appliquées à chaud.
     
     Args:
         path: Chemin vers le dossier contenant les documents
+
+    Raises:
+        ValueError: si le corpus est déjà chargé depuis un autre dossier
     """
-    global _retriever_cegedim
-    
-    if _retriever_cegedim is None:
-        print("📚 Initialisation du RAG Cegedim...")
-        
-        # Charger tous les fichiers markdown et txt
-        loader = DirectoryLoader(
-            path=path,
-            glob="**/*.md",
-            loader_cls=TextLoader,
-            loader_kwargs={"encoding": "utf-8"},
-            show_progress=True
-        )
-        documents = loader.load()
-        
-        # Ajouter les fichiers .txt si présents
-        try:
-            loader_txt = DirectoryLoader(
-                path=path,
-                glob="**/*.txt",
-                loader_cls=TextLoader,
-                loader_kwargs={"encoding": "utf-8"}
-            )
-            documents.extend(loader_txt.load())
-        except:
-            pass
-        
-        print(f"   ✅ {len(documents)} documents chargés")
-        
-        # Découper en chunks (petits pour ce petit document)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=100,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = text_splitter.split_documents(documents)
-        print(f"   ✅ {len(chunks)} morceaux créés")
-        
-        # Créer le vectorstore
-        print("   🔄 Création de la base vectorielle...")
-        embeddings = OpenAIEmbeddings()
-        vectorstore = FAISS.from_documents(chunks, embeddings)
-        _retriever_cegedim = vectorstore.as_retriever(search_kwargs={"k": 3})
-        print("   ✅ RAG Cegedim prêt !")
-    
-    return _retriever_cegedim
+    registre.enregistrer("cegedim", partial(_construire_retriever, path), source=path)
+    return registre.obtenir("cegedim")
+
+
+def rechercher_cegedim(question: str) -> list:
+    """Chunks de la section nommée dans la question, sinon chunks pertinents recollés."""
+    retriever = registre.obtenir("cegedim")  # corpus enregistré (dossier par défaut ou init_retriever_cegedim)
+    # Question qui nomme une section ("procédure Pegase") : lecture directe, sans recherche vectorielle
+    docs = lire_section(retriever.vectorstore, question)
+    if not docs:
+        docs = cache_requetes.rechercher(question, retriever)
+        # Les chunks voisins/chevauchants d'un même fichier sont recollés : pas de texte en double
+        docs = assembler_chunks(docs)
+    return docs
+
+
+def _extraits(docs: list) -> list[str]:
+    resultats = []
+    for doc in docs:
+        source = doc.metadata.get("source", "inconnu")
+        nom_fichier = os.path.basename(source)
+        section = chemin_titres(doc.metadata)
+        if section:
+            nom_fichier = f"{nom_fichier} > {section}"
+        resultats.append(f"[Source: {nom_fichier}]\n{doc.page_content}")
+    return resultats
+
+
+ENTETE = "Informations trouvées dans les règlements Cegedim :"
+AUCUN_RESULTAT = "Aucune information pertinente trouvée dans les règlements Cegedim."
 
 
-@tool
-def recherche_reglements_cegedim(question: str) -> str:
+def _recherche_reglements_cegedim(question: str, budget_tokens: int | None = None) -> str:
     """Utile pour chercher des informations dans les règlements et procédures Cegedim.
     Permet de trouver : règles de contrats, procédures Pegase, règles Spayr, CDI/CDD, acomptes.
-    Entrée : une question sur les règlements ou procédures internes Cegedim."""
-    
-    retriever = init_retriever_cegedim()
-    docs = retriever.invoke(question)
+    Entrée : une question sur les règlements ou procédures internes Cegedim.
+    budget_tokens (optionnel) : taille max de la réponse en tokens, à réduire si la
+    conversation est déjà longue."""
     
+    docs = rechercher_cegedim(question)
     if docs:
-        resultats = []
-        for doc in docs:
-            source = doc.metadata.get("source", "inconnu")
-            nom_fichier = os.path.basename(source)
-            resultats.append(f"[Source: {nom_fichier}]\n{doc.page_content}")
-        
-        contexte = "\n\n---\n\n".join(resultats)
-        return f"Informations trouvées dans les règlements Cegedim :\n\n{contexte}"
-    
-    return "Aucune information pertinente trouvée dans les règlements Cegedim."
+        # Extraits du plus pertinent au moins pertinent, dans la limite du budget
+        return formater_extraits("recherche_reglements_cegedim", ENTETE, _extraits(docs), budget_tokens)
+    return AUCUN_RESULTAT
+
+
+async def _arecherche_reglements_cegedim(question: str, budget_tokens: int | None = None) -> str:
+    docs = await en_thread(rechercher_cegedim, question)
+    if docs:
+        return await aformater_extraits("recherche_reglements_cegedim", ENTETE, _extraits(docs), budget_tokens)
+    return AUCUN_RESULTAT
+
+
+recherche_reglements_cegedim = StructuredTool.from_function(
+    func=_recherche_reglements_cegedim,
+    coroutine=_arecherche_reglements_cegedim,
+    name="recherche_reglements_cegedim",
+)
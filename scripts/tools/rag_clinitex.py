@@ -1,79 +1,165 @@
 """
 🔍 Outil RAG - Recherche dans les rapports Clinitex
 ===================================================
+
+Outil sync et async : en async, la recherche (FAISS, BM25) tourne dans le
+pool de threads des outils (execution_async), la boucle d'événements reste libre.
 """
 
 import os
-from langchain_core.tools import tool
+import re
+from dataclasses import replace
+from functools import partial
+from langchain_core.tools import StructuredTool
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .cache_embeddings import EmbeddingsEnCache
+from .chargement_pdf import charger_pdf, WORKERS, TIMEOUT_FICHIER
+from .registre import registre
+from .recherche_hybride import creer_retriever, rechercher_avec_filtres
+from .cache_requetes import CacheRequetes, normaliser
+from .assemblage_contexte import assembler_chunks
+from .budget_tokens import formater_extraits, aformater_extraits
+from .execution_async import en_thread
+from .index_persistant import Corpus, charger_ou_construire, surveiller
+
+# Auteurs des rapports : retrouvés dans le nom de chaque PDF à l'indexation
+CONSULTANTS = ["Antoine Douez", "Nicolas Isnardy", "Sacha Dbusschere", "Stéphane Beuve"]
+
+
+def consultant_du_fichier(chemin: str) -> str | None:
+    """Consultant dont le prénom ou le nom apparaît dans le nom du fichier."""
+    mots = set(re.split(r"[\W_]+", normaliser(os.path.basename(chemin))))
+    for consultant in CONSULTANTS:
+        if mots & set(normaliser(consultant).split()):
+            return consultant
+    return None
 
-# Variable globale pour le retriever (lazy loading)
-_retriever = None
+
+def charger_rapport(chemin: str):
+    """Pages d'un rapport, avec le consultant en métadonnée (pour les filtres)."""
+    consultant = consultant_du_fichier(chemin)
+    for page in charger_pdf(chemin):
+        if consultant:
+            page.metadata["consultant"] = consultant
+        yield page
+
+
+# Description du corpus : le découpage fait partie de la clé du cache disque
+CORPUS_CLINITEX = Corpus(
+    nom="clinitex",
+    path="scripts/DocArag2",
+    motifs=["**/*.pdf"],
+    params_decoupage={
+        "chunk_size": 1000,
+        "chunk_overlap": 200,
+        "separators": ["\n\n", "\n", ". ", " ", ""],
+        "add_start_index": True,  # position des chunks : recollage des voisins (assemblage_contexte)
+    },
+    charger_fichier=charger_rapport,
+    workers=WORKERS,                  # PDFs extraits en parallèle (RAG_PDF_WORKERS)
+    timeout_fichier=TIMEOUT_FICHIER,  # un PDF pathologique ne bloque pas la construction
+)
+
+
+def _construire_retriever(path: str):
+    """Charge (ou construit) l'index du corpus et retourne son retriever."""
+    print("📚 Initialisation du RAG Clinitex...")
+    
+    corpus = replace(CORPUS_CLINITEX, path=path)
+    embeddings = EmbeddingsEnCache(OpenAIEmbeddings())  # questions : retries du SDK
+    indexation = EmbeddingsEnCache(OpenAIEmbeddings(max_retries=0))  # chunks : 429 → backoff de indexer_flux
+    vectorstore = charger_ou_construire(corpus, embeddings, indexation)
+    retriever = creer_retriever(vectorstore, k=4)  # hybride BM25 + vecteurs par défaut (RAG_RECHERCHE)
+    if os.getenv("RAG_SURVEILLANCE") == "1":
+        surveiller(corpus, retriever, embeddings, embeddings_indexation=indexation)
+    print("   ✅ RAG Clinitex prêt !")
+    return retriever
+
+
+# Le registre construit l'index une seule fois, même si plusieurs sessions
+# interrogent l'outil en même temps (lazy loading "single-flight")
+registre.enregistrer("clinitex", partial(_construire_retriever, CORPUS_CLINITEX.path), source=CORPUS_CLINITEX.path)
+
+
+# Cache sémantique des questions (invalidé quand l'index change)
+cache_requetes = CacheRequetes("clinitex")
 
 
 def init_retriever_clinitex(path: str = "scripts/DocArag2"):
     """
     Initialise le retriever RAG une seule fois.
-    Appelé automatiquement au premier usage de l'outil.
+    Appelé automatiquement au premier usage de l'outil (via le registre des retrievers).
+    La base vectorielle est rechargée depuis le cache disque si le corpus n'a pas changé,
+    sinon seuls les PDFs nouveaux ou modifiés sont re-vectorisés.
+    
+    Avec RAG_SURVEILLANCE=1, les ajouts/suppressions de PDFs sont appliqués à chaud.
     
     Args:
         path: Chemin vers le dossier contenant les PDFs
+
+    Raises:
+        ValueError: si le corpus est déjà chargé depuis un autre dossier
     """
-    global _retriever
-    
-    if _retriever is None:
-        print("📚 Initialisation du RAG Clinitex...")
-        
-        # Charger tous les PDFs
-        loader = DirectoryLoader(
-            path=path,
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader,
-            show_progress=True
-        )
-        documents = loader.load()
-        print(f"   ✅ {len(documents)} pages chargées")
-        
-        # Découper en chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = text_splitter.split_documents(documents)
-        print(f"   ✅ {len(chunks)} morceaux créés")
-        
-        # Créer le vectorstore
-        print("   🔄 Création de la base vectorielle...")
-        embeddings = OpenAIEmbeddings()
-        vectorstore = FAISS.from_documents(chunks, embeddings)
-        _retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
-        print("   ✅ RAG Clinitex prêt !")
+    registre.enregistrer("clinitex", partial(_construire_retriever, path), source=path)
+    return registre.obtenir("clinitex")
+
+
+def rechercher_clinitex(question: str, consultant: str | None = None, fichier: str | None = None,
+                        page: int | None = None) -> list:
+    """Chunks pertinents, recollés, du plus pertinent au moins pertinent."""
+    retriever = registre.obtenir("clinitex")  # corpus enregistré (dossier par défaut ou init_retriever_clinitex)
+    filtres = {"consultant": consultant, "fichier": fichier, "page": page}
+    if any(valeur is not None for valeur in filtres.values()):
+        # Recherche restreinte aux chunks correspondants (listes précalculées à l'indexation)
+        docs = rechercher_avec_filtres(retriever, question, filtres)
+    else:
+        docs = cache_requetes.rechercher(question, retriever)
     
-    return _retriever
+    # Les chunks voisins/chevauchants d'une même page sont recollés : pas de texte en double
+    return assembler_chunks(docs)
+
+
+def _extraits(docs: list) -> list[str]:
+    resultats = []
+    for doc in docs:
+        source = doc.metadata.get("source", "inconnu")
+        nom_fichier = os.path.basename(source)
+        resultats.append(f"[Source: {nom_fichier}]\n{doc.page_content}")
+    return resultats
+
+
+ENTETE = "Informations trouvées dans les rapports :"
+AUCUN_RESULTAT = "Aucune information pertinente trouvée dans les rapports."
 
 
-@tool
-def recherche_rapports_clinitex(question: str) -> str:
+def _recherche_rapports_clinitex(question: str, consultant: str | None = None, fichier: str | None = None,
+                                 page: int | None = None, budget_tokens: int | None = None) -> str:
     """Utile pour chercher des informations dans les rapports de maturité digitale Clinitex.
     Permet de trouver : scores de maturité, recommandations, axes d'amélioration, 
     points forts/faibles, comparaisons entre consultants (Antoine, Nicolas, Sacha, Stéphane).
-    Entrée : une question sur les rapports de maturité."""
-    
-    retriever = init_retriever_clinitex()
-    docs = retriever.invoke(question)
+    Entrée : une question sur les rapports de maturité.
+    Filtres optionnels pour ne chercher que dans une partie des rapports :
+    consultant (ex : "Antoine"), fichier (nom du PDF), page (numéro à partir de 1).
+    budget_tokens (optionnel) : taille max de la réponse en tokens, à réduire si la
+    conversation est déjà longue."""
     
+    docs = rechercher_clinitex(question, consultant, fichier, page)
     if docs:
-        resultats = []
-        for doc in docs:
-            source = doc.metadata.get("source", "inconnu")
-            nom_fichier = os.path.basename(source)
-            resultats.append(f"[Source: {nom_fichier}]\n{doc.page_content}")
-        
-        contexte = "\n\n---\n\n".join(resultats)
-        return f"Informations trouvées dans les rapports :\n\n{contexte}"
-    
-    return "Aucune information pertinente trouvée dans les rapports."
+        # Extraits du plus pertinent au moins pertinent, dans la limite du budget
+        return formater_extraits("recherche_rapports_clinitex", ENTETE, _extraits(docs), budget_tokens)
+    return AUCUN_RESULTAT
+
+
+async def _arecherche_rapports_clinitex(question: str, consultant: str | None = None, fichier: str | None = None,
+                                        page: int | None = None, budget_tokens: int | None = None) -> str:
+    docs = await en_thread(rechercher_clinitex, question, consultant, fichier, page)
+    if docs:
+        return await aformater_extraits("recherche_rapports_clinitex", ENTETE, _extraits(docs), budget_tokens)
+    return AUCUN_RESULTAT
+
+
+recherche_rapports_clinitex = StructuredTool.from_function(
+    func=_recherche_rapports_clinitex,
+    coroutine=_arecherche_rapports_clinitex,
+    name="recherche_rapports_clinitex",
+)
@@ -0,0 +1,220 @@
+"""
+🌐 Recherche fédérée - Tous les corpus RAG en un seul appel d'outil
+===================================================================
+
+Un agent qui dispose de recherche_rapports_clinitex ET de
+recherche_reglements_cegedim les appelle souvent l'un après l'autre :
+un tour de LLM supplémentaire à chaque fois, et des latences qui s'additionnent.
+
+recherche_tous_corpus interroge tous les corpus du registre EN PARALLÈLE :
+- chaque corpus est interrogé par SA recherche, celle de son outil dédié
+  (hybride BM25 + vecteurs ou MMR, cache des questions, lecture directe d'une
+  section Cegedim, recollage des chunks voisins) : un corpus renvoie les mêmes
+  extraits, dans le même ordre, que son propre outil
+- chaque extrait est noté par la similarité cosinus entre la question et les
+  vecteurs de ses chunks, relus dans l'index du corpus (le meilleur de ses
+  chunks) : contrairement aux scores bruts des recherches (distance L2, RRF
+  BM25 + vecteurs, MMR...) ou aux rangs, ce score se compare d'un corpus à
+  l'autre, et un corpus sans rapport avec la question ne prend pas de place
+- les extraits trop loin du meilleur (écart de cosinus > RAG_FEDERE_ECART) sont écartés
+- un seul top-k, chaque extrait indiquant son corpus et son fichier d'origine
+
+La latence totale est celle du corpus le plus lent, pas leur somme.
+
+Configuration (variables d'environnement) :
+- RAG_FEDERE_K : nombre d'extraits (défaut 5)
+- RAG_FEDERE_ECART : écart de cosinus max avec le meilleur extrait (défaut 0.1)
+
+arechercher_federe est la version async (même résultat) : les mêmes recherches
+lancées avec asyncio.gather dans le pool de threads des outils (execution_async).
+"""
+
+import os
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from langchain_core.tools import StructuredTool
+from .registre import registre
+from .assemblage_contexte import assembler_chunks
+from .decoupage_markdown import chemin_titres
+from .rag_clinitex import rechercher_clinitex
+from .rag_cegedim import rechercher_cegedim
+from .budget_tokens import formater_extraits, aformater_extraits
+from .recherche_hybride import vecteurs_par_position
+from .execution_async import en_thread
+
+K_FEDERE = int(os.getenv("RAG_FEDERE_K", "5"))
+ECART_MAX = float(os.getenv("RAG_FEDERE_ECART", "0.1"))
+
+# Recherche de chaque corpus, celle de son outil dédié (documents du plus au moins pertinent)
+RECHERCHES: dict[str, Callable[[str], list]] = {
+    "clinitex": rechercher_clinitex,
+    "cegedim": rechercher_cegedim,
+}
+
+
+def _positions(vectorstore, ids: list[str]) -> list[int | None]:
+    """Positions FAISS des chunks (None pour un id inconnu)."""
+    docstore = vectorstore.docstore
+    if hasattr(docstore, "position"):
+        return [docstore.position(i) for i in ids]
+    par_id = {id_doc: position for position, id_doc in vectorstore.index_to_docstore_id.items()}
+    return [par_id.get(i) for i in ids]
+
+
+def _similarites(vectorstore, question: str, docs: list) -> list[float]:
+    """
+    Cosinus entre la question et chaque document (le meilleur de ses chunks).
+
+    Les vecteurs des chunks sont relus dans l'index (ids du chunk, ou
+    metadata["ids"] d'un passage recollé) ; un document dont aucun chunk n'est
+    retrouvé est vectorisé.
+    """
+    if not docs:
+        return []
+    requete = np.asarray(vectorstore.embedding_function.embed_query(question), dtype="float32")
+    requete /= np.linalg.norm(requete) or 1.0
+
+    ids_docs = [doc.metadata.get("ids") or [doc.id] for doc in docs]
+    tous = [i for ids in ids_docs for i in ids if i is not None]
+    positions = dict(zip(tous, _positions(vectorstore, tous)))
+    connues = sorted({p for p in positions.values() if p is not None})
+    vecteurs = vecteurs_par_position(vectorstore.index, connues) if connues else np.empty((0, len(requete)))
+    cosinus = dict(zip(connues, vecteurs @ requete / np.maximum(np.linalg.norm(vecteurs, axis=1), 1e-12)))
+
+    scores = [max((float(cosinus[positions[i]]) for i in ids if positions.get(i) is not None), default=None)
+              for ids in ids_docs]
+    manquants = [n for n, score in enumerate(scores) if score is None]
+    if manquants:
+        vecteurs = np.asarray(vectorstore.embedding_function.embed_documents(
+            [docs[n].page_content for n in manquants]), dtype="float32")
+        for n, vecteur in zip(manquants, vecteurs):
+            scores[n] = float(vecteur @ requete / max(np.linalg.norm(vecteur), 1e-12))
+    return scores
+
+
+def _rechercher_corpus(nom: str, question: str) -> list[tuple]:
+    """[(cosinus, Document)] d'un corpus ; sans recherche dédiée : son retriever + recollage."""
+    retriever = registre.obtenir(nom)
+    if nom in RECHERCHES:
+        docs = RECHERCHES[nom](question)
+    else:
+        docs = assembler_chunks(retriever.invoke(question))
+    return list(zip(_similarites(retriever.vectorstore, question, docs), docs))
+
+
+def _fusionner(par_corpus: dict[str, list[tuple]], k: int, ecart_max: float = ECART_MAX) -> list[tuple]:
+    """[(cosinus, nom du corpus, Document)] : top-k de tous les corpus, sans ceux trop loin du meilleur."""
+    resultats = [(score, nom, doc) for nom, notes in par_corpus.items() for score, doc in notes]
+    resultats.sort(key=lambda r: r[0], reverse=True)
+    if resultats:
+        seuil = resultats[0][0] - ecart_max
+        resultats = [r for r in resultats if r[0] >= seuil]
+    return resultats[:k]
+
+
+def rechercher_federe(question: str, k: int = K_FEDERE, noms: list[str] | None = None) -> tuple[list[tuple], dict]:
+    """
+    Interroge plusieurs corpus en parallèle et fusionne leurs résultats.
+
+    Args:
+        question: La question
+        k: Nombre d'extraits du résultat fusionné
+        noms: Corpus à interroger (défaut : tous ceux du registre)
+
+    Returns:
+        (résultats, erreurs) : [(cosinus, corpus, Document)] triés par score
+        décroissant, et {corpus: message} pour les corpus indisponibles.
+    """
+    noms = noms if noms is not None else registre.noms()
+    erreurs, par_corpus = {}, {}
+
+    # Index construits en parallèle si certains corpus sont encore froids
+    with ThreadPoolExecutor(max_workers=max(1, len(noms)), thread_name_prefix="federe") as pool:
+        futurs = {nom: pool.submit(_rechercher_corpus, nom, question) for nom in noms}
+        for nom, futur in futurs.items():
+            try:
+                par_corpus[nom] = futur.result()
+            except Exception as e:
+                erreurs[nom] = str(e)
+
+    return _fusionner(par_corpus, k), erreurs
+
+
+async def arechercher_federe(question: str, k: int = K_FEDERE,
+                             noms: list[str] | None = None) -> tuple[list[tuple], dict]:
+    """Version async de rechercher_federe (mêmes arguments, même résultat)."""
+    noms = noms if noms is not None else registre.noms()
+    erreurs, par_corpus = {}, {}
+
+    recherches = await asyncio.gather(*(en_thread(_rechercher_corpus, nom, question) for nom in noms),
+                                      return_exceptions=True)
+    for nom, recherche in zip(noms, recherches):
+        if isinstance(recherche, Exception):
+            erreurs[nom] = str(recherche)
+        else:
+            par_corpus[nom] = recherche
+
+    return _fusionner(par_corpus, k), erreurs
+
+
+def _extraits(resultats: list[tuple]) -> list[str]:
+    extraits = []
+    for score, nom, doc in resultats:
+        nom_fichier = os.path.basename(doc.metadata.get("source", "inconnu"))
+        section = chemin_titres(doc.metadata)
+        if section:
+            nom_fichier = f"{nom_fichier} > {section}"
+        extraits.append(f"[Source: {nom} / {nom_fichier}]\n{doc.page_content}")
+    return extraits
+
+
+def _entete(resultats: list[tuple]) -> str:
+    return f"Informations trouvées dans {', '.join(sorted({r[1] for r in resultats}))} :"
+
+
+def _indisponibles(erreurs: dict) -> str:
+    if not erreurs:
+        return ""
+    return "\n\n(Corpus indisponibles : " + ", ".join(f"{nom} : {e}" for nom, e in erreurs.items()) + ")"
+
+
+AUCUN_RESULTAT = "Aucune information pertinente trouvée dans les documents."
+
+
+def _recherche_tous_corpus(question: str, budget_tokens: int | None = None) -> str:
+    """Cherche en une seule fois dans TOUS les documents internes : rapports de maturité
+    digitale Clinitex ET règlements/procédures Cegedim (Pegase, Spayr, contrats).
+    À utiliser quand la question peut concerner plusieurs sources, ou quand on ne sait
+    pas dans quels documents chercher. Chaque extrait indique son corpus et son fichier.
+    Entrée : une question.
+    budget_tokens (optionnel) : taille max de la réponse en tokens, à réduire si la
+    conversation est déjà longue."""
+
+    resultats, erreurs = rechercher_federe(question)
+
+    if resultats:
+        # Extraits triés par cosinus décroissant : le budget garde les meilleurs
+        reponse = formater_extraits("recherche_tous_corpus", _entete(resultats), _extraits(resultats), budget_tokens)
+    else:
+        reponse = AUCUN_RESULTAT
+    return reponse + _indisponibles(erreurs)
+
+
+async def _arecherche_tous_corpus(question: str, budget_tokens: int | None = None) -> str:
+    resultats, erreurs = await arechercher_federe(question)
+
+    if resultats:
+        reponse = await aformater_extraits("recherche_tous_corpus", _entete(resultats), _extraits(resultats),
+                                           budget_tokens)
+    else:
+        reponse = AUCUN_RESULTAT
+    return reponse + _indisponibles(erreurs)
+
+
+recherche_tous_corpus = StructuredTool.from_function(
+    func=_recherche_tous_corpus,
+    coroutine=_arecherche_tous_corpus,
+    name="recherche_tous_corpus",
+)
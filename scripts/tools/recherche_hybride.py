@@ -0,0 +1,373 @@
+"""
+🔀 Recherche hybride - BM25 + vecteurs, fusionnés par Reciprocal Rank Fusion
+===========================================================================
+
+La recherche par embeddings rate parfois les identifiants exacts
+(Pegase, Spayr, CDI/CDD, acompte...) : le sens est proche, mais le mot exact
+n'est pas forcément dans les k premiers résultats.
+
+On combine donc deux recherches sur le MÊME ensemble de chunks :
+- un index lexical BM25 (mots exacts, insensible aux accents et à la casse)
+- l'index vectoriel FAISS (sens de la phrase)
+
+Les deux classements sont fusionnés par RRF (Reciprocal Rank Fusion) :
+score(chunk) = Σ 1 / (k_rrf + rang du chunk dans chaque classement)
+
+L'index BM25 est sauvegardé dans le même artefact que l'index FAISS
+(voir index_persistant.py), sous forme de tableaux NumPy (CSR) lus en mémoire
+mappée en mode service : comme le docstore compact, il ne coûte presque rien
+à chaque processus.
+
+Mode choisi par la variable d'environnement RAG_RECHERCHE : "hybride" (défaut),
+"vecteur" ou "mmr".
+
+Le mode "mmr" (Maximal Marginal Relevance) évite de renvoyer des chunks
+presque identiques (chevauchement de 200 caractères entre chunks voisins) :
+parmi les fetch_k candidats les plus proches, on choisit un à un celui qui
+maximise  λ × pertinence − (1 − λ) × ressemblance avec les chunks déjà choisis.
+Le calcul est entièrement vectorisé avec NumPy (une matrice de similarités
+candidats × candidats). Réglages : RAG_MMR_FETCH_K (défaut 20), RAG_MMR_LAMBDA (défaut 0.5).
+
+rechercher_avec_filtres() restreint les deux recherches aux chunks qui
+respectent des filtres de métadonnées (consultant, fichier, page ; voir
+filtres_metadonnees.py).
+"""
+
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from .filtres_metadonnees import IndexFiltres, recherche_restreinte
+from .stockage_chunks import MODE_MMAP
+
+MODE_RECHERCHE = os.getenv("RAG_RECHERCHE", "hybride")
+MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+
+_MOT = re.compile(r"\w+")
+
+# Tableaux de l'index BM25 dans l'artefact (bm25_<nom>.npy)
+_FICHIERS_BM25 = ("mots", "debuts", "positions", "frequences", "longueurs")
+
+
+def tokeniser(texte: str) -> list[str]:
+    """Minuscules, sans accents, sans pluriel simple ("Pégase" → "pegase", "acomptes" → "acompte")."""
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return [mot[:-1] if len(mot) > 3 and mot[-1] in "sx" else mot for mot in _MOT.findall(texte)]
+
+
+class IndexBM25:
+    """
+    Index inversé BM25 au format CSR : mot → positions FAISS des chunks et fréquences.
+
+    Tout est dans des tableaux NumPy (aucun objet Python par posting) :
+    - mots : vocabulaire trié (recherche dichotomique)
+    - debuts : postings du mot i = positions/frequences[debuts[i]:debuts[i + 1]]
+    - positions, frequences : int32, concaténés mot après mot
+    - longueurs : nombre de mots de chaque chunk, par position
+    Les fichiers sont écrits à côté des colonnes du docstore compact et lus de
+    la même façon (en mémoire mappée en mode service, voir stockage_chunks.py).
+
+    `ids` donne l'id du chunk à chaque position (index_to_docstore_id).
+    """
+
+    def __init__(self, mots: np.ndarray, debuts: np.ndarray, positions: np.ndarray, frequences: np.ndarray,
+                 longueurs: np.ndarray, ids, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.mots = mots
+        self.debuts = debuts
+        self.positions = positions
+        self.frequences = frequences
+        self.longueurs = longueurs
+        self.ids = ids
+        self._longueur_moyenne = float(np.mean(longueurs)) if len(longueurs) else 0.0
+
+    @classmethod
+    def depuis_documents(cls, documents: dict[str, Document]) -> "IndexBM25":
+        """Construit l'index à partir de {id: Document} (positions = ordre du dictionnaire)."""
+        postings = defaultdict(list)
+        longueurs = np.zeros(len(documents), dtype="int32")
+        for position, doc in enumerate(documents.values()):
+            mots = tokeniser(doc.page_content)
+            longueurs[position] = len(mots)
+            for mot, frequence in Counter(mots).items():
+                postings[mot].append((position, frequence))
+
+        vocabulaire = sorted(postings, key=lambda mot: mot.encode("utf-8"))
+        debuts = np.zeros(len(vocabulaire) + 1, dtype="int64")
+        debuts[1:] = np.cumsum([len(postings[mot]) for mot in vocabulaire])
+        paires = np.asarray([p for mot in vocabulaire for p in postings[mot]], dtype="int32").reshape(-1, 2)
+        mots = np.asarray([mot.encode("utf-8") for mot in vocabulaire], dtype="S")
+        return cls(mots, debuts, paires[:, 0].copy(), paires[:, 1].copy(), longueurs, list(documents))
+
+    @classmethod
+    def depuis_vectorstore(cls, vectorstore) -> "IndexBM25":
+        """Construit l'index sur exactement les chunks du vectorstore, dans l'ordre de ses positions."""
+        ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+        index = cls.depuis_documents({id_doc: vectorstore.docstore.search(id_doc) for id_doc in ids})
+        index.ids = vectorstore.index_to_docstore_id
+        return index
+
+    def _postings(self, mot: str) -> tuple[np.ndarray, np.ndarray] | None:
+        cle = mot.encode("utf-8")
+        i = int(np.searchsorted(self.mots, cle))
+        if i == len(self.mots) or self.mots[i] != cle:
+            return None
+        debut, fin = int(self.debuts[i]), int(self.debuts[i + 1])
+        return self.positions[debut:fin], self.frequences[debut:fin]
+
+    def rechercher(self, question: str, k: int = 4, autorises=None) -> list[tuple[str, float]]:
+        """Les k chunks les plus pertinents : [(id, score BM25)], parmi les positions `autorises` si données."""
+        nb_docs = len(self.longueurs)
+        if not nb_docs:
+            return []
+        trouves, contributions = [], []
+        for mot in set(tokeniser(question)):
+            postings = self._postings(mot)
+            if postings is None:
+                continue
+            positions, frequences = postings
+            idf = math.log(1 + (nb_docs - len(positions) + 0.5) / (len(positions) + 0.5))
+            frequences = frequences.astype("float64")
+            norme = self.k1 * (1 - self.b + self.b * self.longueurs[positions] / self._longueur_moyenne)
+            trouves.append(positions)
+            contributions.append(idf * frequences * (self.k1 + 1) / (frequences + norme))
+        if not trouves:
+            return []
+
+        positions, inverse = np.unique(np.concatenate(trouves), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        if autorises is not None:
+            garder = np.isin(positions, np.asarray(list(autorises), dtype="int64"))
+            positions, scores = positions[garder], scores[garder]
+        ordre = np.argsort(-scores, kind="stable")[:k]
+        return [(self.ids[int(positions[i])], float(scores[i])) for i in ordre]
+
+    def octets(self) -> int:
+        """Taille des tableaux de l'index (mappés ou en RAM)."""
+        return sum(t.nbytes for t in (self.mots, self.debuts, self.positions, self.frequences, self.longueurs))
+
+    @staticmethod
+    def existe(dossier: str) -> bool:
+        """True si l'artefact contient l'index BM25 (bm25_meta.json est écrit en dernier)."""
+        return os.path.exists(os.path.join(dossier, "bm25_meta.json"))
+
+    def sauvegarder(self, dossier: str):
+        """Écrit les tableaux dans le dossier de l'artefact (chaque fichier remplacé d'un coup)."""
+        for nom in _FICHIERS_BM25:
+            chemin = os.path.join(dossier, f"bm25_{nom}.npy")
+            with open(f"{chemin}.{os.getpid()}.tmp", "wb") as f:
+                np.save(f, getattr(self, nom))
+            os.replace(f"{chemin}.{os.getpid()}.tmp", chemin)
+        chemin = os.path.join(dossier, "bm25_meta.json")
+        with open(f"{chemin}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b}, f)
+        os.replace(f"{chemin}.{os.getpid()}.tmp", chemin)
+
+    @classmethod
+    def charger(cls, dossier: str, ids, en_mmap: bool = MODE_MMAP) -> "IndexBM25":
+        """Lit l'index d'un artefact ; `ids` : index_to_docstore_id du vectorstore de l'artefact."""
+        with open(os.path.join(dossier, "bm25_meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        tableaux = {nom: np.load(os.path.join(dossier, f"bm25_{nom}.npy"), mmap_mode="r" if en_mmap else None)
+                    for nom in _FICHIERS_BM25}
+        return cls(**tableaux, ids=ids, k1=meta["k1"], b=meta["b"])
+
+
+def ids_par_vecteur(vectorstore, question: str, k: int) -> list[str]:
+    """Ids des k chunks les plus proches, sans construire leurs Documents."""
+    vecteur = np.asarray([vectorstore.embedding_function.embed_query(question)], dtype="float32")
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vecteur)
+    _, positions = vectorstore.index.search(vecteur, k)
+    return [vectorstore.index_to_docstore_id[int(p)] for p in positions[0] if p != -1]
+
+
+def vecteurs_par_position(index, positions) -> np.ndarray:
+    """
+    Vecteurs stockés aux positions données (approximatifs pour un index compressé).
+
+    Un index IVF doit avoir sa table position → liste inversée (regler_recherche,
+    appelé au chargement de l'index).
+    """
+    return index.reconstruct_batch(np.ascontiguousarray(positions, dtype="int64"))
+
+
+def mmr(requete: np.ndarray, candidats: np.ndarray, k: int, lambda_mult: float = MMR_LAMBDA) -> list[int]:
+    """
+    Maximal Marginal Relevance vectorisée.
+
+    Args:
+        requete: Vecteur de la question (d,)
+        candidats: Vecteurs des candidats (n, d)
+        k: Nombre de candidats à choisir
+        lambda_mult: 1 = pertinence seule, 0 = diversité seule
+
+    Returns:
+        Indices (dans `candidats`) des k candidats choisis, dans l'ordre de sélection.
+    """
+    if len(candidats) == 0:
+        return []
+    candidats = candidats / np.maximum(np.linalg.norm(candidats, axis=1, keepdims=True), 1e-12)
+    requete = requete / max(float(np.linalg.norm(requete)), 1e-12)
+    pertinence = candidats @ requete
+    similarites = candidats @ candidats.T
+
+    choisi = int(np.argmax(pertinence))
+    choisis = [choisi]
+    # Ressemblance de chaque candidat avec le plus proche des chunks déjà choisis
+    redondance = similarites[choisi].copy()
+    disponibles = np.ones(len(candidats), dtype=bool)
+    disponibles[choisi] = False
+    for _ in range(min(k, len(candidats)) - 1):
+        scores = lambda_mult * pertinence - (1 - lambda_mult) * redondance
+        scores[~disponibles] = -np.inf
+        choisi = int(np.argmax(scores))
+        choisis.append(choisi)
+        disponibles[choisi] = False
+        np.maximum(redondance, similarites[choisi], out=redondance)
+    return choisis
+
+
+def rechercher_mmr(vectorstore, question: str, k: int, fetch_k: int = MMR_FETCH_K,
+                   lambda_mult: float = MMR_LAMBDA, positions=None) -> list[Document]:
+    """Les fetch_k plus proches (parmi `positions` si donné), diversifiés par MMR jusqu'à k."""
+    vecteur = np.asarray(vectorstore.embedding_function.embed_query(question), dtype="float32")
+    if positions is None:
+        requete = vecteur[None, :].copy()
+        if vectorstore._normalize_L2:
+            faiss.normalize_L2(requete)
+        _, trouves = vectorstore.index.search(requete, fetch_k)
+        candidats = [int(p) for p in trouves[0] if p != -1]
+    else:
+        candidats = [p for p, _ in recherche_restreinte(vectorstore, vecteur.tolist(), fetch_k, positions)]
+    if not candidats:
+        return []
+
+    choisis = mmr(vecteur, vecteurs_par_position(vectorstore.index, candidats), k, lambda_mult)
+    documents = []
+    for i in choisis:
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[candidats[i]])
+        if isinstance(doc, Document):
+            documents.append(doc)
+    return documents
+
+
+def fusion_rrf(classements: list[list[str]], k_rrf: int = 60) -> list[tuple[str, float]]:
+    """Reciprocal Rank Fusion : fusionne plusieurs classements d'ids."""
+    scores = defaultdict(float)
+    for classement in classements:
+        for rang, id_doc in enumerate(classement):
+            scores[id_doc] += 1.0 / (k_rrf + rang + 1)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def rechercher_documents(vectorstore, question: str, k: int, fetch_k: int = 20, k_rrf: int = 60,
+                         positions=None, hybride: bool = True) -> list[Document]:
+    """
+    Recherche vectorielle (+ BM25 fusionné par RRF si hybride).
+
+    Args:
+        positions: Si donné, positions FAISS auxquelles la recherche est restreinte
+    """
+    if positions is None:
+        par_vecteur = ids_par_vecteur(vectorstore, question, fetch_k if hybride else k)
+        autorises = None
+    else:
+        vecteur = vectorstore.embedding_function.embed_query(question)
+        trouves = recherche_restreinte(vectorstore, vecteur, fetch_k if hybride else k, positions)
+        par_vecteur = [vectorstore.index_to_docstore_id[p] for p, _ in trouves]
+        autorises = positions
+
+    if hybride:
+        bm25 = getattr(vectorstore, "index_bm25", None)
+        if bm25 is None:
+            bm25 = vectorstore.index_bm25 = IndexBM25.depuis_vectorstore(vectorstore)
+        par_mots = [id_doc for id_doc, _ in bm25.rechercher(question, k=fetch_k, autorises=autorises)]
+        ids = [id_doc for id_doc, _ in fusion_rrf([par_vecteur, par_mots], k_rrf)[:k]]
+    else:
+        ids = par_vecteur[:k]
+
+    # Seuls les k chunks retenus deviennent des Documents
+    documents = []
+    for id_doc in ids:
+        doc = vectorstore.docstore.search(id_doc)
+        if isinstance(doc, Document):
+            documents.append(doc)
+    return documents
+
+
+class RetrieverHybride(BaseRetriever):
+    """Retriever BM25 + FAISS fusionné par RRF.
+
+    L'index BM25 est lu sur le vectorstore (attribut `index_bm25` posé par
+    index_persistant) : quand la surveillance remplace le vectorstore, les
+    deux index changent ensemble.
+    """
+
+    vectorstore: Any
+    k: int = 4
+    fetch_k: int = 20
+    k_rrf: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return rechercher_documents(self.vectorstore, query, self.k, self.fetch_k, self.k_rrf)
+
+
+class RetrieverMMR(BaseRetriever):
+    """Retriever FAISS diversifié par MMR (NumPy)."""
+
+    vectorstore: Any
+    k: int = 4
+    fetch_k: int = MMR_FETCH_K
+    lambda_mult: float = MMR_LAMBDA
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return rechercher_mmr(self.vectorstore, query, self.k, self.fetch_k, self.lambda_mult)
+
+
+def creer_retriever(vectorstore, k: int, mode: str = MODE_RECHERCHE):
+    """Retriever du mode demandé : "hybride" (BM25 + vecteurs), "mmr" ou "vecteur"."""
+    if mode == "hybride":
+        return RetrieverHybride(vectorstore=vectorstore, k=k, fetch_k=max(20, 5 * k))
+    if mode == "mmr":
+        return RetrieverMMR(vectorstore=vectorstore, k=k, fetch_k=max(MMR_FETCH_K, k))
+    return vectorstore.as_retriever(search_kwargs={"k": k})
+
+
+def rechercher_avec_filtres(retriever, question: str, filtres: dict) -> list[Document]:
+    """
+    Recherche du retriever restreinte aux chunks qui respectent les filtres.
+
+    Args:
+        retriever: RetrieverHybride, RetrieverMMR ou retriever vectoriel (as_retriever)
+        filtres: {champ: valeur}, ex : {"consultant": "Antoine", "page": None}
+
+    Sans filtre actif, équivaut à retriever.invoke(question).
+    """
+    vectorstore = retriever.vectorstore
+    index_filtres = getattr(vectorstore, "index_filtres", None)
+    if index_filtres is None:
+        index_filtres = vectorstore.index_filtres = IndexFiltres.depuis_vectorstore(vectorstore)
+    positions = index_filtres.positions(filtres)
+    if positions is None:
+        return retriever.invoke(question)
+
+    if isinstance(retriever, RetrieverMMR):
+        return rechercher_mmr(vectorstore, question, retriever.k, retriever.fetch_k, retriever.lambda_mult,
+                              positions=positions)
+    if isinstance(retriever, RetrieverHybride):
+        return rechercher_documents(vectorstore, question, retriever.k, retriever.fetch_k, retriever.k_rrf,
+                                    positions=positions)
+    return rechercher_documents(vectorstore, question, retriever.search_kwargs.get("k", 4),
+                                positions=positions, hybride=False)
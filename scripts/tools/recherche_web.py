@@ -3,9 +3,13 @@
 ===================================
 
 Utilise DuckDuckGo pour faire des recherches web gratuites (pas de clé API requise).
+
+En async, la même recherche ddgs tourne dans le pool de threads des outils
+(execution_async) : invoke et ainvoke renvoient les mêmes résultats.
 """
 
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+from .execution_async import en_thread
 
 # On essaie d'importer ddgs (anciennement duckduckgo-search), sinon on fait un fallback
 try:
@@ -14,43 +18,63 @@ try:
 except ImportError:
     DDGS_AVAILABLE = False
 
+MAX_RESULTATS = 5
+
+MESSAGE_INDISPONIBLE = """⚠️ L'outil de recherche web n'est pas disponible.
+Pour l'activer, installez le package : pip install ddgs
+
+En attendant, je ne peux répondre qu'avec mes connaissances existantes ou les documents Clinitex."""
+
+
+def _formater(query: str, results: list[dict]) -> str:
+    """Résultats au format {title, body, href} → texte pour l'agent."""
+    if not results:
+        return f"🔍 Aucun résultat trouvé pour : '{query}'"
+
+    output = f"🌐 Résultats de recherche pour '{query}' :\n\n"
+
+    for i, result in enumerate(results, 1):
+        title = result.get("title", "Sans titre")
+        body = result.get("body", "Pas de description")
+        href = result.get("href", "")
+
+        output += f"**{i}. {title}**\n"
+        output += f"   {body[:200]}...\n"
+        output += f"   🔗 {href}\n\n"
+
+    return output
+
+
+def _rechercher_ddgs(query: str) -> list[dict]:
+    # Créer une instance DuckDuckGo et rechercher (max 5 résultats)
+    return list(DDGS().text(query, max_results=MAX_RESULTATS))
+
 
-@tool
-def recherche_web(query: str) -> str:
+def _recherche_web(query: str) -> str:
     """Utile pour rechercher des informations récentes sur Internet.
     Permet de trouver des actualités, des définitions, des informations sur des entreprises, 
     des technologies, ou tout sujet nécessitant des données à jour.
     Entrée : une requête de recherche en français ou anglais."""
-    
+
     if not DDGS_AVAILABLE:
-        return """⚠️ L'outil de recherche web n'est pas disponible.
-Pour l'activer, installez le package : pip install ddgs
+        return MESSAGE_INDISPONIBLE
+
+    try:
+        return _formater(query, _rechercher_ddgs(query))
+
+    except Exception as e:
+        return f"❌ Erreur lors de la recherche web : {e}"
+
+
+async def _arecherche_web(query: str) -> str:
+    if not DDGS_AVAILABLE:
+        return MESSAGE_INDISPONIBLE
 
-En attendant, je ne peux répondre qu'avec mes connaissances existantes ou les documents Clinitex."""
-    
     try:
-        # Créer une instance DuckDuckGo
-        ddgs = DDGS()
-        
-        # Rechercher (max 5 résultats)
-        results = list(ddgs.text(query, max_results=5))
-        
-        if not results:
-            return f"🔍 Aucun résultat trouvé pour : '{query}'"
-        
-        # Formater les résultats
-        output = f"🌐 Résultats de recherche pour '{query}' :\n\n"
-        
-        for i, result in enumerate(results, 1):
-            title = result.get("title", "Sans titre")
-            body = result.get("body", "Pas de description")
-            href = result.get("href", "")
-            
-            output += f"**{i}. {title}**\n"
-            output += f"   {body[:200]}...\n"
-            output += f"   🔗 {href}\n\n"
-        
-        return output
-    
+        return _formater(query, await en_thread(_rechercher_ddgs, query))
+
     except Exception as e:
         return f"❌ Erreur lors de la recherche web : {e}"
+
+
+recherche_web = StructuredTool.from_function(func=_recherche_web, coroutine=_arecherche_web, name="recherche_web")
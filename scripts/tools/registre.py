@@ -0,0 +1,207 @@
+"""
+🗂️ Registre des retrievers - Un seul index par corpus, construit une seule fois
+==============================================================================
+
+Avant, chaque outil RAG gardait son retriever dans une variable globale sans
+verrou : dans l'app Streamlit, plusieurs sessions qui interrogent un outil
+"froid" en même temps construisaient toutes l'index en parallèle.
+
+Le registre possède les corpus nommés et leurs retrievers :
+- initialisation paresseuse "single-flight" : un seul thread construit,
+  les autres attendent le même résultat
+- préchauffage à la demande (synchrone ou en arrière-plan)
+- suivi de l'état et de la mémoire occupée par corpus
+
+Usage :
+    from tools.registre import registre
+    registre.enregistrer("clinitex", construire_retriever, source="scripts/DocArag2")
+    retriever = registre.obtenir("clinitex")
+"""
+
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Callable
+
+# États possibles d'un corpus
+FROID = "froid"
+EN_COURS = "en cours"
+PRET = "prêt"
+ERREUR = "erreur"
+
+
+@dataclass
+class _Entree:
+    nom: str
+    construire: Callable
+    source: object = None
+    retriever: object = None
+    etat: str = FROID
+    erreur: str | None = None
+    duree_init: float | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    pret: threading.Event = field(default_factory=threading.Event)
+
+
+def _octets_index(vectorstore) -> int:
+    """Taille de l'index FAISS sérialisé (vecteurs + structure)."""
+    import faiss
+    return int(faiss.serialize_index(vectorstore.index).nbytes)
+
+
+def _octets_docstore(vectorstore) -> int:
+    """Taille approximative des textes et métadonnées du docstore."""
+    if hasattr(vectorstore.docstore, "octets"):
+        return vectorstore.docstore.octets()
+    total = 0
+    for doc in getattr(vectorstore.docstore, "_dict", {}).values():
+        total += len(doc.page_content.encode("utf-8"))
+        total += len(json.dumps(doc.metadata, ensure_ascii=False, default=str).encode("utf-8"))
+    return total
+
+
+def _octets_annexe(vectorstore, attribut: str) -> int:
+    """Taille d'un index posé sur le vectorstore (index_bm25, index_filtres, index_titres)."""
+    index = getattr(vectorstore, attribut, None)
+    return index.octets() if hasattr(index, "octets") else 0
+
+
+class RegistreRetrievers:
+    """Corpus nommés → retrievers, thread-safe."""
+
+    def __init__(self):
+        self._entrees: dict[str, _Entree] = {}
+        self._lock = threading.Lock()
+
+    def enregistrer(self, nom: str, construire: Callable, source: object = None):
+        """Déclare un corpus. `construire()` retourne son retriever.
+
+        `source` identifie ce que construit `construire` (ex : le dossier du
+        corpus). Tant que le corpus n'est pas construit, un nouvel
+        enregistrement remplace le précédent ; ensuite, seul un
+        enregistrement de la même source est accepté (et ne change rien).
+
+        Raises:
+            ValueError: si le corpus est déjà construit (ou en construction)
+            à partir d'une autre source
+        """
+        with self._lock:
+            entree = self._entrees.get(nom)
+            if entree is None:
+                self._entrees[nom] = _Entree(nom, construire, source)
+            elif entree.etat in (FROID, ERREUR):
+                entree.construire, entree.source = construire, source
+            elif entree.source != source:
+                raise ValueError(f"Corpus '{nom}' déjà chargé depuis {entree.source!r} : "
+                                 f"impossible de l'enregistrer depuis {source!r}")
+
+    def noms(self) -> list[str]:
+        with self._lock:
+            return list(self._entrees)
+
+    def _entree(self, nom: str) -> _Entree:
+        with self._lock:
+            if nom not in self._entrees:
+                raise KeyError(f"Corpus inconnu : '{nom}' (corpus enregistrés : {list(self._entrees)})")
+            return self._entrees[nom]
+
+    def obtenir(self, nom: str):
+        """Retourne le retriever du corpus, en le construisant au premier appel.
+
+        Si une construction est déjà en cours dans un autre thread, on l'attend
+        au lieu d'en lancer une deuxième.
+        """
+        entree = self._entree(nom)
+        if entree.retriever is not None:
+            return entree.retriever
+
+        with entree.lock:
+            if entree.retriever is None:
+                # Sous le verrou du registre : enregistrer() ne peut plus changer la source
+                with self._lock:
+                    entree.etat = EN_COURS
+                    construire = entree.construire
+                debut = time.perf_counter()
+                try:
+                    retriever = construire()
+                except Exception as e:
+                    with self._lock:
+                        entree.etat, entree.erreur = ERREUR, str(e)
+                    raise
+                entree.duree_init = time.perf_counter() - debut
+                entree.retriever, entree.etat, entree.erreur = retriever, PRET, None
+                entree.pret.set()
+        return entree.retriever
+
+    def prechauffer(self, noms: list[str] | None = None, en_arriere_plan: bool = False) -> list[threading.Thread]:
+        """Construit les corpus tout de suite (tous par défaut).
+
+        En arrière-plan, retourne les threads lancés ; les erreurs sont
+        visibles via statut().
+        """
+        noms = noms if noms is not None else self.noms()
+        if not en_arriere_plan:
+            for nom in noms:
+                self.obtenir(nom)
+            return []
+
+        def construire(nom):
+            try:
+                self.obtenir(nom)
+            except Exception as e:
+                print(f"❌ Préchauffage de '{nom}' impossible : {e}")
+
+        threads = [threading.Thread(target=construire, args=(nom,), name=f"prechauffage-{nom}", daemon=True)
+                   for nom in noms]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def est_pret(self, nom: str) -> bool:
+        return self._entree(nom).pret.is_set()
+
+    def tous_prets(self, noms: list[str] | None = None) -> bool:
+        """Vrai si tous les corpus demandés (tous par défaut) sont construits."""
+        return all(self.est_pret(nom) for nom in (noms if noms is not None else self.noms()))
+
+    def memoire(self, nom: str) -> dict:
+        """Mémoire occupée par un corpus construit (octets) : index FAISS, docstore,
+        BM25, filtres de métadonnées, titres, et leur total."""
+        entree = self._entree(nom)
+        vectorstore = getattr(entree.retriever, "vectorstore", None)
+        cles = ("octets_index", "octets_docstore", "octets_bm25", "octets_filtres", "octets_titres")
+        if vectorstore is None:
+            return {"vecteurs": 0, **dict.fromkeys(cles, 0), "octets_total": 0}
+        memoire = {
+            "vecteurs": int(vectorstore.index.ntotal),
+            "octets_index": _octets_index(vectorstore),
+            "octets_docstore": _octets_docstore(vectorstore),
+            "octets_bm25": _octets_annexe(vectorstore, "index_bm25"),
+            "octets_filtres": _octets_annexe(vectorstore, "index_filtres"),
+            "octets_titres": _octets_annexe(vectorstore, "index_titres"),
+        }
+        memoire["octets_total"] = sum(memoire[cle] for cle in cles)
+        return memoire
+
+    def statut(self, avec_memoire: bool = True) -> dict[str, dict]:
+        """État de chaque corpus : état, durée d'initialisation, erreur, mémoire.
+
+        avec_memoire=False évite de mesurer les index (appel très léger,
+        adapté à un affichage rafraîchi souvent).
+        """
+        resultat = {}
+        for nom in self.noms():
+            entree = self._entree(nom)
+            resultat[nom] = {
+                "etat": entree.etat,
+                "duree_init": entree.duree_init,
+                "erreur": entree.erreur,
+            }
+            if avec_memoire:
+                resultat[nom].update(self.memoire(nom))
+        return resultat
+
+
+# Registre partagé par tous les outils du package
+registre = RegistreRetrievers()
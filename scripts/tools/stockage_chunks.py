@@ -0,0 +1,209 @@
+"""
+🗃️ Stockage compact des chunks - Textes, métadonnées et ids sans objets Document
+================================================================================
+
+Le docstore de FAISS garde chaque chunk sous forme d'un objet Document avec
+son dictionnaire de métadonnées : pour les gros corpus, ces objets Python
+occupent bien plus de RAM que les vecteurs eux-mêmes. Et FAISS.load_local
+dépickle tout le docstore : chaque processus (ex : chaque worker Streamlit)
+en garde sa propre copie.
+
+DocstoreCompact range les chunks dans l'ordre des positions FAISS :
+- textes : un seul blob UTF-8 + tableau des positions de début
+- métadonnées en colonnes : une colonne par clé, valeurs "internées"
+  (ex : le nom du fichier source est stocké une fois, chaque chunk n'a qu'un
+  code int32) ; les colonnes d'entiers (page...) sont des tableaux int64
+- ids : tableau de taille fixe, plus une copie triée (recherche dichotomique)
+
+Un Document n'est construit que pour les chunks réellement retournés.
+
+Les mêmes fichiers sont lus soit en RAM, soit en mémoire mappée (mode
+service RAG_MMAP=1) : l'index FAISS est alors lu avec faiss.IO_FLAG_MMAP_IFC
+et les pages sont partagées par tous les processus de la machine via le cache
+du système. L'index BM25 de la recherche hybride est rangé de la même façon
+(tableaux bm25_*.npy, voir recherche_hybride.py) : la mémoire propre de
+chaque worker reste quasiment constante quand le corpus grossit.
+
+Fichiers écrits dans l'artefact :
+- chunks.txt / chunks_offsets.npy : textes concaténés + positions
+- chunks_meta.json / chunks_meta_<i>.npy : description des colonnes + codes par chunk
+- chunks_ids.npy, chunks_ids_tries.npy, chunks_ids_positions.npy : ids
+"""
+
+import os
+import json
+import mmap
+from collections.abc import Mapping
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+MODE_MMAP = os.getenv("RAG_MMAP", "0") == "1"
+
+# Valeur d'une colonne d'entiers pour un chunk qui n'a pas cette métadonnée
+_ABSENT = np.iinfo(np.int64).min
+
+_FICHIERS = ("chunks.txt", "chunks_offsets.npy", "chunks_meta.json",
+             "chunks_ids.npy", "chunks_ids_tries.npy", "chunks_ids_positions.npy")
+
+
+def existe(dossier: str) -> bool:
+    """True si l'artefact contient le stockage compact des chunks."""
+    return all(os.path.exists(os.path.join(dossier, nom)) for nom in _FICHIERS)
+
+
+def _est_entier(valeur) -> bool:
+    return isinstance(valeur, int) and not isinstance(valeur, bool)
+
+
+def _colonnes(metadatas: list[dict]) -> tuple[list[dict], list[np.ndarray]]:
+    """Métadonnées → colonnes : [{cle, type, valeurs}] et un tableau de codes par colonne."""
+    cles = list(dict.fromkeys(cle for metadata in metadatas for cle in metadata))
+    descriptions, codes = [], []
+    for cle in cles:
+        presentes = [m[cle] for m in metadatas if cle in m]
+        if all(_est_entier(v) for v in presentes):
+            descriptions.append({"cle": cle, "type": "entier"})
+            codes.append(np.asarray([m.get(cle, _ABSENT) for m in metadatas], dtype="int64"))
+            continue
+        valeurs, numeros = [], {}
+        colonne = np.full(len(metadatas), -1, dtype="int32")
+        for i, metadata in enumerate(metadatas):
+            if cle in metadata:
+                interne = json.dumps(metadata[cle], sort_keys=True, ensure_ascii=False, default=str)
+                if interne not in numeros:
+                    numeros[interne] = len(valeurs)
+                    valeurs.append(json.loads(interne))
+                colonne[i] = numeros[interne]
+        descriptions.append({"cle": cle, "type": "interne", "valeurs": valeurs})
+        codes.append(colonne)
+    return descriptions, codes
+
+
+def ecrire(dossier: str, vectorstore) -> None:
+    """Écrit les chunks du vectorstore dans l'ordre des positions de l'index FAISS."""
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    documents = [vectorstore.docstore.search(id_doc) for id_doc in ids]
+
+    offsets = [0]
+    with open(os.path.join(dossier, "chunks.txt"), "wb") as f:
+        for doc in documents:
+            texte = doc.page_content.encode("utf-8")
+            f.write(texte)
+            offsets.append(offsets[-1] + len(texte))
+    np.save(os.path.join(dossier, "chunks_offsets.npy"), np.asarray(offsets, dtype="int64"))
+
+    descriptions, codes = _colonnes([doc.metadata for doc in documents])
+    with open(os.path.join(dossier, "chunks_meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"colonnes": descriptions}, f, ensure_ascii=False)
+    for i, colonne in enumerate(codes):
+        np.save(os.path.join(dossier, f"chunks_meta_{i}.npy"), colonne)
+
+    tableau_ids = np.asarray([id_doc.encode("utf-8") for id_doc in ids], dtype="S")
+    ordre = np.argsort(tableau_ids, kind="stable")
+    np.save(os.path.join(dossier, "chunks_ids.npy"), tableau_ids)
+    np.save(os.path.join(dossier, "chunks_ids_tries.npy"), tableau_ids[ordre])
+    np.save(os.path.join(dossier, "chunks_ids_positions.npy"), ordre.astype("int64"))
+
+
+def _lire_blob(chemin: str, en_mmap: bool) -> mmap.mmap | bytes:
+    with open(chemin, "rb") as f:
+        # mmap refuse les fichiers vides
+        if not en_mmap or os.fstat(f.fileno()).st_size == 0:
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class IdsParPosition(Mapping):
+    """index_to_docstore_id en lecture seule : position FAISS → id."""
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].decode("utf-8")
+
+    def __iter__(self):
+        return iter(range(len(self._ids)))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class DocstoreCompact(Docstore):
+    """Docstore en lecture seule : Documents construits à la demande."""
+
+    def __init__(self, dossier: str, en_mmap: bool = MODE_MMAP):
+        charger = lambda nom: np.load(os.path.join(dossier, nom), mmap_mode="r" if en_mmap else None)
+        self._textes = _lire_blob(os.path.join(dossier, "chunks.txt"), en_mmap)
+        self._offsets = charger("chunks_offsets.npy")
+        with open(os.path.join(dossier, "chunks_meta.json"), encoding="utf-8") as f:
+            self._colonnes = json.load(f)["colonnes"]
+        self._codes = [charger(f"chunks_meta_{i}.npy") for i in range(len(self._colonnes))]
+        self.ids = charger("chunks_ids.npy")
+        self._ids_tries = charger("chunks_ids_tries.npy")
+        self._positions = charger("chunks_ids_positions.npy")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, id_doc: str) -> int | None:
+        """Position FAISS d'un chunk (recherche dichotomique dans les ids triés)."""
+        cle = id_doc.encode("utf-8")
+        i = int(np.searchsorted(self._ids_tries, cle))
+        if i < len(self._ids_tries) and self._ids_tries[i] == cle:
+            return int(self._positions[i])
+        return None
+
+    def metadata(self, position: int) -> dict:
+        metadata = {}
+        for colonne, codes in zip(self._colonnes, self._codes):
+            code = int(codes[position])
+            if colonne["type"] == "entier":
+                if code != _ABSENT:
+                    metadata[colonne["cle"]] = code
+            elif code >= 0:
+                metadata[colonne["cle"]] = colonne["valeurs"][code]
+        return metadata
+
+    def document(self, position: int) -> Document:
+        debut, fin = int(self._offsets[position]), int(self._offsets[position + 1])
+        return Document(
+            id=self.ids[position].decode("utf-8"),
+            page_content=self._textes[debut:fin].decode("utf-8"),
+            metadata=self.metadata(position),
+        )
+
+    def search(self, search: str) -> str | Document:
+        position = self.position(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.document(position)
+
+    def delete(self, ids: list) -> None:
+        """Refusé : pour retirer des chunks, reindexer() reconstruit l'artefact (et donc ce docstore)."""
+        raise TypeError("DocstoreCompact est en lecture seule")
+
+    def octets(self) -> int:
+        """Taille des textes, codes et ids (hors valeurs internées)."""
+        return (len(self._textes) + self._offsets.nbytes + self.ids.nbytes * 2 + self._positions.nbytes
+                + sum(codes.nbytes for codes in self._codes))
+
+
+def lire_index_mmap(chemin: str):
+    """Lit un index FAISS (Flat, IVF, HNSW...) sans copier ses vecteurs en RAM."""
+    import faiss
+    return faiss.read_index(chemin, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+
+
+def ouvrir(dossier: str, embeddings, en_mmap: bool = MODE_MMAP):
+    """Ouvre un artefact en lecture seule avec le docstore compact (en RAM ou mappé)."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    docstore = DocstoreCompact(dossier, en_mmap)
+    chemin_index = os.path.join(dossier, "index.faiss")
+    index = lire_index_mmap(chemin_index) if en_mmap else faiss.read_index(chemin_index)
+    return FAISS(embeddings, index, docstore, IdsParPosition(docstore.ids))